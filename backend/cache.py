@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a time-to-live"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+    
+    def clear(self):
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CoalescingCache:
+    """
+    Singleflight for reads: concurrent calls with the same key share one
+    in-flight load, and with ttl > 0 the result is also kept for that long.
+    None results are shared with concurrent callers but never cached.
+    
+    Callers share the returned object, so they must not mutate it.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.loads = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+    
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        if self.cache.ttl > 0:
+            value = self.cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        
+        task = self._inflight.get(key)
+        if task is None:
+            self.loads += 1
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # A caller that disconnects must not cancel the load the others are waiting on
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        # After invalidate() the entry belongs to a newer load, or to nobody; a stale result is not cached
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.cache.set(key, task.result())
+    
+    def invalidate(self, key: Hashable):
+        """Forget the cached value and detach any in-flight load, so the next read goes to the database"""
+        self.cache.pop(key)
+        self._inflight.pop(key, None)
+    
+    def stats(self) -> dict:
+        requests = self.loads + self.coalesced + self.cache.hits
+        return {
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache.hits,
+            "inflight": len(self._inflight),
+            "saved_rate": (self.coalesced + self.cache.hits) / requests if requests else 0.0,
+            "cache": self.cache.stats(),
+        }
+
+
+# Slim user projections served to authenticated requests (/auth/me), keyed by user_id
+user_cache = CoalescingCache(maxsize=settings.auth_user_cache_size, ttl=settings.auth_user_cache_ttl_seconds)
+
+# GET /users/{user_id} and GET /assessments/user/{user_id} responses, keyed by user_id
+user_reads = CoalescingCache(maxsize=settings.read_cache_size, ttl=settings.read_cache_ttl_seconds)
+assessment_reads = CoalescingCache(maxsize=settings.read_cache_size, ttl=settings.read_cache_ttl_seconds)
+
+READ_CACHES = {"auth_user": user_cache, "user": user_reads, "latest_assessment": assessment_reads}
+
+
+def invalidate_user(user_id: str):
+    """Drop cached reads of a user's profile; call after every write to it"""
+    user_cache.invalidate(user_id)
+    user_reads.invalidate(user_id)
+
+
+def invalidate_assessments(user_id: str):
+    """Drop the cached latest assessment of a user; call after every assessment write"""
+    assessment_reads.invalidate(user_id)
+
+
+def read_stats() -> dict:
+    return {name: cache.stats() for name, cache in READ_CACHES.items()}
@@ -1,24 +1,149 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     # MongoDB
     mongodb_url: str
     mongodb_db_name: str = "gamified_productivity"
+    # Run multi-document writes (task completion + XP) in a transaction; needs a replica set
+    mongodb_transactions: bool = False
+    mongodb_transaction_attempts: int = 3  # retries of transient transaction and commit errors
+    # Drop and rebuild live indexes whose options differ from the model declarations on startup.
+    # Off by default: the index is missing while it rebuilds; use `python -m backend.indexes --sync --rebuild-conflicting`
+    index_rebuild_conflicting: bool = False
+    # Startup connects in the background and retries with exponential backoff
+    db_server_selection_timeout_ms: int = 5000
+    db_reconnect_initial_seconds: float = 0.5
+    db_reconnect_max_seconds: float = 30.0
+    # /health/ready pings at most this often; probes in between get the cached result
+    db_health_cache_seconds: float = 2.0
+    db_health_ping_timeout_seconds: float = 1.0
     
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     
+    # Leaderboards: "memory" (per worker) or "redis" (shared sorted sets)
+    leaderboard_backend: str = "memory"
+    # Memory boards only see this worker's grants; they are rebuilt from user_profiles this often.
+    # Redis boards are reconciled with user_profiles at the same interval.
+    leaderboard_reload_seconds: float = 60.0
+    
+    # Real-time events over /ws: "memory" (per worker) or "redis" (pub/sub backplane shared by workers)
+    events_backend: str = "memory"
+    events_redis_channel: str = "events"
+    # Per-connection send queue; a client further behind than this gets a resync instead
+    ws_queue_size: int = 64
+    ws_send_timeout_seconds: float = 5.0
+    ws_heartbeat_seconds: float = 25.0
+    
+    # Equipment catalog, held in memory by every worker and reloaded this often
+    equipment_catalog_refresh_seconds: float = 60.0
+    
+    # Face meshes: binary files in a GridFS bucket, uploaded and downloaded in chunks
+    mesh_bucket: str = "meshes"
+    mesh_chunk_bytes: int = 255 * 1024
+    mesh_max_bytes: int = 32 * 1024 * 1024
+    mesh_max_vertices: int = 1_000_000
+    mesh_max_indices: int = 6_000_000
+    
+    # 3D assets (GLB models, textures) served under /assets from this directory; unset to leave it to a static host
+    assets_dir: Optional[str] = None
+    asset_cache_size: int = 256  # files kept mapped and hashed
+    asset_chunk_bytes: int = 1024 * 1024
+    asset_immutable_max_age: int = 31536000
+    
     # JWT
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 1440
     
+    # Auth caches (per worker)
+    auth_claims_cache_size: int = 10000
+    auth_claims_cache_ttl_seconds: int = 300
+    auth_user_cache_size: int = 10000
+    auth_user_cache_ttl_seconds: int = 30
+    
+    # Hot per-user reads: concurrent identical reads always share one query;
+    # results are also cached this long (0 = coalescing only). Invalidated by writes in this worker.
+    read_cache_size: int = 10000
+    read_cache_ttl_seconds: float = 2.0
+    
     # Google OAuth
     google_client_id: str
     google_client_secret: str
     google_redirect_uri: str = "http://localhost:8000/auth/google/callback"
+    # Overridable so tests and benchmarks can point at a local stand-in server
+    google_accounts_url: str = "https://accounts.google.com"
+    google_oauth_url: str = "https://oauth2.googleapis.com"
+    google_api_url: str = "https://www.googleapis.com"
+    
+    # Background Google token refresh
+    google_token_refresh_enabled: bool = True
+    google_token_refresh_interval_seconds: float = 60.0
+    google_token_refresh_window_seconds: int = 600
+    google_token_refresh_concurrency: int = 10
+    google_token_refresh_batch_size: int = 500
+    # How long a worker may hold a user's refresh before another can take it over
+    google_token_refresh_lease_seconds: float = 30.0
+    
+    # Google Calendar sync
+    calendar_sync_concurrency: int = 20
+    calendar_sync_page_size: int = 250
+    
+    # Free/busy cache (per worker)
+    freebusy_cache_days: int = 14
+    freebusy_cache_size: int = 10000
+    freebusy_cache_ttl_seconds: int = 900
+    
+    # Task auto-scheduler (times are UTC)
+    schedule_slot_minutes: int = 15
+    schedule_horizon_days: int = 7
+    schedule_work_start_hour: int = 9
+    schedule_work_end_hour: int = 17
+    schedule_weekdays_only: bool = True
+    schedule_priority_shift_hours: int = 24
+    
+    # Shared outbound HTTP client
+    http_pool_max_connections: int = 100
+    http_pool_max_keepalive: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 10.0
+    http_connect_timeout_seconds: float = 5.0
+    http_host_timeouts: Dict[str, float] = {}  # host -> timeout in seconds
+    http_retries: int = 2
+    http_retry_backoff_seconds: float = 0.2
+    http_retry_backoff_max_seconds: float = 2.0
+    http2: bool = False
+    
+    # AI recommendations: "gemini", "stub" (local testing) or "off"
+    recommendation_model: str = "gemini"
+    gemini_api_key: Optional[str] = None
+    gemini_model: str = "gemini-pro"
+    recommendation_concurrency: int = 4
+    recommendation_timeout_seconds: float = 10.0
+    recommendation_batch_size: int = 8
+    recommendation_batch_window_ms: int = 50
+    recommendation_cache_size: int = 10000
+    recommendation_cache_ttl_seconds: int = 3600
+    # Declarative rule table (defaults to backend/rules/recommendations.json), re-read when it changes
+    recommendation_rules_path: Optional[str] = None
+    recommendation_rules_reload_seconds: float = 5.0
+    
+    # Logging and metrics
+    log_level: str = "info"
+    log_json: bool = True
+    metrics_enabled: bool = True
+    metrics_slow_request_ms: float = 1000.0
+    metrics_slow_query_ms: float = 100.0
+    metrics_slow_query_samples: int = 200
+    
+    # Per-request profiling: by `X-Profile: <token>` header or random sampling; "cprofile" or "pyinstrument"
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None
+    profiling_sample_rate: float = 0.0
+    profiling_dir: str = "/tmp/profiles"
+    profiler: str = "cprofile"
     
     # CORS
     cors_origins: List[str] = ["http://localhost:3000"]
@@ -1,15 +1,161 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
+from pymongo import monitoring
+from pymongo.errors import AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError
 import certifi
 
 try:
     from .config import settings
+    from .indexes import reconcile_indexes
+    from .logs import logger
+    from .metrics import command_metrics, registry
 except ImportError:
     from config import settings
+    from indexes import reconcile_indexes
+    from logs import logger
+    from metrics import command_metrics, registry
 
 mongodb_client: AsyncIOMotorClient = None
 
 
+class PoolListener(monitoring.ConnectionPoolListener):
+    """Counts connections per server so /health/ready can report pool usage"""
+    
+    def __init__(self):
+        self.pools = defaultdict(lambda: {"open": 0, "checked_out": 0, "created": 0, "closed": 0, "checkout_failures": 0})
+    
+    def stats(self) -> dict:
+        return {f"{host}:{port}": dict(pool) for (host, port), pool in self.pools.items()}
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_created(self, event):
+        pool = self.pools[event.address]
+        pool["open"] += 1
+        pool["created"] += 1
+    
+    def connection_closed(self, event):
+        pool = self.pools[event.address]
+        pool["open"] -= 1
+        pool["closed"] += 1
+    
+    def connection_checked_out(self, event):
+        self.pools[event.address]["checked_out"] += 1
+    
+    def connection_checked_in(self, event):
+        self.pools[event.address]["checked_out"] -= 1
+    
+    def connection_check_out_failed(self, event):
+        self.pools[event.address]["checkout_failures"] += 1
+
+
+class DatabaseState:
+    """Connection state shared by the background connector and the health endpoints"""
+    
+    def __init__(self):
+        self.status = "starting"  # starting | connecting | ready | unavailable | failed
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self.ready = asyncio.Event()
+        self.pool = PoolListener()
+        self._ping_at = 0.0
+        self._ping: dict = {"ok": False, "latency_ms": None, "error": "not connected"}
+        self._ping_lock = asyncio.Lock()
+    
+    async def ping(self) -> dict:
+        """Ping the server at most once per DB_HEALTH_CACHE_SECONDS; probes share the cached result"""
+        if mongodb_client is None or not self.ready.is_set():
+            return {"ok": False, "latency_ms": None, "error": self.last_error or "not connected"}
+        async with self._ping_lock:
+            if time.monotonic() - self._ping_at < settings.db_health_cache_seconds:
+                return self._ping
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    mongodb_client.admin.command("ping"), settings.db_health_ping_timeout_seconds
+                )
+                self._ping = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2), "error": None}
+            except Exception as e:
+                self._ping = {"ok": False, "latency_ms": None, "error": str(e) or type(e).__name__}
+            self._ping_at = time.monotonic()
+            return self._ping
+    
+    def snapshot(self) -> dict:
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "uptime_seconds": round(time.monotonic() - self.connected_at, 1) if self.connected_at else None,
+            "pools": self.pool.stats(),
+        }
+
+
+db_state = DatabaseState()
+
+
+@registry.collector
+def _pool_metrics():
+    pools = db_state.pool.stats()
+    yield "mongodb_up", "gauge", "1 once the database is connected and initialised", [({}, int(db_state.status == "ready"))]
+    for field, kind in (("open", "gauge"), ("checked_out", "gauge"), ("created", "counter"), ("checkout_failures", "counter")):
+        yield f"mongodb_pool_connections_{field}", kind, f"Connection pool {field.replace('_', ' ')} per server", [
+            ({"server": server}, pool[field]) for server, pool in pools.items()
+        ]
+
+
+def document_models() -> list:
+    """Every Beanie document model of the app"""
+    try:
+        from .models.user import UserProfile
+        from .models.calendar import CalendarEvent, ActionStep, CalendarSyncState, TaskSchedule, SchedulerRun
+        from .models.avatar import AvatarConfiguration, Equipment
+        from .models.assessment import AssessmentResults
+        from .models.xp import XPRecord, XPRollup
+    except ImportError:
+        from models.user import UserProfile
+        from models.calendar import CalendarEvent, ActionStep, CalendarSyncState, TaskSchedule, SchedulerRun
+        from models.avatar import AvatarConfiguration, Equipment
+        from models.assessment import AssessmentResults
+        from models.xp import XPRecord, XPRollup
+    
+    return [
+        UserProfile,
+        CalendarEvent,
+        ActionStep,
+        CalendarSyncState,
+        TaskSchedule,
+        SchedulerRun,
+        AvatarConfiguration,
+        Equipment,
+        AssessmentResults,
+        XPRecord,
+        XPRollup
+    ]
+
+
 async def init_db():
     """Initialize database connection"""
     global mongodb_client
@@ -18,7 +164,8 @@ async def init_db():
     mongodb_client = AsyncIOMotorClient(
         settings.mongodb_url,
         tlsCAFile=certifi.where(),
-        serverSelectionTimeoutMS=5000
+        serverSelectionTimeoutMS=settings.db_server_selection_timeout_ms,
+        event_listeners=[db_state.pool, command_metrics] if settings.metrics_enabled else [db_state.pool]
     )
     
     # Test connection
@@ -26,34 +173,59 @@ async def init_db():
     
     database = mongodb_client[settings.mongodb_db_name]
     
-    # Import all models
-    try:
-        from .models.user import UserProfile
-        from .models.calendar import CalendarEvent, ActionStep
-        from .models.avatar import AvatarConfiguration, Equipment
-        from .models.assessment import AssessmentResults
-    except ImportError:
-        from models.user import UserProfile
-        from models.calendar import CalendarEvent, ActionStep
-        from models.avatar import AvatarConfiguration, Equipment
-        from models.assessment import AssessmentResults
+    # Bring indexes in line with the model declarations before Beanie looks at them
+    await reconcile_indexes(database, rebuild_conflicting=settings.index_rebuild_conflicting)
     
     # Initialize Beanie
-    await init_beanie(
-        database=database,
-        document_models=[
-            UserProfile,
-            CalendarEvent,
-            ActionStep,
-            AvatarConfiguration,
-            Equipment,
-            AssessmentResults
-        ]
-    )
+    await init_beanie(database=database, document_models=document_models())
     
     print(f"✓ Connected to MongoDB: {settings.mongodb_db_name}")
 
 
+def _discard_client():
+    global mongodb_client
+    if mongodb_client:
+        mongodb_client.close()
+        mongodb_client = None
+
+
+async def connect_with_retry():
+    """
+    Run init_db until it succeeds, backing off exponentially with full jitter.
+    Started as a background task so the app serves liveness checks immediately.
+    Only connection errors are retried. Anything else (an IndexConflict, bad
+    credentials, a Beanie error) will not go away by itself: the state becomes
+    "failed" and the error is raised.
+    """
+    delay = settings.db_reconnect_initial_seconds
+    while True:
+        db_state.status = "connecting"
+        db_state.attempts += 1
+        try:
+            await init_db()
+        except (ConnectionFailure, ServerSelectionTimeoutError, AutoReconnect) as e:
+            db_state.status = "unavailable"
+            db_state.last_error = str(e) or type(e).__name__
+            _discard_client()
+            wait = random.uniform(0, delay)
+            logger.warning("mongodb_connect_failed", attempt=db_state.attempts, error=db_state.last_error, retry_in=round(wait, 1))
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, settings.db_reconnect_max_seconds)
+            continue
+        except Exception as e:
+            # Retrying would repeat the same failure, and for an IndexConflict rebuild the index every time
+            db_state.status = "failed"
+            db_state.last_error = str(e) or type(e).__name__
+            _discard_client()
+            logger.error("mongodb_init_failed", attempt=db_state.attempts, error=db_state.last_error)
+            raise
+        db_state.status = "ready"
+        db_state.last_error = None
+        db_state.connected_at = time.monotonic()
+        db_state.ready.set()
+        return
+
+
 async def close_db():
     """Close database connection"""
     global mongodb_client
@@ -0,0 +1,84 @@
+import hashlib
+import time
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import jwt
+
+try:
+    from .cache import TTLCache, user_cache
+    from .config import settings
+    from .models.user import UserProfile
+except ImportError:
+    from cache import TTLCache, user_cache
+    from config import settings
+    from models.user import UserProfile
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Verified JWT claims keyed by a hash of the token, so hot tokens skip HMAC verification
+_claims_cache = TTLCache(maxsize=settings.auth_claims_cache_size, ttl=settings.auth_claims_cache_ttl_seconds)
+
+SLIM_USER_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "email": 1,
+    "full_name": 1,
+    "life_pillar_levels": 1,
+    "total_xp": 1,
+}
+
+
+def verify_token(token: str) -> dict:
+    """Return the claims of a valid JWT, raising 401 otherwise"""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _claims_cache.get(key)
+    now = time.time()
+    if claims is not None and claims["exp"] > now:
+        return claims
+    
+    try:
+        claims = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    except jwt.JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if not claims.get("sub") or "exp" not in claims:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Never cache a token past its own expiry
+    _claims_cache.set(key, claims, ttl=min(_claims_cache.ttl, claims["exp"] - now))
+    return claims
+
+
+async def get_current_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> dict:
+    """Claims of the Bearer token sent with the request"""
+    if credentials is None or credentials.scheme.lower() != "bearer":
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return verify_token(credentials.credentials)
+
+
+async def get_current_user_id(claims: dict = Depends(get_current_claims)) -> str:
+    return claims["sub"]
+
+
+async def load_slim_user(user_id: str) -> Optional[dict]:
+    """Read-through, coalesced cache of the projected profile fields most requests need"""
+    return await user_cache.get(
+        user_id,
+        lambda: UserProfile.get_motor_collection().find_one({"user_id": user_id}, SLIM_USER_PROJECTION)
+    )
+
+
+async def get_current_user(user_id: str = Depends(get_current_user_id)) -> dict:
+    """Slim profile of the authenticated user"""
+    user = await load_slim_user(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+import httpx
+from fastapi import Request
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _HostStats:
+    __slots__ = ("requests", "errors", "retries", "total_ms", "max_ms")
+    
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": self.total_ms / self.requests if self.requests else 0.0,
+            "max_ms": self.max_ms,
+        }
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the pooled transport with per-host timeouts, jittered exponential
+    backoff on 429/5xx and connection failures, and latency accounting.
+    """
+    
+    def __init__(
+        self,
+        transport: httpx.AsyncHTTPTransport,
+        retries: int = 2,
+        backoff: float = 0.2,
+        backoff_max: float = 2.0,
+        host_timeouts: Optional[Dict[str, float]] = None
+    ):
+        self._transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.host_timeouts = host_timeouts or {}
+        self._stats: Dict[str, _HostStats] = defaultdict(_HostStats)
+    
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # Full jitter keeps many workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        stats = self._stats[host]
+        if host in self.host_timeouts:
+            request.extensions["timeout"] = httpx.Timeout(self.host_timeouts[host]).as_dict()
+        
+        attempt = 0
+        while True:
+            response = None
+            start = time.perf_counter()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Nothing reached the server, so any method is safe to retry
+                stats.errors += 1
+                if attempt >= self.retries:
+                    raise
+            else:
+                elapsed = (time.perf_counter() - start) * 1000
+                stats.requests += 1
+                stats.total_ms += elapsed
+                stats.max_ms = max(stats.max_ms, elapsed)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                await response.aclose()
+            
+            stats.retries += 1
+            await asyncio.sleep(self._delay(attempt, response))
+            attempt += 1
+    
+    async def aclose(self):
+        await self._transport.aclose()
+    
+    def stats(self) -> dict:
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": {"active": len(connections) - idle, "idle": idle},
+            "hosts": {host: s.as_dict() for host, s in self._stats.items()},
+        }
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Application-scoped client; created once in lifespan and shared by all requests"""
+    transport = RetryTransport(
+        httpx.AsyncHTTPTransport(
+            http2=settings.http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_pool_max_connections,
+                max_keepalive_connections=settings.http_pool_max_keepalive,
+                keepalive_expiry=settings.http_keepalive_expiry_seconds,
+            ),
+        ),
+        retries=settings.http_retries,
+        backoff=settings.http_retry_backoff_seconds,
+        backoff_max=settings.http_retry_backoff_max_seconds,
+        host_timeouts=settings.http_host_timeouts,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds),
+    )
+
+
+def client_stats(client: httpx.AsyncClient) -> dict:
+    """Pool and latency stats of a client built by create_http_client"""
+    transport = client._transport
+    return transport.stats() if isinstance(transport, RetryTransport) else {}
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """FastAPI dependency returning the shared client"""
+    return request.app.state.http_client
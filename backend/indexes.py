@@ -0,0 +1,329 @@
+"""
+Index reconciliation and query-plan verification.
+
+The models' `Settings.indexes` are the single source of truth for indexes.
+`reconcile_indexes` runs on startup before Beanie initialises and creates
+missing indexes. A live index whose options changed (e.g. a plain index that
+is now unique) stops startup with an IndexConflict: dropping and rebuilding it
+leaves the collection without that index for the whole build, so that is done
+deliberately from the CLI.
+
+Usage:
+    python -m backend.indexes                     # report declared vs live
+    python -m backend.indexes --sync              # create missing
+    python -m backend.indexes --sync --rebuild-conflicting
+    python -m backend.indexes --sync --drop-undeclared
+    python -m backend.indexes --verify            # explain() the canonical queries
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Options that MongoDB reports but that do not change what an index is
+IGNORED_OPTIONS = {"key", "v", "ns", "background"}
+
+INDEX_NOT_FOUND = 27
+
+
+class IndexConflict(Exception):
+    """
+    A live index cannot be brought in line with its declaration without
+    fixing the data or the declaration first. Retrying will not help.
+    """
+
+
+def _index_models(declared: List[Any]) -> List[IndexModel]:
+    """Normalize Beanie's index declarations (field names or IndexModels) to IndexModels"""
+    models = []
+    for index in declared:
+        if isinstance(index, IndexModel):
+            models.append(index)
+        elif isinstance(index, str):
+            models.append(IndexModel([(index, ASCENDING)]))
+        else:
+            models.append(IndexModel(index))
+    return models
+
+
+def _key(key) -> tuple:
+    items = key.items() if hasattr(key, "items") else key
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in items)
+
+
+def _options(info: dict) -> dict:
+    return {k: v for k, v in info.items() if k not in IGNORED_OPTIONS}
+
+
+def diff_indexes(declared: List[Any], live: Dict[str, dict]) -> List[dict]:
+    """
+    Compare declared indexes with `index_information()` output.
+    
+    Every entry has a status: ok, missing, conflict (same key, different
+    options or name) or undeclared (live only). `_id_` is never reported.
+    """
+    live_by_key = {_key(info["key"]): (name, info) for name, info in live.items() if name != "_id_"}
+    matched = set()
+    entries = []
+    
+    for model in _index_models(declared):
+        document = dict(model.document)
+        key = _key(document["key"])
+        wanted = _options(document)
+        found = live_by_key.get(key)
+        if found is None:
+            entries.append({"status": "missing", "name": document["name"], "key": key, "declared": wanted, "model": model})
+            continue
+        name, info = found
+        matched.add(name)
+        status = "ok" if _options({**info, "name": name}) == wanted else "conflict"
+        entries.append({"status": status, "name": name, "key": key, "declared": wanted, "live": _options({**info, "name": name}), "model": model})
+    
+    for name, info in live.items():
+        if name != "_id_" and name not in matched:
+            entries.append({"status": "undeclared", "name": name, "key": _key(info["key"]), "live": _options({**info, "name": name})})
+    
+    return entries
+
+
+async def _drop_index(collection, name: str):
+    try:
+        await collection.drop_index(name)
+    except OperationFailure as e:
+        # Another instance got there first
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+
+async def _rebuild(collection, entry: dict):
+    """Drop a conflicting index and build the declared one, restoring the old one if the build fails"""
+    live = entry["live"]
+    await _drop_index(collection, live["name"])
+    try:
+        await collection.create_indexes([entry["model"]])
+    except OperationFailure as e:
+        await collection.create_index(list(entry["key"]), **live)
+        raise IndexConflict(
+            f"Could not rebuild index {collection.name}.{entry['name']} as {entry['declared']}: {e}. "
+            f"The previous index was restored; fix the data (e.g. remove duplicates) and run it again."
+        )
+
+
+async def reconcile_collection(
+    collection,
+    declared: List[Any],
+    rebuild_conflicting: bool = False,
+    drop_undeclared: bool = False,
+) -> List[dict]:
+    """Bring one collection's indexes in line with its declaration and return the diff that was acted on"""
+    live = await collection.index_information()
+    entries = diff_indexes(declared, live)
+    
+    missing = [e["model"] for e in entries if e["status"] == "missing"]
+    if missing:
+        await collection.create_indexes(missing)
+    
+    for entry in entries:
+        if entry["status"] == "conflict":
+            if rebuild_conflicting:
+                await _rebuild(collection, entry)
+            else:
+                raise IndexConflict(
+                    f"Index {collection.name}.{entry['name']} differs from its declaration: "
+                    f"live {entry['live']}, declared {entry['declared']}. "
+                    f"Rebuild it with: python -m backend.indexes --sync --rebuild-conflicting"
+                )
+        elif entry["status"] == "undeclared" and drop_undeclared:
+            await _drop_index(collection, entry["name"])
+    
+    return entries
+
+
+async def reconcile_indexes(database, rebuild_conflicting: bool = False, drop_undeclared: bool = False) -> Dict[str, List[dict]]:
+    """Reconcile every model's indexes; called from init_db before init_beanie"""
+    try:
+        from .database import document_models
+    except ImportError:
+        from database import document_models
+    
+    report = {}
+    for model in document_models():
+        settings = model.Settings
+        entries = await reconcile_collection(
+            database[settings.name],
+            getattr(settings, "indexes", []),
+            rebuild_conflicting=rebuild_conflicting,
+            drop_undeclared=drop_undeclared,
+        )
+        report[settings.name] = entries
+        
+        changed = [e for e in entries if e["status"] in ("missing", "conflict")]
+        undeclared = [e["name"] for e in entries if e["status"] == "undeclared"]
+        if changed:
+            print(f"✓ Indexes on {settings.name}: " + ", ".join(f"{e['status']} {e['name']}" for e in changed))
+        if undeclared and not drop_undeclared:
+            print(f"⚠️  Undeclared indexes on {settings.name}: {', '.join(undeclared)}")
+    
+    return report
+
+
+# Placeholder values for the canonical queries
+_NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_OID = ObjectId("000000000000000000000000")
+
+
+def canonical_queries() -> List[tuple]:
+    """
+    (collection, description, filter, sort) of the queries the API and the
+    batch jobs issue, each of which must be served by an index. The filters
+    come from the same helpers and sort constants the code runs, so a change
+    to a query is verified as it is.
+    """
+    try:
+        from .models.enums import LifePillar
+        from .pagination import keyset_filter
+        from .routers.assessments import HISTORY_SORT, TREND_SORT
+        from .routers.tasks import TASK_SORTS, open_task_filter, task_filter
+        from .routers.users import USER_SORTS, XP_HISTORY_SORT, xp_history_filter
+        from .services import calendar_sync, freebusy, google_tokens, scheduler, xp_ledger
+    except ImportError:
+        from models.enums import LifePillar
+        from pagination import keyset_filter
+        from routers.assessments import HISTORY_SORT, TREND_SORT
+        from routers.tasks import TASK_SORTS, open_task_filter, task_filter
+        from routers.users import USER_SORTS, XP_HISTORY_SORT, xp_history_filter
+        from services import calendar_sync, freebusy, google_tokens, scheduler, xp_ledger
+    
+    by_created, by_due = TASK_SORTS["created_at"], TASK_SORTS["due_date"]
+    return [
+        # routers/tasks.py
+        ("action_steps", "tasks by created_at", task_filter("u"), by_created),
+        ("action_steps", "tasks by created_at, completed filter", task_filter("u", completed=False), by_created),
+        ("action_steps", "tasks by created_at, next page", {"$and": [task_filter("u"), keyset_filter(by_created, [_NOW, _OID])]}, by_created),
+        ("action_steps", "tasks by due_date", task_filter("u", due_after=_NOW, sort="due_date"), by_due),
+        ("action_steps", "tasks by due_date, completed filter", task_filter("u", completed=False, sort="due_date"), by_due),
+        ("action_steps", "complete task", open_task_filter(_OID), None),
+        # routers/users.py, dependencies.py, services/google_tokens.py
+        ("user_profiles", "user by user_id", {"user_id": "u"}, None),
+        ("user_profiles", "user by email", {"email": "e"}, None),
+        ("user_profiles", "tokens expiring", google_tokens.expiring_filter(_NOW, _NOW), google_tokens.EXPIRING_SORT),
+        ("user_profiles", "users by level", {}, USER_SORTS["level"]),
+        ("user_profiles", "users by level, next page", keyset_filter(USER_SORTS["level"], [1, 0, "u"]), USER_SORTS["level"]),
+        ("user_profiles", "users by xp", {}, USER_SORTS["xp"]),
+        ("xp_records", "xp history", xp_history_filter("u"), XP_HISTORY_SORT),
+        ("xp_records", "xp history by pillar", xp_history_filter("u", LifePillar.HEALTH), XP_HISTORY_SORT),
+        # routers/assessments.py
+        ("assessment_results", "latest assessment", {"user_id": "u"}, HISTORY_SORT),
+        ("assessment_results", "assessment history, next page", {"$and": [{"user_id": "u"}, keyset_filter(HISTORY_SORT, [_NOW, _OID])]}, HISTORY_SORT),
+        ("assessment_results", "assessment trend", {"user_id": "u"}, TREND_SORT),
+        # services/calendar_sync.py, services/freebusy.py
+        ("calendar_events", "event by user_id/event_id", {"user_id": "u", "event_id": {"$in": ["a", "b"]}}, None),
+        ("calendar_events", "busy intervals", freebusy.busy_filter("u", _NOW, _NOW), None),
+        ("calendar_events", "events by start", {"user_id": "u"}, [("start_time", ASCENDING)]),
+        ("calendar_events", "events changed by a sync", calendar_sync.changed_events_filter("u", _NOW), None),
+        ("calendar_sync_states", "sync state", {"user_id": "u"}, None),
+        # services/xp_ledger.py
+        ("xp_records", "rollup rebuild", xp_ledger.rebuild_filter(_NOW), xp_ledger.REBUILD_SORT),
+        ("xp_records", "rollup rebuild of one user", xp_ledger.rebuild_filter(_NOW, "u"), xp_ledger.REBUILD_SORT),
+        ("xp_rollups", "xp trend", xp_ledger.trend_filter("u", "day", _NOW), xp_ledger.TREND_SORT),
+        # services/scheduler.py
+        ("action_steps", "scheduler open tasks", scheduler.open_tasks_filter(["u", "v"]), None),
+        ("calendar_events", "scheduler busy intervals", scheduler.busy_filter(["u", "v"], _NOW, _NOW), None),
+        ("action_steps", "scheduler change detection", scheduler.task_changes_filter(_NOW), None),
+        ("calendar_sync_states", "scheduler calendar change detection", scheduler.calendar_changes_filter(_NOW), None),
+        ("task_schedules", "scheduler deletion detection", scheduler.task_deletions_filter(_NOW), None),
+        ("task_schedules", "schedule by user", {"user_id": "u"}, None),
+        ("scheduler_runs", "scheduler watermark", {"job": scheduler.REPLAN_JOB}, None),
+        # avatar
+        ("avatar_configurations", "avatar by user", {"user_id": "u"}, None),
+        ("equipment", "equipment by item_id", {"item_id": "i"}, None),
+    ]
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage of an explain() winning plan, across classic and SBE layouts"""
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    yield plan
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for stage in plan.get("inputStages", []):
+        yield from _plan_stages(stage)
+
+
+def _winning_plan(explain: dict) -> dict:
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Sharded clusters nest the per-shard plans
+    if plan.get("shards"):
+        return plan["shards"][0]["winningPlan"]
+    return plan
+
+
+async def verify_query_plans(database, queries: Optional[List[tuple]] = None) -> List[dict]:
+    """explain() each canonical query and report the indexes it uses, collection scans and blocking sorts"""
+    results = []
+    for collection, description, query, sort in queries or canonical_queries():
+        cursor = database[collection].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(_winning_plan(explain)))
+        results.append({
+            "collection": collection,
+            "query": description,
+            "indexes": sorted({s["indexName"] for s in stages if "indexName" in s}),
+            "collscan": any(s.get("stage") == "COLLSCAN" for s in stages),
+            "blocking_sort": any(s.get("stage") == "SORT" for s in stages),
+        })
+    return results
+
+
+async def _main(args) -> int:
+    try:
+        from .database import document_models
+        from .config import settings
+    except ImportError:
+        from database import document_models
+        from config import settings
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import certifi
+    
+    client = AsyncIOMotorClient(settings.mongodb_url, tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000)
+    database = client[settings.mongodb_db_name]
+    status = 0
+    try:
+        if args.sync:
+            await reconcile_indexes(database, rebuild_conflicting=args.rebuild_conflicting, drop_undeclared=args.drop_undeclared)
+        
+        for model in document_models():
+            name = model.Settings.name
+            live = await database[name].index_information()
+            for entry in diff_indexes(getattr(model.Settings, "indexes", []), live):
+                print(f"{entry['status']:<11} {name}.{entry['name']} {list(entry['key'])}")
+                if entry["status"] in ("missing", "conflict"):
+                    status = 1
+        
+        if args.verify:
+            for result in await verify_query_plans(database):
+                flag = "COLLSCAN" if result["collscan"] else ("SORT" if result["blocking_sort"] else "ok")
+                print(f"{flag:<9} {result['collection']}: {result['query']} -> {', '.join(result['indexes']) or '-'}")
+                if result["collscan"]:
+                    status = 1
+    finally:
+        client.close()
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile declared indexes and verify query plans")
+    parser.add_argument("--sync", action="store_true", help="create missing indexes and rebuild conflicting ones")
+    parser.add_argument("--drop-undeclared", action="store_true", help="with --sync, drop indexes no model declares")
+    parser.add_argument("--rebuild-conflicting", action="store_true",
+                        help="with --sync, drop and rebuild conflicting indexes instead of failing on them")
+    parser.add_argument("--verify", action="store_true", help="explain() the canonical queries and fail on collection scans")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,33 @@
+"""
+Lean read path for list endpoints.
+
+Rows are read with Motor using a projection of just the response fields, mapped
+straight into plain dicts and serialized with orjson. This skips Beanie document
+hydration and FastAPI's response-model validation, which otherwise validate every
+row twice. Endpoints keep `response_model=` so the OpenAPI schema is unchanged;
+the row builders must produce exactly that shape.
+"""
+from typing import Any, Iterable, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def projection(response_model: Type[BaseModel], id_field: str = "id") -> dict:
+    """Projection fetching the fields of `response_model`; `id_field` maps to _id, which Mongo returns anyway"""
+    return {field: 1 for field in response_model.model_fields if field != id_field}
+
+
+def plain_keys(mapping: dict) -> dict:
+    """Enum keys (e.g. LifePillar from model defaults) as plain strings; orjson only takes str keys"""
+    return {getattr(k, "value", k): v for k, v in mapping.items()}
+
+
+def lean_response(content: Any, status_code: int = 200) -> ORJSONResponse:
+    """Serialize already-shaped rows with orjson, bypassing response-model validation"""
+    return ORJSONResponse(content, status_code=status_code)
+
+
+def lean_page(items: Iterable[dict], cursor) -> ORJSONResponse:
+    """Response body for a keyset page: {"items": [...], "next_cursor": ...}"""
+    return ORJSONResponse({"items": list(items), "next_cursor": cursor})
@@ -0,0 +1,26 @@
+import logging
+
+import structlog
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+
+def configure_logging():
+    """Structured logs for instrumentation: JSON lines in production, readable key=value locally"""
+    renderer = structlog.processors.JSONRenderer() if settings.log_json else structlog.dev.ConsoleRenderer(colors=False)
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            renderer,
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(settings.log_level.upper())),
+        cache_logger_on_first_use=True,
+    )
+
+
+configure_logging()
+logger = structlog.get_logger()
@@ -1,33 +1,96 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 try:
+    from .cache import read_stats
     from .config import settings
-    from .database import init_db, close_db
+    from .database import close_db, connect_with_retry, db_state
+    from .http_client import client_stats, create_http_client
+    from .logs import logger
+    from .metrics import MetricsMiddleware, command_metrics, registry, render_metrics
+    from .profiling import ProfilingMiddleware
+    from .services import assets, equipment, events
+    from .services.google_tokens import TokenRefresher
+    from .services.leaderboard import LeaderboardRefresher, init_leaderboard
+    from .services.progression import backfill_user_aggregates
 except ImportError:
+    from cache import read_stats
     from config import settings
-    from database import init_db, close_db
+    from database import close_db, connect_with_retry, db_state
+    from http_client import client_stats, create_http_client
+    from logs import logger
+    from metrics import MetricsMiddleware, command_metrics, registry, render_metrics
+    from profiling import ProfilingMiddleware
+    from services import assets, equipment, events
+    from services.google_tokens import TokenRefresher
+    from services.leaderboard import LeaderboardRefresher, init_leaderboard
+    from services.progression import backfill_user_aggregates
 
 load_dotenv()
 
 
+async def _warm_up():
+    """Compile the recommendation rules off the startup path; this is what first imports numpy"""
+    try:
+        from .services.rules import get_rule_engine
+    except ImportError:
+        from services.rules import get_rule_engine
+    await asyncio.to_thread(get_rule_engine)
+
+
+async def _start_services(app: FastAPI):
+    """Connect to MongoDB (retrying until it is reachable), then start what depends on it"""
+    await connect_with_retry()
+    print("✓ Database connected successfully")
+    backfilled = await backfill_user_aggregates()
+    if backfilled:
+        print(f"✓ Backfilled level/XP aggregates on {backfilled} profiles")
+    await init_leaderboard()
+    print("✓ Leaderboards loaded")
+    app.state.leaderboard_refresher = LeaderboardRefresher()
+    app.state.leaderboard_refresher.start()
+    await equipment.load_catalog()
+    print(f"✓ Equipment catalog loaded: {len(equipment.get_catalog().items)} items")
+    app.state.catalog_refresher = equipment.CatalogRefresher()
+    app.state.catalog_refresher.start()
+    if settings.google_token_refresh_enabled:
+        app.state.token_refresher = TokenRefresher(app.state.http_client)
+        app.state.token_refresher.start()
+    app.state.services_ready = True
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    try:
-        await init_db()
-        print("✓ Database connected successfully")
-    except Exception as e:
-        print(f"⚠️  Database connection failed: {e}")
-        print("⚠️  API running without database")
+    # Startup: nothing here waits on the database, so liveness checks pass immediately
+    app.state.http_client = create_http_client()
+    app.state.token_refresher = None
+    app.state.catalog_refresher = None
+    app.state.leaderboard_refresher = None
+    app.state.services_ready = False
+    await events.init_event_hub()
+    app.state.warm_up = asyncio.create_task(_warm_up())
+    app.state.startup = asyncio.create_task(_start_services(app))
     yield
     # Shutdown
+    for task in (app.state.startup, app.state.warm_up):
+        task.cancel()
+    await asyncio.gather(app.state.startup, app.state.warm_up, return_exceptions=True)
+    if app.state.token_refresher:
+        await app.state.token_refresher.stop()
+    if app.state.catalog_refresher:
+        await app.state.catalog_refresher.stop()
+    if app.state.leaderboard_refresher:
+        await app.state.leaderboard_refresher.stop()
+    await events.hub.stop()
+    await app.state.http_client.aclose()
     try:
         await close_db()
-    except:
-        pass
+    except Exception as e:
+        logger.warning("mongodb_close_failed", error=str(e))
 
 
 app = FastAPI(
@@ -44,6 +107,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+# Added last, so it is outermost and its latency covers the other middleware too
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+
+@registry.collector
+def _app_metrics():
+    hub = events.hub.stats()
+    yield "ws_connections", "gauge", "Open WebSocket connections", [({}, hub["connections"])]
+    yield "ws_events_dropped_total", "counter", "Queued events dropped for a resync", [({}, hub["dropped"])]
+    yield "ws_events_coalesced_total", "counter", "Queued events replaced by a newer one", [({}, hub["coalesced"])]
+    reads = read_stats()
+    for field, metric in (("loads", "loads"), ("coalesced", "coalesced"), ("cache_hits", "hits")):
+        yield f"read_cache_{metric}_total", "counter", f"Hot reads answered by {metric} per cache", [
+            ({"cache": name}, stats[field]) for name, stats in reads.items()
+        ]
+    if assets.store is not None:
+        mapped = assets.store.stats()
+        yield "asset_files_mapped", "gauge", "Asset files kept memory-mapped and hashed", [({}, mapped["files"])]
+        yield "asset_mapped_bytes", "gauge", "Bytes of memory-mapped asset files", [({}, mapped["mapped_bytes"])]
 
 
 @app.get("/")
@@ -57,16 +141,69 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    ping = await db_state.ping()
+    return {"status": "healthy", "database": "connected" if ping["ok"] else db_state.status}
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; never touches the database"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready once the database answers and startup services are running; 503 otherwise"""
+    ping = await db_state.ping()
+    startup = app.state.startup
+    ready = ping["ok"] and app.state.services_ready
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "database": {**db_state.snapshot(), "ping": ping},
+        "services": "running" if app.state.services_ready else ("failed" if startup.done() else "starting"),
+    }
+    if startup.done() and not startup.cancelled() and startup.exception():
+        body["services_error"] = str(startup.exception())
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition of this worker's metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/slow-queries")
+async def slow_queries():
+    """Most recent MongoDB commands slower than METRICS_SLOW_QUERY_MS, with redacted query shapes"""
+    return command_metrics.slow_samples()
+
+
+@app.get("/health/reads")
+async def read_cache_stats():
+    """Coalesced and cached hot reads per endpoint, since worker start"""
+    return read_stats()
+
+
+@app.get("/health/http")
+async def http_client_stats():
+    """Connection pool and per-host latency of the shared outbound HTTP client"""
+    return client_stats(app.state.http_client)
 
 
 # Include routers
 try:
-    from .routers import users, tasks, assessments, auth
+    from .routers import users, tasks, assessments, auth, leaderboards, calendar, assets as assets_router, avatars, equipment as equipment_router, events as events_router
 except ImportError:
-    from routers import users, tasks, assessments, auth
+    from routers import users, tasks, assessments, auth, leaderboards, calendar, assets as assets_router, avatars, equipment as equipment_router, events as events_router
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(tasks.router)
 app.include_router(assessments.router)
+app.include_router(leaderboards.router)
+app.include_router(calendar.router)
+app.include_router(equipment_router.router)
+app.include_router(avatars.router)
+app.include_router(assets_router.router)
+app.include_router(events_router.router)
@@ -0,0 +1,277 @@
+"""
+In-process metrics in the Prometheus text format, plus the collectors that feed them:
+an ASGI middleware for HTTP requests and a pymongo CommandListener for MongoDB.
+
+Metrics are per worker; scrape every worker (or run one worker per container).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+try:
+    from .config import settings
+    from .logs import logger
+except ImportError:
+    from config import settings
+    from logs import logger
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()  # pymongo listeners run on driver threads
+    
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+    
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+    
+    def observe(self, value: float, *labels):
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for labels, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, labels)} {row[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, labels)} {cumulative}")
+        return lines
+
+
+# A collector returns (name, kind, help, [(labels dict, value), ...]) for values read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.collectors: List[Collector] = []
+    
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def collector(self, fn: Collector) -> Collector:
+        self.collectors.append(fn)
+        return fn
+    
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                logger.warning("metrics_collector_failed", collector=collect.__name__, error=str(e))
+                continue
+            for name, kind, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_label_str(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.add(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+))
+http_duration = registry.add(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+))
+http_in_flight = registry.add(Gauge(
+    "http_requests_in_flight", "HTTP requests being served", ("method",)
+))
+mongo_duration = registry.add(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection", ("collection", "command")
+))
+mongo_failures = registry.add(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection", ("collection", "command")
+))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route template"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        http_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method)
+            # The route template (e.g. /users/{user_id}) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            elapsed = time.perf_counter() - started
+            http_duration.observe(elapsed, method, route)
+            http_requests.inc(method, route, str(status))
+            if elapsed * 1000 >= settings.metrics_slow_request_ms:
+                logger.warning("slow_request", method=method, route=route, status=status, ms=round(elapsed * 1000, 1))
+
+
+# Command fields that describe a statement's shape; filter values are redacted
+_SHAPE_FIELDS = ("filter", "q", "u", "pipeline")
+_KEEP_FIELDS = ("sort", "projection", "limit", "hint")
+
+
+def _redact(value, depth: int = 0):
+    """Keep keys and operators, replace values, so samples show the query shape without user data"""
+    if depth > 8:
+        return "..."
+    if isinstance(value, dict):
+        return {k: _redact(v, depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(v, depth + 1) for v in value[:5]]
+    return "?"
+
+
+def _shape(command: dict) -> dict:
+    """Slow-query sample of a command, without documents being written or literal values"""
+    sample = {k: command[k] for k in _KEEP_FIELDS if k in command}
+    sample.update({k: _redact(command[k]) for k in _SHAPE_FIELDS if k in command})
+    for key in ("updates", "deletes"):
+        if key in command:
+            sample[key] = [_redact(op.get("q", {})) for op in command[key][:3]]
+    if "documents" in command:
+        sample["documents"] = len(command["documents"])
+    return sample
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per-collection command latencies and failures, with a ring buffer of slow-command samples"""
+    
+    def __init__(self, slow_ms: float, samples: int):
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=samples)
+        self._pending: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(event) -> tuple:
+        return (event.connection_id, event.request_id, event.operation_id)
+    
+    def started(self, event):
+        command = event.command
+        # getMore names its collection separately; its own value is the cursor id
+        collection = command.get("collection" if event.command_name == "getMore" else event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"  # admin and aggregate-on-database commands
+        with self._lock:
+            self._pending[self._key(event)] = (collection, event.database_name, command)
+    
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            collection, database, command = self._pending.pop(self._key(event), ("-", "-", None))
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, collection, event.command_name)
+        if failed:
+            mongo_failures.inc(collection, event.command_name)
+        if seconds * 1000 >= self.slow_ms:
+            entry = {
+                "at": time.time(),
+                "ms": round(seconds * 1000, 1),
+                "database": database,
+                "collection": collection,
+                "command": event.command_name,
+                "shape": _shape(command) if command is not None else None,
+                "failed": failed,
+            }
+            self.slow.append(entry)
+            logger.warning("slow_mongodb_command", **{k: v for k, v in entry.items() if k != "shape"})
+    
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+    
+    def failed(self, event):
+        self._finish(event, failed=True)
+    
+    def slow_samples(self) -> List[dict]:
+        return list(reversed(self.slow))
+
+
+command_metrics = CommandMetrics(settings.metrics_slow_query_ms, settings.metrics_slow_query_samples)
+
+
+def render_metrics() -> str:
+    return registry.render()
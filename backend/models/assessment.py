@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Optional, List
 from datetime import datetime
 
@@ -15,11 +16,19 @@ class AssessmentResults(Document):
     # Raw responses (for future analysis)
     responses: dict = {}
     
-    # Generated recommendations (will be AI-generated later)
+    # Rule-based at submission, replaced by AI-generated ones when they arrive
     recommendations: List[str] = []
+    recommendations_source: str = "rules"  # rules, ai
     
     completed_date: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "assessment_results"
-        indexes = ["user_id", "completed_date"]
+        indexes = [
+            "completed_date",
+            # Latest assessment, history pages and trends are all one scan of this index
+            IndexModel(
+                [("user_id", ASCENDING), ("completed_date", DESCENDING), ("_id", DESCENDING)],
+                name="user_completed_desc",
+            ),
+        ]
@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -9,8 +10,22 @@ except ImportError:
     from enums import EquipmentType, LifePillar
 
 
+class MeshRef(BaseModel):
+    """A face mesh stored in GridFS in the binary format of services/mesh.py"""
+    file_id: str
+    vertex_count: int
+    index_count: int
+    size_bytes: int
+    sha256: str
+    quantized: bool = False
+    compressed: bool = False
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class FaceScanData(BaseModel):
     scan_image_url: Optional[str] = None
+    mesh: Optional[MeshRef] = None
+    # Legacy inline mesh (lists of numbers); moved to GridFS by `python -m backend.services.mesh`
     mesh_data: Optional[Dict[str, Any]] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -43,7 +58,7 @@ class Equipment(Document):
     
     class Settings:
         name = "equipment"
-        indexes = ["item_id", "type"]
+        indexes = [IndexModel([("item_id", ASCENDING)], unique=True), "type"]
     
     class Config:
         protected_namespaces = ()
@@ -71,7 +86,7 @@ class AvatarConfiguration(Document):
     
     class Settings:
         name = "avatar_configurations"
-        indexes = ["user_id"]
+        indexes = [IndexModel([("user_id", ASCENDING)], unique=True)]
     
     class Config:
         protected_namespaces = ()
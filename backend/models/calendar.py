@@ -1,5 +1,6 @@
 from beanie import Document
-from pydantic import Field
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Optional, List
 from datetime import datetime
 
@@ -23,12 +24,45 @@ class CalendarEvent(Document):
     # Life pillar categorization
     life_pillar_tags: List[LifePillar] = []
     
-    # Sync metadata
+    # Sync metadata: last_synced is bumped whenever a sync sees the event, changed_at only when its content differed
     last_synced: datetime = Field(default_factory=datetime.utcnow)
+    changed_at: Optional[datetime] = None
     
     class Settings:
         name = "calendar_events"
-        indexes = ["user_id", "event_id", "start_time"]
+        indexes = [
+            "event_id",
+            "start_time",
+            # Sync upserts and deletes address events by (user_id, event_id)
+            IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)], name="user_event", unique=True),
+            IndexModel([("user_id", ASCENDING), ("start_time", ASCENDING)], name="user_start"),
+            IndexModel([("last_synced", ASCENDING)], name="last_synced"),
+            # Free/busy overlap queries: end_time > X bounds the scan, start_time < Y is checked in the index
+            IndexModel(
+                [("user_id", ASCENDING), ("end_time", ASCENDING), ("start_time", ASCENDING)],
+                name="user_end_start",
+            ),
+        ]
+
+
+class CalendarSyncState(Document):
+    """Google Calendar incremental sync position of one user"""
+    user_id: str
+    calendar_id: str = "primary"
+    
+    # nextSyncToken from the last completed sync; None forces a full sync
+    sync_token: Optional[str] = None
+    last_synced: Optional[datetime] = None
+    last_full_sync: Optional[datetime] = None
+    # Last sync that created, edited or deleted an event; what the re-planner looks at
+    changed_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "calendar_sync_states"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+            IndexModel([("changed_at", ASCENDING)], name="changed_at"),
+        ]
 
 
 class ActionStep(Document):
@@ -58,4 +92,66 @@ class ActionStep(Document):
     
     class Settings:
         name = "action_steps"
-        indexes = ["user_id", "completed", "life_pillar", "due_date"]
+        indexes = [
+            "completed",
+            "life_pillar",
+            "due_date",
+            # Keyset pagination for GET /tasks/user/{user_id}: one index per sort order
+            IndexModel(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_created_desc",
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("completed", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_completed_created_desc",
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+                name="user_due_asc",
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("completed", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+                name="user_completed_due_asc",
+            ),
+            # Change detection for the scheduler batch job
+            IndexModel([("created_at", ASCENDING)], name="created_at"),
+            IndexModel([("completed_at", ASCENDING)], name="completed_at", sparse=True),
+        ]
+
+
+
+class ScheduledTask(BaseModel):
+    task_id: str
+    title: str
+    start: datetime
+    end: datetime
+    at_risk: bool = False  # Only fits after its due date
+
+
+class TaskSchedule(Document):
+    """Latest auto-scheduler plan of one user"""
+    user_id: str
+    generated_at: datetime = Field(default_factory=datetime.utcnow)
+    horizon_start: datetime
+    horizon_end: datetime
+    entries: List[ScheduledTask] = []
+    unscheduled: List[str] = []  # task ids that did not fit in the horizon
+    # Set when a task is deleted (and dropped from the entries); the re-planner looks at it
+    tasks_changed_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "task_schedules"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+            IndexModel([("tasks_changed_at", ASCENDING)], name="tasks_changed_at", sparse=True),
+        ]
+
+
+class SchedulerRun(Document):
+    """Bookkeeping of batch scheduler jobs"""
+    job: str
+    last_run: datetime
+    
+    class Settings:
+        name = "scheduler_runs"
+        indexes = [IndexModel([("job", ASCENDING)], name="job", unique=True)]
@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import BaseModel, EmailStr, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Optional, Dict
 from datetime import datetime
 
@@ -13,6 +14,7 @@ class GoogleTokens(BaseModel):
     access_token: str
     refresh_token: Optional[str] = None
     token_expiry: datetime
+    refreshing_until: Optional[datetime] = None  # refresh lease, see services/google_tokens.py
 
 
 class UserPreferences(BaseModel):
@@ -48,6 +50,9 @@ class UserProfile(Document):
         LifePillar.FINANCE: 0,
         LifePillar.RECREATION: 0,
     }
+    # Maintained by the XP update pipeline: max of life_pillar_levels and sum of total_xp
+    overall_level: int = 1
+    xp_total: int = 0
     
     # Avatar reference
     avatar_config_id: Optional[str] = None
@@ -58,4 +63,15 @@ class UserProfile(Document):
     
     class Settings:
         name = "user_profiles"
-        indexes = ["user_id", "email"]
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+            IndexModel([("email", ASCENDING)], unique=True),
+            # Background refresh scans for tokens about to expire
+            IndexModel([("google_tokens.token_expiry", ASCENDING)], name="google_token_expiry", sparse=True),
+            # Keyset pagination of GET /users by level or XP; user_id makes the order total
+            IndexModel(
+                [("overall_level", DESCENDING), ("xp_total", DESCENDING), ("user_id", ASCENDING)],
+                name="overall_level_desc",
+            ),
+            IndexModel([("xp_total", DESCENDING), ("user_id", ASCENDING)], name="xp_total_desc"),
+        ]
@@ -0,0 +1,63 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Literal, Optional
+from datetime import datetime
+
+try:
+    from .enums import LifePillar
+except ImportError:
+    from enums import LifePillar
+
+
+class XPRecord(Document):
+    """Append-only ledger entry, one per pillar per XP grant"""
+    user_id: str
+    life_pillar: LifePillar
+    amount: int
+    
+    # What granted the XP, e.g. "task" with the task id, or "manual"
+    source: str = "manual"
+    source_id: Optional[str] = None
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "xp_records"
+        indexes = [
+            IndexModel([("created_at", DESCENDING)]),
+            # History listing and rollup rebuilds
+            IndexModel(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_created_desc",
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("life_pillar", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_pillar_created_desc",
+            ),
+        ]
+
+
+class XPRollup(Document):
+    """XP earned by a user in one pillar during one day or week, maintained incrementally"""
+    user_id: str
+    life_pillar: LifePillar
+    period: Literal["day", "week"]
+    bucket_start: datetime
+    
+    xp: int = 0
+    grants: int = 0
+    
+    class Settings:
+        name = "xp_rollups"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("period", ASCENDING), ("life_pillar", ASCENDING), ("bucket_start", ASCENDING)],
+                name="user_period_pillar_bucket",
+                unique=True,
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("period", ASCENDING), ("bucket_start", ASCENDING)],
+                name="user_period_bucket",
+            ),
+        ]
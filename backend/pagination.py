@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from bson import ObjectId
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"$d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$o": str(value)}
+    return value
+
+
+# JSON values a sort key may hold as is; anything else could smuggle operators into the keyset filter
+SCALARS = (str, int, float, bool, type(None))
+
+
+def _decode_value(value: Any):
+    if isinstance(value, SCALARS):
+        return value
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, raw), = value.items()
+        if tag == "$d" and isinstance(raw, str):
+            return datetime.fromisoformat(raw)
+        if tag == "$o" and isinstance(raw, str):
+            return ObjectId(raw)
+    raise ValueError(f"unsupported cursor value {value!r}")
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list):
+            raise ValueError("cursor must encode a list")
+        return [_decode_value(v) for v in values]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def keyset_filter(sort: List[tuple], last_values: List[Any]) -> dict:
+    """
+    Build the filter that selects rows strictly after `last_values` for a
+    compound sort such as [("created_at", -1), ("_id", -1)].
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: last_values[j] for j, (f, _) in enumerate(sort[:i])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": last_values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def next_cursor(rows: List[dict], limit: int, sort: List[tuple]) -> Optional[str]:
+    """Return the cursor for the page after `rows`, or None if this was the last page"""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor([last.get(field) for field, _ in sort])
@@ -0,0 +1,103 @@
+"""
+Opt-in per-request profiling, for finding hot paths in production without a redeploy.
+
+A request is profiled when PROFILING_ENABLED is set and either it carries
+`X-Profile: <PROFILING_TOKEN>` or it is picked by PROFILING_SAMPLE_RATE. The
+profile is written to PROFILING_DIR and its file name returned in the
+`X-Profile-File` response header. Only one request is profiled at a time.
+
+cProfile measures the whole thread, so other requests interleaved on the event
+loop show up too; pyinstrument (if installed) attributes time to the awaiting
+coroutine and is the better choice for async handlers.
+"""
+import cProfile
+import os
+import random
+import time
+
+try:
+    from .config import settings
+    from .logs import logger
+except ImportError:
+    from config import settings
+    from logs import logger
+
+
+class _CProfiler:
+    extension = "prof"
+    
+    def __init__(self):
+        self._profile = cProfile.Profile()
+    
+    def start(self):
+        self._profile.enable()
+    
+    def stop(self, path: str):
+        self._profile.disable()
+        self._profile.dump_stats(path)  # open with `python -m pstats` or snakeviz
+
+
+class _Pyinstrument:
+    extension = "html"
+    
+    def __init__(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(async_mode="enabled")
+    
+    def start(self):
+        self._profiler.start()
+    
+    def stop(self, path: str):
+        self._profiler.stop()
+        with open(path, "w") as f:
+            f.write(self._profiler.output_html())
+
+
+def _new_profiler():
+    if settings.profiler == "pyinstrument":
+        try:
+            return _Pyinstrument()
+        except ImportError:
+            pass
+    return _CProfiler()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests chosen by header or sampling"""
+    
+    def __init__(self, app):
+        self.app = app
+        self._busy = False
+    
+    def _wanted(self, scope) -> bool:
+        if not settings.profiling_enabled or scope["type"] != "http" or self._busy:
+            return False
+        if settings.profiling_token:
+            for name, value in scope.get("headers", []):
+                if name == b"x-profile":
+                    return value.decode() == settings.profiling_token
+        return random.random() < settings.profiling_sample_rate
+    
+    async def __call__(self, scope, receive, send):
+        if not self._wanted(scope):
+            return await self.app(scope, receive, send)
+        
+        self._busy = True
+        profiler = _new_profiler()
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{scope['path'].strip('/').replace('/', '_') or 'root'}.{profiler.extension}"
+        path = os.path.join(settings.profiling_dir, name)
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-file", name.encode())]}
+            await send(message)
+        
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            os.makedirs(settings.profiling_dir, exist_ok=True)
+            profiler.stop(path)
+            self._busy = False
+            logger.info("request_profiled", path=scope["path"], file=path, ms=round((time.perf_counter() - started) * 1000, 1))
@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException
-from typing import Optional, Dict
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from typing import Optional, Dict, List
 from pydantic import BaseModel
+from collections import deque
+from datetime import datetime
 
 try:
     from ..models.assessment import AssessmentResults
+    from ..models.user import UserProfile
+    from ..cache import assessment_reads, invalidate_assessments
+    from ..lean import lean_page, lean_response
+    from ..pagination import decode_cursor, keyset_filter, next_cursor
+    from ..services.events import publish
+    from ..services.recommendations import get_recommendation_service, rule_recommendations, rules_use_pillar_levels
 except ImportError:
     from models.assessment import AssessmentResults
+    from models.user import UserProfile
+    from cache import assessment_reads, invalidate_assessments
+    from lean import lean_page, lean_response
+    from pagination import decode_cursor, keyset_filter, next_cursor
+    from services.events import publish
+    from services.recommendations import get_recommendation_service, rule_recommendations, rules_use_pillar_levels
 
 router = APIRouter(prefix="/assessments", tags=["assessments"])
 
@@ -25,25 +39,103 @@ class AssessmentResponse(BaseModel):
     anxiety_score: Optional[int]
     depression_score: Optional[int]
     recommendations: list
+    recommendations_source: str = "rules"
+    completed_date: Optional[datetime] = None
+
+
+class AssessmentPage(BaseModel):
+    items: List[AssessmentResponse]
+    next_cursor: Optional[str] = None
+
+
+class AssessmentTrendPoint(BaseModel):
+    start: datetime
+    end: datetime
+    count: int
+    adhd_avg: Optional[float] = None
+    anxiety_avg: Optional[float] = None
+    depression_avg: Optional[float] = None
+
+
+class AssessmentTrendResponse(BaseModel):
+    user_id: str
+    total: int
+    window: int
+    points: List[AssessmentTrendPoint]
+    # Latest score minus the score `last` assessments earlier
+    change: Dict[str, Optional[float]]
+    compared_to: Optional[datetime] = None
+
+
+SCORE_FIELDS = ("adhd_score", "anxiety_score", "depression_score")
+HISTORY_SORT = [("completed_date", -1), ("_id", -1)]
+TREND_SORT = [("completed_date", 1), ("_id", 1)]
+# Raw answers are never returned by the read endpoints
+ASSESSMENT_PROJECTION = {"responses": 0}
+
+
+def _assessment_row(doc: dict) -> dict:
+    """AssessmentResponse-shaped row from a raw document"""
+    return {
+        "id": str(doc["_id"]),
+        "user_id": doc["user_id"],
+        "adhd_score": doc.get("adhd_score"),
+        "anxiety_score": doc.get("anxiety_score"),
+        "depression_score": doc.get("depression_score"),
+        "recommendations": doc.get("recommendations", []),
+        "recommendations_source": doc.get("recommendations_source", "rules"),
+        "completed_date": doc.get("completed_date"),
+    }
+
+
+async def _load_latest_assessment(user_id: str) -> Optional[dict]:
+    assessment = await AssessmentResults.get_motor_collection().find_one(
+        {"user_id": user_id}, ASSESSMENT_PROJECTION, sort=HISTORY_SORT
+    )
+    return _assessment_row(assessment) if assessment else None
+
+
+async def fill_ai_recommendations(assessment_id, user_id: str, adhd_score, anxiety_score, depression_score):
+    """Replace the rule-based recommendations of an assessment with AI-generated ones"""
+    service = get_recommendation_service()
+    user = await UserProfile.get_motor_collection().find_one(
+        {"user_id": user_id},
+        {"_id": 0, "life_pillar_levels": 1, "preferences.ai_recommendations_enabled": 1},
+    ) or {}
+    if not user.get("preferences", {}).get("ai_recommendations_enabled", True):
+        return
+    
+    recommendations, source = await service.recommend(
+        adhd_score, anxiety_score, depression_score, user.get("life_pillar_levels")
+    )
+    if source == "ai":
+        await AssessmentResults.get_motor_collection().update_one(
+            {"_id": assessment_id},
+            {"$set": {"recommendations": recommendations, "recommendations_source": source}},
+        )
+        invalidate_assessments(user_id)
+        await publish(user_id, "recommendations_updated", {
+            "assessment_id": str(assessment_id), "recommendations": recommendations, "source": source
+        })
 
 
 @router.post("/", response_model=AssessmentResponse)
-async def create_assessment(assessment_data: AssessmentCreate):
+async def create_assessment(assessment_data: AssessmentCreate, background_tasks: BackgroundTasks):
     """Submit assessment results"""
-    # Generate basic recommendations based on scores
-    recommendations = []
-    
-    if assessment_data.adhd_score and assessment_data.adhd_score > 15:
-        recommendations.append("Consider breaking tasks into smaller, manageable chunks")
-        recommendations.append("Use timers and reminders for task management")
-    
-    if assessment_data.anxiety_score and assessment_data.anxiety_score > 15:
-        recommendations.append("Practice mindfulness and breathing exercises")
-        recommendations.append("Schedule regular breaks throughout the day")
+    # Answer right away with rule-based recommendations; AI ones are filled in afterwards
+    pillar_levels = None
+    if rules_use_pillar_levels():
+        user = await UserProfile.get_motor_collection().find_one(
+            {"user_id": assessment_data.user_id}, {"_id": 0, "life_pillar_levels": 1}
+        )
+        pillar_levels = (user or {}).get("life_pillar_levels")
     
-    if assessment_data.depression_score and assessment_data.depression_score > 15:
-        recommendations.append("Set small, achievable daily goals")
-        recommendations.append("Maintain a consistent sleep schedule")
+    recommendations = rule_recommendations(
+        assessment_data.adhd_score,
+        assessment_data.anxiety_score,
+        assessment_data.depression_score,
+        pillar_levels
+    )
     
     assessment = AssessmentResults(
         user_id=assessment_data.user_id,
@@ -54,6 +146,20 @@ async def create_assessment(assessment_data: AssessmentCreate):
         recommendations=recommendations
     )
     await assessment.insert()
+    invalidate_assessments(assessment.user_id)
+    await publish(assessment.user_id, "assessment_created", {
+        "assessment_id": str(assessment.id), "recommendations_source": assessment.recommendations_source
+    })
+    
+    if get_recommendation_service() is not None:
+        background_tasks.add_task(
+            fill_ai_recommendations,
+            assessment.id,
+            assessment.user_id,
+            assessment.adhd_score,
+            assessment.anxiety_score,
+            assessment.depression_score
+        )
     
     return AssessmentResponse(
         id=str(assessment.id),
@@ -61,25 +167,122 @@ async def create_assessment(assessment_data: AssessmentCreate):
         adhd_score=assessment.adhd_score,
         anxiety_score=assessment.anxiety_score,
         depression_score=assessment.depression_score,
-        recommendations=assessment.recommendations
+        recommendations=assessment.recommendations,
+        recommendations_source=assessment.recommendations_source,
+        completed_date=assessment.completed_date
     )
 
 
 @router.get("/user/{user_id}", response_model=AssessmentResponse)
 async def get_user_assessment(user_id: str):
     """Get latest assessment for a user"""
-    assessment = await AssessmentResults.find(
-        {"user_id": user_id}
-    ).sort([("completed_date", -1)]).first_or_none()
+    row = await assessment_reads.get(user_id, lambda: _load_latest_assessment(user_id))
     
-    if not assessment:
+    if not row:
         raise HTTPException(status_code=404, detail="No assessment found for this user")
     
-    return AssessmentResponse(
-        id=str(assessment.id),
-        user_id=assessment.user_id,
-        adhd_score=assessment.adhd_score,
-        anxiety_score=assessment.anxiety_score,
-        depression_score=assessment.depression_score,
-        recommendations=assessment.recommendations
+    return lean_response(row)
+
+
+@router.get("/user/{user_id}/history", response_model=AssessmentPage)
+async def get_assessment_history(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Page through a user's assessments, newest first"""
+    query_filter = {"user_id": user_id}
+    if cursor:
+        try:
+            last_values = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(last_values) != len(HISTORY_SORT):
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        query_filter = {"$and": [query_filter, keyset_filter(HISTORY_SORT, last_values)]}
+    
+    rows = await AssessmentResults.get_motor_collection().find(
+        query_filter, ASSESSMENT_PROJECTION
+    ).sort(HISTORY_SORT).limit(limit + 1).to_list(length=limit + 1)
+    
+    return lean_page(map(_assessment_row, rows[:limit]), next_cursor(rows, limit, HISTORY_SORT))
+
+
+@router.get("/user/{user_id}/trend", response_model=AssessmentTrendResponse)
+async def get_assessment_trend(
+    user_id: str,
+    window: int = Query(3, ge=1, le=50),
+    last: int = Query(5, ge=1, le=50),
+    points: int = Query(50, ge=2, le=200)
+):
+    """
+    Moving averages of each score, downsampled to at most `points` buckets,
+    and the change of each score over the last `last` assessments.
+    
+    The assessments are streamed oldest first along the (user_id,
+    completed_date) index and folded as they arrive, so memory is bounded by
+    `window`, `last` and `points` rather than the length of the history.
+    """
+    collection = AssessmentResults.get_motor_collection()
+    expected = await collection.count_documents({"user_id": user_id})
+    if expected == 0:
+        raise HTTPException(status_code=404, detail="No assessment found for this user")
+    
+    averages = {field: f"{field.removesuffix('_score')}_avg" for field in SCORE_FIELDS}
+    recent = {field: deque(maxlen=window) for field in SCORE_FIELDS}
+    latest = deque(maxlen=last + 1)
+    buckets: List[dict] = []
+    total = 0
+    cursor = collection.find(
+        {"user_id": user_id}, {"_id": 0, "completed_date": 1, **{field: 1 for field in SCORE_FIELDS}}
+    ).sort(TREND_SORT).batch_size(1000)
+    async for row in cursor:
+        # Equal-count buckets; rows inserted since the count land in the last one
+        index = min(total * points // expected, points - 1)
+        total += 1
+        if not buckets or buckets[-1]["index"] != index:
+            buckets.append({"index": index, "start": row["completed_date"], "count": 0, "sums": {}, "counts": {}})
+        bucket = buckets[-1]
+        bucket["end"] = row["completed_date"]
+        bucket["count"] += 1
+        for field in SCORE_FIELDS:
+            recent[field].append(row.get(field))
+            values = [value for value in recent[field] if value is not None]
+            if values:
+                # Like $avg over the window: missing scores are skipped, not counted as 0
+                bucket["sums"][field] = bucket["sums"].get(field, 0) + sum(values) / len(values)
+                bucket["counts"][field] = bucket["counts"].get(field, 0) + 1
+        latest.append(row)
+    if total == 0:
+        raise HTTPException(status_code=404, detail="No assessment found for this user")
+    
+    newest = latest[-1]
+    baseline = latest[0] if len(latest) > 1 else None
+    change = {
+        field: (
+            newest[field] - baseline[field]
+            if baseline is not None and newest.get(field) is not None and baseline.get(field) is not None
+            else None
+        )
+        for field in SCORE_FIELDS
+    }
+    
+    return AssessmentTrendResponse(
+        user_id=user_id,
+        total=total,
+        window=window,
+        points=[
+            AssessmentTrendPoint(
+                start=bucket["start"],
+                end=bucket["end"],
+                count=bucket["count"],
+                **{
+                    name: bucket["sums"][field] / bucket["counts"][field] if field in bucket["counts"] else None
+                    for field, name in averages.items()
+                }
+            )
+            for bucket in buckets
+        ],
+        change=change,
+        compared_to=baseline["completed_date"] if baseline else None
     )
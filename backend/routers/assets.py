@@ -0,0 +1,100 @@
+from email.utils import formatdate
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+try:
+    from ..config import settings
+    from ..etags import etag_matches
+    from ..services import assets
+except ImportError:
+    from config import settings
+    from etags import etag_matches
+    from services import assets
+
+router = APIRouter(prefix="/assets", tags=["assets"])
+
+IMMUTABLE = f"public, max-age={settings.asset_immutable_max_age}, immutable"
+REVALIDATE = "public, no-cache"
+
+
+class MappedFileResponse(Response):
+    """
+    Sends a byte range of a memory-mapped asset as memoryview slices, so the
+    server writes straight from the page cache. Whole files go through the
+    ASGI pathsend extension instead when the server offers it (sendfile).
+    """
+    
+    def __init__(self, asset: assets.AssetFile, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.asset = asset
+        self.start = start
+        self.end = end
+    
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        whole = self.start == 0 and self.end == self.asset.size
+        if whole and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": str(self.asset.path)})
+            return
+        
+        view = self.asset.view(self.start, self.end)
+        chunk = settings.asset_chunk_bytes
+        for offset in range(0, len(view), chunk):
+            more = offset + chunk < len(view)
+            await send({"type": "http.response.body", "body": view[offset:offset + chunk], "more_body": more})
+        if not len(view):
+            await send({"type": "http.response.body", "body": b""})
+
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"])
+async def get_asset(path: str, request: Request, v: Optional[str] = None):
+    """
+    A model or texture from the asset directory. URLs carrying the current
+    content version (?v=, see services.assets.asset_url) are cacheable
+    forever; others revalidate with the ETag. Supports single byte ranges
+    and precompressed .br/.gz variants.
+    """
+    if assets.store is None:
+        raise HTTPException(status_code=404, detail="Asset serving is not configured")
+    asset = await assets.store.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    representation = await assets.store.representation(asset, request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": representation.etag,
+        "Last-Modified": formatdate(asset.mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE if v == asset.version else REVALIDATE,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), representation.etag):
+        # No Content-Encoding: a 304 has no body for it to describe
+        return Response(status_code=304, headers=headers)
+    if representation.encoding:
+        headers["Content-Encoding"] = representation.encoding
+    
+    size = representation.size
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # A range only applies to the representation the client already has part of
+    if if_range is None or if_range == representation.etag:
+        try:
+            byte_range = assets.parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    
+    status_code = 200
+    start, end = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    return MappedFileResponse(
+        representation, start, end, status_code, headers, assets.content_type(asset.path)
+    )
@@ -6,11 +6,19 @@ from jose import jwt
 import httpx
 
 try:
+    from ..cache import invalidate_user
     from ..config import settings
+    from ..dependencies import get_current_user, verify_token
+    from ..http_client import get_http_client
     from ..models.user import UserProfile, GoogleTokens
+    from ..services.leaderboard import add_user
 except ImportError:
+    from cache import invalidate_user
     from config import settings
+    from dependencies import get_current_user, verify_token
+    from http_client import get_http_client
     from models.user import UserProfile, GoogleTokens
+    from services.leaderboard import add_user
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -35,11 +43,11 @@ def create_access_token(data: dict):
 async def google_login():
     """Redirect to Google OAuth login"""
     google_auth_url = (
-        f"https://accounts.google.com/o/oauth2/v2/auth?"
+        f"{settings.google_accounts_url}/o/oauth2/v2/auth?"
         f"client_id={settings.google_client_id}&"
         f"redirect_uri={settings.google_redirect_uri}&"
         f"response_type=code&"
-        f"scope=openid email profile&"
+        f"scope=openid email profile https://www.googleapis.com/auth/calendar.readonly&"
         f"access_type=offline&"
         f"prompt=consent"
     )
@@ -47,41 +55,40 @@ async def google_login():
 
 
 @router.get("/google/callback")
-async def google_callback(code: str):
+async def google_callback(code: str, client: httpx.AsyncClient = Depends(get_http_client)):
     """Handle Google OAuth callback"""
     # Exchange code for tokens
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "code": code,
-                "client_id": settings.google_client_id,
-                "client_secret": settings.google_client_secret,
-                "redirect_uri": settings.google_redirect_uri,
-                "grant_type": "authorization_code",
-            },
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get access token")
-        
-        tokens = token_response.json()
-        access_token = tokens.get("access_token")
-        refresh_token = tokens.get("refresh_token")
-        
-        # Get user info from Google
-        user_info_response = await client.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-        
-        if user_info_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
-        
-        user_info = user_info_response.json()
-        email = user_info.get("email")
-        name = user_info.get("name")
-        google_id = user_info.get("id")
+    token_response = await client.post(
+        f"{settings.google_oauth_url}/token",
+        data={
+            "code": code,
+            "client_id": settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+            "redirect_uri": settings.google_redirect_uri,
+            "grant_type": "authorization_code",
+        },
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get access token")
+    
+    tokens = token_response.json()
+    access_token = tokens.get("access_token")
+    refresh_token = tokens.get("refresh_token")
+    
+    # Get user info from Google
+    user_info_response = await client.get(
+        f"{settings.google_api_url}/oauth2/v2/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    
+    if user_info_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info")
+    
+    user_info = user_info_response.json()
+    email = user_info.get("email")
+    name = user_info.get("name")
+    google_id = user_info.get("id")
     
     # Check if user exists
     user = await UserProfile.find_one({"email": email})
@@ -99,6 +106,7 @@ async def google_callback(code: str):
             )
         )
         await user.insert()
+        await add_user(user.user_id, user.total_xp)
     else:
         # Update tokens
         user.google_tokens = GoogleTokens(
@@ -107,6 +115,7 @@ async def google_callback(code: str):
             token_expiry=datetime.utcnow() + timedelta(seconds=tokens.get("expires_in", 3600))
         )
         await user.save()
+        invalidate_user(user.user_id)
     
     # Create JWT token for our app
     jwt_token = create_access_token({"sub": user.user_id, "email": user.email})
@@ -118,43 +127,16 @@ async def google_callback(code: str):
 @router.post("/token", response_model=TokenResponse)
 async def login_with_token(token: str):
     """Verify JWT token and return user info"""
-    try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        user_id = payload.get("sub")
-        email = payload.get("email")
-        
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        return TokenResponse(
-            access_token=token,
-            user_id=user_id,
-            email=email
-        )
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    claims = verify_token(token)
+    
+    return TokenResponse(
+        access_token=token,
+        user_id=claims["sub"],
+        email=claims.get("email")
+    )
 
 
 @router.get("/me")
-async def get_current_user(token: str):
-    """Get current user from JWT token"""
-    try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        user_id = payload.get("sub")
-        
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user = await UserProfile.find_one({"user_id": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return {
-            "user_id": user.user_id,
-            "email": user.email,
-            "full_name": user.full_name,
-            "life_pillar_levels": user.life_pillar_levels,
-            "total_xp": user.total_xp
-        }
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+async def get_me(user: dict = Depends(get_current_user)):
+    """Get the user of the Bearer token"""
+    return user
@@ -0,0 +1,188 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel
+from datetime import datetime
+import zlib
+
+try:
+    from ..config import settings
+    from ..etags import etag_matches
+    from ..lean import lean_response
+    from ..models.avatar import AnimationConfig, AvatarConfiguration, MeshRef
+    from ..services import assets, mesh
+except ImportError:
+    from config import settings
+    from etags import etag_matches
+    from lean import lean_response
+    from models.avatar import AnimationConfig, AvatarConfiguration, MeshRef
+    from services import assets, mesh
+
+router = APIRouter(prefix="/avatars", tags=["avatars"])
+
+
+class MeshRefResponse(MeshRef):
+    url: str
+
+
+class FaceScanResponse(BaseModel):
+    scan_image_url: Optional[str] = None
+    mesh: Optional[MeshRefResponse] = None
+    created_at: Optional[datetime] = None
+
+
+class AvatarResponse(BaseModel):
+    user_id: str
+    base_model_path: str
+    # Versioned, immutable URL of the model when this backend serves it
+    base_model_url: Optional[str] = None
+    face_scan: Optional[FaceScanResponse] = None
+    equipped_items: List[str]
+    animations: List[AnimationConfig]
+    customizations: Dict[str, Any]
+    updated_at: Optional[datetime] = None
+    # Decoded mesh arrays, only with ?include_mesh=true
+    mesh_data: Optional[Dict[str, Any]] = None
+
+
+# Everything but the mesh itself, which can be megabytes on avatars not yet migrated
+AVATAR_PROJECTION = {"_id": 0, "face_scan_data.mesh_data": 0}
+
+
+def _mesh_url(user_id: str) -> str:
+    return f"/avatars/{user_id}/mesh"
+
+
+def _mesh_ref(user_id: str, ref: Optional[dict]) -> Optional[dict]:
+    if not ref:
+        return None
+    return {**ref, "url": _mesh_url(user_id)}
+
+
+def _avatar_row(doc: dict) -> dict:
+    """AvatarResponse-shaped row from a raw avatar_configurations document"""
+    face_scan = doc.get("face_scan_data")
+    return {
+        "user_id": doc["user_id"],
+        "base_model_path": doc.get("base_model_path", AvatarConfiguration.model_fields["base_model_path"].default),
+        "base_model_url": None,
+        "face_scan": {
+            "scan_image_url": face_scan.get("scan_image_url"),
+            "mesh": _mesh_ref(doc["user_id"], face_scan.get("mesh")),
+            "created_at": face_scan.get("created_at"),
+        } if face_scan else None,
+        "equipped_items": doc.get("equipped_items", []),
+        "animations": doc.get("animations", []),
+        "customizations": doc.get("customizations", {}),
+        "updated_at": doc.get("updated_at"),
+        "mesh_data": None,
+    }
+
+
+def _decoded(data: bytes) -> dict:
+    """Arrays of a stored mesh; uploads are validated, so a failure here means the stored file is damaged"""
+    try:
+        return mesh.to_lists(mesh.decode(data))
+    except (zlib.error, mesh.MeshError) as e:
+        raise HTTPException(status_code=500, detail=f"Stored mesh is corrupt: {e}")
+
+
+async def _load_mesh_ref(user_id: str) -> dict:
+    avatar = await AvatarConfiguration.get_motor_collection().find_one(
+        {"user_id": user_id}, {"face_scan_data.mesh": 1}
+    )
+    ref = ((avatar or {}).get("face_scan_data") or {}).get("mesh")
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Mesh not found")
+    return ref
+
+
+@router.get("/{user_id}", response_model=AvatarResponse)
+async def get_avatar(user_id: str, include_mesh: bool = False):
+    """Get a user's avatar; the face mesh is a reference unless include_mesh is set"""
+    projection = {"_id": 0} if include_mesh else AVATAR_PROJECTION
+    doc = await AvatarConfiguration.get_motor_collection().find_one({"user_id": user_id}, projection)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    
+    row = _avatar_row(doc)
+    row["base_model_url"] = await assets.asset_url(row["base_model_path"])
+    if include_mesh:
+        face_scan = doc.get("face_scan_data") or {}
+        if face_scan.get("mesh"):
+            try:
+                data = await mesh.read_mesh(face_scan["mesh"]["file_id"])
+            except mesh.NoFile:
+                raise HTTPException(status_code=404, detail="Mesh not found")
+            row["mesh_data"] = _decoded(data)
+        else:
+            row["mesh_data"] = face_scan.get("mesh_data")  # legacy inline mesh
+    return lean_response(row)
+
+
+@router.put("/{user_id}/mesh", response_model=MeshRefResponse)
+async def upload_mesh(user_id: str, request: Request, quantize: bool = False, compress: bool = False):
+    """
+    Store a user's face mesh. The body is either a binary mesh file, streamed
+    straight into GridFS, or JSON arrays in the legacy mesh_data shape, which
+    are encoded first (optionally quantized and/or deflated). Either way the
+    file is decoded once before it is kept, and rejected with 400 if that fails.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.mesh_max_bytes:
+        raise HTTPException(status_code=413, detail="Mesh too large")
+    
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            data = mesh.from_legacy(await request.json(), quantize=quantize, compress=compress)
+        except (mesh.MeshError, AttributeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid mesh: {e}")
+        
+        async def chunks():
+            yield data
+    else:
+        chunks = request.stream
+    
+    try:
+        ref = await mesh.store_mesh(user_id, chunks())
+    except mesh.MeshError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid mesh: {e}")
+    
+    replaced = await mesh.attach_mesh(user_id, ref)
+    if replaced and replaced["file_id"] != ref["file_id"]:
+        await mesh.delete_mesh(replaced["file_id"])
+    return lean_response(_mesh_ref(user_id, ref))
+
+
+@router.get("/{user_id}/mesh")
+async def download_mesh(user_id: str, request: Request, format: Literal["binary", "json"] = "binary"):
+    """A user's face mesh, streamed from GridFS as stored or decoded to JSON arrays"""
+    ref = await _load_mesh_ref(user_id)
+    etag = f'"{ref["sha256"]}"' if format == "binary" else f'"{ref["sha256"]}-json"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        grid_out = await mesh.open_mesh(ref["file_id"])
+    except mesh.NoFile:
+        raise HTTPException(status_code=404, detail="Mesh not found")
+    
+    if format == "json":
+        return lean_response(_decoded(await grid_out.read()))
+    
+    async def chunks():
+        while chunk := await grid_out.readchunk():
+            yield chunk
+    
+    headers["Content-Length"] = str(grid_out.length)
+    return StreamingResponse(chunks(), media_type=mesh.MEDIA_TYPE, headers=headers)
+
+
+@router.delete("/{user_id}/mesh")
+async def delete_mesh(user_id: str):
+    """Remove a user's face mesh"""
+    ref = await mesh.detach_mesh(user_id)
+    if ref:
+        await mesh.delete_mesh(ref["file_id"])
+    return {"message": "Mesh deleted successfully"}
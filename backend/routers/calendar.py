@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List
+from pydantic import BaseModel
+from datetime import datetime, timedelta, timezone
+import httpx
+
+try:
+    from ..http_client import get_http_client
+    from ..services.calendar_sync import sync_user
+    from ..services.freebusy import get_busy_index
+except ImportError:
+    from http_client import get_http_client
+    from services.calendar_sync import sync_user
+    from services.freebusy import get_busy_index
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+
+class SyncResponse(BaseModel):
+    user_id: str
+    status: str
+    changes: int
+
+
+class TimeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class FreeBusyResponse(BaseModel):
+    user_id: str
+    start: datetime
+    end: datetime
+    slots: List[TimeSlot]
+
+
+def _utc(value: datetime) -> datetime:
+    """Stored times are naive UTC; bring aware query parameters in line"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _check_range(start: datetime, end: datetime) -> tuple:
+    start, end = _utc(start), _utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=92):
+        raise HTTPException(status_code=400, detail="Range too large")
+    return start, end
+
+
+@router.post("/user/{user_id}/sync", response_model=SyncResponse)
+async def sync_calendar(user_id: str, client: httpx.AsyncClient = Depends(get_http_client)):
+    """Pull changes from the user's Google Calendar"""
+    return await sync_user(client, user_id)
+
+
+@router.get("/user/{user_id}/busy", response_model=FreeBusyResponse)
+async def get_busy(user_id: str, start: datetime, end: datetime):
+    """Merged busy blocks between start and end"""
+    start, end = _check_range(start, end)
+    index = await get_busy_index(user_id, start, end)
+    return FreeBusyResponse(
+        user_id=user_id,
+        start=start,
+        end=end,
+        slots=[TimeSlot(start=s, end=e) for s, e in index.busy(start, end)]
+    )
+
+
+@router.get("/user/{user_id}/free", response_model=FreeBusyResponse)
+async def get_free(user_id: str, start: datetime, end: datetime, min_minutes: int = Query(15, ge=0)):
+    """Free gaps of at least min_minutes between start and end"""
+    start, end = _check_range(start, end)
+    index = await get_busy_index(user_id, start, end)
+    return FreeBusyResponse(
+        user_id=user_id,
+        start=start,
+        end=end,
+        slots=[TimeSlot(start=s, end=e) for s, e in index.free(start, end, timedelta(minutes=min_minutes))]
+    )
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+try:
+    from ..models.enums import EquipmentType
+    from ..etags import etag_matches
+    from ..lean import lean_response
+    from ..services import equipment
+except ImportError:
+    from models.enums import EquipmentType
+    from etags import etag_matches
+    from lean import lean_response
+    from services import equipment
+
+router = APIRouter(prefix="/equipment", tags=["equipment"])
+
+
+class EquipmentResponse(BaseModel):
+    item_id: str
+    name: str
+    type: EquipmentType
+    required_level: Dict[str, int] = {}
+    asset_path: str
+    texture_path: Optional[str] = None
+    # Versioned, immutable URLs when this backend serves the files (see /assets)
+    asset_url: Optional[str] = None
+    texture_url: Optional[str] = None
+    unlock_condition: str
+    is_default: bool = False
+    description: Optional[str] = None
+    rarity: str = "common"
+
+
+@router.get("/", response_model=List[EquipmentResponse])
+async def get_catalog(request: Request):
+    """The whole equipment catalog; clients revalidate with If-None-Match"""
+    catalog = equipment.get_catalog()
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), catalog.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(catalog.body, media_type="application/json", headers=headers)
+
+
+@router.get("/{item_id}", response_model=EquipmentResponse)
+async def get_item(item_id: str):
+    """One catalog item"""
+    item = equipment.get_catalog().by_id.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return lean_response(item)
@@ -0,0 +1,67 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+
+try:
+    from ..config import settings
+    from ..dependencies import verify_token
+    from ..services import events
+except ImportError:
+    from config import settings
+    from dependencies import verify_token
+    from services import events
+
+router = APIRouter(tags=["events"])
+
+# Close code for a rejected token (policy violation)
+WS_POLICY_VIOLATION = 1008
+
+
+@router.websocket("/ws")
+async def event_stream(websocket: WebSocket, token: str = Query(...)):
+    """
+    Real-time events of the authenticated user: xp, level_up, task_completed,
+    assessment_created, recommendations_updated, plus heartbeat and resync.
+    Browsers cannot set headers on a WebSocket, so the JWT comes as ?token=.
+    """
+    try:
+        user_id = verify_token(token)["sub"]
+    except HTTPException:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    hub = events.hub
+    connection = events.Connection(websocket, user_id, settings.ws_queue_size)
+    hub.add(connection)
+    sender = asyncio.create_task(
+        connection.run_sender(settings.ws_heartbeat_seconds, settings.ws_send_timeout_seconds)
+    )
+    receiver = asyncio.create_task(_drain(websocket))
+    try:
+        # Whichever ends first: the client went away, or the sender gave up on a slow client
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        hub.remove(connection)
+        sender.cancel()
+        receiver.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+async def _drain(websocket: WebSocket):
+    """Read and discard client frames until it disconnects; the stream is server-to-client only"""
+    while True:
+        # receive(), not receive_text(): a binary frame must be discarded too, not end the connection
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.get("/ws/stats")
+async def event_stats():
+    """Connections and event counters of this worker"""
+    return events.hub.stats()
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List
+from pydantic import BaseModel
+
+try:
+    from ..services import leaderboard as leaderboards
+except ImportError:
+    from services import leaderboard as leaderboards
+
+router = APIRouter(prefix="/leaderboards", tags=["leaderboards"])
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    score: int
+
+
+def _check_board(board: str):
+    if board not in leaderboards.BOARDS:
+        raise HTTPException(status_code=404, detail="Leaderboard not found")
+
+
+@router.get("/{board}", response_model=List[LeaderboardEntry])
+async def get_top(board: str, limit: int = Query(10, ge=1, le=100)):
+    """Top users of the global board or of one life pillar"""
+    _check_board(board)
+    return await leaderboards.leaderboard.top(board, limit)
+
+
+@router.get("/{board}/rank/{user_id}", response_model=LeaderboardEntry)
+async def get_rank(board: str, user_id: str):
+    """A user's rank on a board"""
+    _check_board(board)
+    entry = await leaderboards.leaderboard.rank(board, user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    return entry
+
+
+@router.get("/{board}/around/{user_id}", response_model=List[LeaderboardEntry])
+async def get_neighbors(board: str, user_id: str, radius: int = Query(5, ge=1, le=50)):
+    """Users ranked just above and below a user"""
+    _check_board(board)
+    entries = await leaderboards.leaderboard.around(board, user_id, radius)
+    if not entries:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    return entries
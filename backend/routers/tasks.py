@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
 
 try:
-    from ..models.calendar import ActionStep
+    from ..models.calendar import ActionStep, TaskSchedule
     from ..models.enums import LifePillar, Priority
+    from ..lean import lean_page, projection
+    from ..pagination import decode_cursor, keyset_filter, next_cursor
+    from ..services.events import publish
+    from ..services.progression import apply_xp_effects, run_transaction, stage_xp
 except ImportError:
-    from models.calendar import ActionStep
+    from models.calendar import ActionStep, TaskSchedule
     from models.enums import LifePillar, Priority
+    from lean import lean_page, projection
+    from pagination import decode_cursor, keyset_filter, next_cursor
+    from services.events import publish
+    from services.progression import apply_xp_effects, run_transaction, stage_xp
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -38,6 +48,92 @@ class TaskResponse(BaseModel):
     created_at: datetime
 
 
+class ScheduledTaskResponse(BaseModel):
+    task_id: str
+    title: str
+    start: datetime
+    end: datetime
+    at_risk: bool
+
+
+class ScheduleResponse(BaseModel):
+    user_id: str
+    generated_at: datetime
+    horizon_start: datetime
+    horizon_end: datetime
+    entries: List[ScheduledTaskResponse]
+    unscheduled: List[str]
+
+
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+
+# Sort orders supported by the task listing; each is backed by a compound index on ActionStep
+TASK_SORTS = {
+    "created_at": [("created_at", -1), ("_id", -1)],
+    "due_date": [("due_date", 1), ("_id", 1)],
+}
+
+# Only the fields TaskResponse needs are fetched from Mongo
+TASK_PROJECTION = projection(TaskResponse)
+
+
+def task_filter(
+    user_id: str,
+    completed: Optional[bool] = None,
+    pillar: Optional[LifePillar] = None,
+    priority: Optional[Priority] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    sort: str = "created_at"
+) -> dict:
+    """Filter of the task listing, shared with the query plans indexes.py verifies"""
+    query_filter = {"user_id": user_id}
+    
+    if completed is not None:
+        query_filter["completed"] = completed
+    if pillar is not None:
+        query_filter["life_pillar"] = pillar.value
+    if priority is not None:
+        query_filter["priority"] = priority.value
+    
+    due_range = {}
+    if due_after is not None:
+        due_range["$gte"] = due_after
+    if due_before is not None:
+        due_range["$lt"] = due_before
+    if sort == "due_date":
+        # Tasks without a due date have no position in this order
+        due_range.setdefault("$ne", None)
+    if due_range:
+        query_filter["due_date"] = due_range
+    return query_filter
+
+
+def open_task_filter(object_id: PydanticObjectId) -> dict:
+    """Only an open task can be completed, so concurrent clicks award XP once"""
+    return {"_id": object_id, "completed": False}
+
+
+def _task_row(doc: dict) -> dict:
+    """TaskResponse-shaped row from a projected raw document, without hydrating an ActionStep"""
+    return {
+        "id": str(doc["_id"]),
+        "user_id": doc["user_id"],
+        "title": doc["title"],
+        "description": doc["description"],
+        "life_pillar": doc["life_pillar"],
+        "priority": doc.get("priority", Priority.MEDIUM.value),
+        "estimated_duration": doc.get("estimated_duration", 30),
+        "xp_reward": doc.get("xp_reward", 10),
+        "completed": doc.get("completed", False),
+        "due_date": doc.get("due_date"),
+        "created_at": doc["created_at"],
+    }
+
+
 @router.post("/", response_model=TaskResponse)
 async def create_task(task_data: TaskCreate):
     """Create a new task"""
@@ -68,53 +164,117 @@ async def create_task(task_data: TaskCreate):
     )
 
 
-@router.get("/user/{user_id}", response_model=List[TaskResponse])
-async def get_user_tasks(user_id: str, completed: Optional[bool] = None):
-    """Get all tasks for a user"""
-    query_filter = {"user_id": user_id}
+@router.get("/user/{user_id}", response_model=TaskPage)
+async def get_user_tasks(
+    user_id: str,
+    completed: Optional[bool] = None,
+    pillar: Optional[LifePillar] = None,
+    priority: Optional[Priority] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    sort: Literal["created_at", "due_date"] = "created_at",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Get a page of tasks for a user, newest first or by due date"""
+    query_filter = task_filter(user_id, completed, pillar, priority, due_after, due_before, sort)
     
-    if completed is not None:
-        query_filter["completed"] = completed
+    sort_spec = TASK_SORTS[sort]
+    if cursor:
+        try:
+            last_values = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(last_values) != len(sort_spec):
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        query_filter = {"$and": [query_filter, keyset_filter(sort_spec, last_values)]}
     
-    tasks = await ActionStep.find(query_filter).to_list()
+    rows = await ActionStep.get_motor_collection().find(
+        query_filter, TASK_PROJECTION
+    ).sort(sort_spec).limit(limit + 1).to_list(length=limit + 1)
     
-    return [
-        TaskResponse(
-            id=str(task.id),
-            user_id=task.user_id,
-            title=task.title,
-            description=task.description,
-            life_pillar=task.life_pillar,
-            priority=task.priority,
-            estimated_duration=task.estimated_duration,
-            xp_reward=task.xp_reward,
-            completed=task.completed,
-            due_date=task.due_date,
-            created_at=task.created_at
-        )
-        for task in tasks
-    ]
+    return lean_page(map(_task_row, rows[:limit]), next_cursor(rows, limit, sort_spec))
+
+
+@router.get("/user/{user_id}/schedule", response_model=ScheduleResponse)
+async def get_task_schedule(user_id: str, days: int = Query(7, ge=1, le=28)):
+    """The user's stored plan, cut to its first `days` days"""
+    schedule = await TaskSchedule.get_motor_collection().find_one({"user_id": user_id}, {"_id": 0})
+    if not schedule:
+        raise HTTPException(status_code=404, detail="No schedule yet; POST to this URL to plan one")
+    horizon_end = min(schedule["horizon_end"], schedule["horizon_start"] + timedelta(days=days))
+    schedule["horizon_end"] = horizon_end
+    schedule["entries"] = [entry for entry in schedule["entries"] if entry["start"] < horizon_end]
+    return schedule
+
+
+@router.post("/user/{user_id}/schedule", response_model=ScheduleResponse)
+async def plan_task_schedule(user_id: str, days: int = Query(7, ge=1, le=28)):
+    """Place the user's open tasks into free working-hour slots and store the plan"""
+    # Imported on first use to keep numpy out of worker startup
+    try:
+        from ..services.scheduler import plan_user
+    except ImportError:
+        from services.scheduler import plan_user
+    return await plan_user(user_id, days)
+
+
+def _parse_task_id(task_id: str) -> PydanticObjectId:
+    try:
+        return PydanticObjectId(task_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Task not found")
 
 
 @router.patch("/{task_id}/complete")
 async def complete_task(task_id: str):
-    """Mark a task as completed"""
-    task = await ActionStep.get(task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    """Mark a task as completed and award its XP"""
+    object_id = _parse_task_id(task_id)
+    tasks = ActionStep.get_motor_collection()
     
-    if task.completed:
-        raise HTTPException(status_code=400, detail="Task already completed")
+    async def complete(session):
+        task = await tasks.find_one_and_update(
+            open_task_filter(object_id),
+            {"$set": {"completed": True, "completed_at": datetime.utcnow()}},
+            projection={"user_id": 1, "xp_reward": 1, "life_pillar": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if task is None:
+            if await tasks.count_documents({"_id": object_id}, limit=1, session=session):
+                raise HTTPException(status_code=400, detail="Task already completed")
+            raise HTTPException(status_code=404, detail="Task not found")
+        
+        pillar = LifePillar(task["life_pillar"])
+        results = await stage_xp(
+            task["user_id"], {pillar: task.get("xp_reward", 10)}, source="task", source_id=task_id, session=session
+        )
+        if results is None:
+            if session is None:
+                # No transaction to roll back, so reopen the task ourselves
+                await tasks.update_one(
+                    {"_id": object_id},
+                    {"$set": {"completed": False, "completed_at": None}},
+                )
+            raise HTTPException(status_code=404, detail="User not found")
+        return task, pillar, results
     
-    task.completed = True
-    task.completed_at = datetime.utcnow()
-    await task.save()
+    task, pillar, results = await run_transaction(complete)
+    # Only once committed: nothing a retried or aborted transaction wrote may reach caches, boards or clients
+    await apply_xp_effects(task["user_id"], results)
+    result = results[pillar]
+    xp_reward = result["xp_added"]
+    await publish(task["user_id"], "task_completed", {"task_id": task_id, "life_pillar": pillar.value, "xp_earned": xp_reward})
     
     return {
         "task_id": task_id,
         "completed": True,
-        "xp_earned": task.xp_reward,
-        "life_pillar": task.life_pillar
+        "xp_earned": xp_reward,
+        "life_pillar": pillar,
+        "total_xp": result["total_xp"],
+        "level": result["level"],
+        "leveled_up": result["leveled_up"],
+        "unlocked_items": result["unlocked_items"]
     }
 
 
@@ -126,4 +286,9 @@ async def delete_task(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     
     await task.delete()
+    # Drop it from the stored plan now; the re-planner reuses the freed slots on its next run
+    await TaskSchedule.get_motor_collection().update_one(
+        {"user_id": task.user_id},
+        {"$pull": {"entries": {"task_id": str(task.id)}, "unscheduled": str(task.id)}, "$set": {"tasks_changed_at": datetime.utcnow()}},
+    )
     return {"message": "Task deleted successfully"}
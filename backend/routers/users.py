@@ -1,13 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, EmailStr
+from datetime import datetime
 
 try:
     from ..models.user import UserProfile
     from ..models.enums import LifePillar
+    from ..models.xp import XPRecord
+    from ..cache import user_reads
+    from ..lean import lean_page, lean_response, plain_keys
+    from ..pagination import decode_cursor, keyset_filter, next_cursor
+    from ..services import equipment
+    from ..services.leaderboard import add_user
+    from ..services.progression import award_xp, grant_xp
+    from ..services.xp_ledger import read_trend
 except ImportError:
     from models.user import UserProfile
     from models.enums import LifePillar
+    from models.xp import XPRecord
+    from cache import user_reads
+    from lean import lean_page, lean_response, plain_keys
+    from pagination import decode_cursor, keyset_filter, next_cursor
+    from services import equipment
+    from services.leaderboard import add_user
+    from services.progression import award_xp, grant_xp
+    from services.xp_ledger import read_trend
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -30,6 +47,97 @@ class UserResponse(BaseModel):
     total_xp: dict
 
 
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class XPGrantBatch(BaseModel):
+    grants: Dict[LifePillar, int]
+
+
+class UnlockedEquipmentResponse(BaseModel):
+    user_id: str
+    catalog_etag: str
+    item_ids: List[str]
+
+
+class XPRecordResponse(BaseModel):
+    id: str
+    life_pillar: LifePillar
+    amount: int
+    source: str
+    source_id: Optional[str] = None
+    created_at: datetime
+
+
+class XPHistoryPage(BaseModel):
+    items: List[XPRecordResponse]
+    next_cursor: Optional[str] = None
+
+
+class XPTrendPoint(BaseModel):
+    bucket_start: datetime
+    xp: int
+    grants: int
+
+
+class XPTrendResponse(BaseModel):
+    user_id: str
+    period: str
+    series: Dict[LifePillar, List[XPTrendPoint]]
+
+
+XP_HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+# Sort orders of GET /users; each is backed by an index on UserProfile and ends in the unique user_id
+USER_SORTS = {
+    "user_id": [("user_id", 1)],
+    "level": [("overall_level", -1), ("xp_total", -1), ("user_id", 1)],
+    "xp": [("xp_total", -1), ("user_id", 1)],
+}
+
+# Everything UserResponse is derived from; google_tokens and preferences are never read
+USER_PROJECTION = {
+    "_id": 0, "user_id": 1, "email": 1, "full_name": 1,
+    "life_pillar_levels": 1, "total_xp": 1, "overall_level": 1, "xp_total": 1,
+}
+DEFAULT_PILLAR_LEVELS = plain_keys(UserProfile.model_fields["life_pillar_levels"].default)
+DEFAULT_TOTAL_XP = plain_keys(UserProfile.model_fields["total_xp"].default)
+
+
+def xp_history_filter(user_id: str, pillar: Optional[LifePillar] = None) -> dict:
+    query_filter = {"user_id": user_id}
+    if pillar is not None:
+        query_filter["life_pillar"] = pillar.value
+    return query_filter
+
+
+def _user_row(doc: dict) -> dict:
+    """UserResponse-shaped row from a projected raw user_profiles document"""
+    levels = doc.get("life_pillar_levels") or DEFAULT_PILLAR_LEVELS
+    total_xp = doc.get("total_xp") or DEFAULT_TOTAL_XP
+    # Stored aggregates; profiles not yet backfilled fall back to computing them
+    level = doc.get("overall_level")
+    xp = doc.get("xp_total")
+    return {
+        "user_id": doc["user_id"],
+        "email": doc["email"],
+        "username": doc["user_id"],  # Use user_id as username
+        "full_name": doc.get("full_name"),
+        "level": level if level is not None else max(levels.values()),
+        "xp": xp if xp is not None else sum(total_xp.values()),
+        "coins": 0,
+        "life_pillar_levels": levels,
+        "total_xp": total_xp,
+    }
+
+
+async def _load_user_row(user_id: str) -> Optional[dict]:
+    user = await UserProfile.get_motor_collection().find_one({"user_id": user_id}, USER_PROJECTION)
+    return _user_row(user) if user else None
+
+
 @router.post("/", response_model=UserResponse)
 async def create_user(user_data: UserCreate):
     """Create a new user"""
@@ -45,6 +153,7 @@ async def create_user(user_data: UserCreate):
         full_name=user_data.full_name
     )
     await user.insert()
+    await add_user(user.user_id, user.total_xp)
     
     return UserResponse(
         user_id=user.user_id,
@@ -62,66 +171,130 @@ async def create_user(user_data: UserCreate):
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(user_id: str):
     """Get user by ID"""
-    user = await UserProfile.find_one({"user_id": user_id})
-    if not user:
+    row = await user_reads.get(user_id, lambda: _load_user_row(user_id))
+    if row is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(
-        user_id=user.user_id,
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        level=max(user.life_pillar_levels.values()),
-        xp=sum(user.total_xp.values()),
-        coins=0,
-        life_pillar_levels=user.life_pillar_levels,
-        total_xp=user.total_xp
-    )
+    return lean_response(row)
 
 
-@router.get("/", response_model=List[UserResponse])
-async def list_users(limit: int = 10):
-    """List all users"""
-    users = await UserProfile.find_all().limit(limit).to_list()
+@router.get("/{user_id}/equipment", response_model=UnlockedEquipmentResponse)
+async def get_unlocked_equipment(user_id: str):
+    """Ids of the catalog items the user's pillar levels unlock; details come from GET /equipment"""
+    row = await user_reads.get(user_id, lambda: _load_user_row(user_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    return [
-        UserResponse(
-            user_id=user.user_id,
-            email=user.email,
-            username=user.username,
-            full_name=user.full_name,
-            level=max(user.life_pillar_levels.values()),
-            xp=sum(user.total_xp.values()),
-            coins=0,
-            life_pillar_levels=user.life_pillar_levels,
-            total_xp=user.total_xp
-        )
-        for user in users
-    ]
+    catalog = equipment.get_catalog()
+    return lean_response({
+        "user_id": user_id,
+        "catalog_etag": catalog.etag,
+        "item_ids": catalog.unlocked(row["life_pillar_levels"]),
+    })
+
+
+@router.get("/", response_model=UserPage)
+async def list_users(
+    sort: Literal["user_id", "level", "xp"] = "user_id",
+    limit: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Page through users by user_id, overall level or total XP"""
+    query_filter = {}
+    sort_spec = USER_SORTS[sort]
+    if cursor:
+        try:
+            last_values = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(last_values) != len(sort_spec):
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        query_filter = keyset_filter(sort_spec, last_values)
+    
+    rows = await UserProfile.get_motor_collection().find(
+        query_filter, USER_PROJECTION
+    ).sort(sort_spec).limit(limit + 1).to_list(length=limit + 1)
+    
+    return lean_page(map(_user_row, rows[:limit]), next_cursor(rows, limit, sort_spec))
 
 
 @router.post("/{user_id}/xp")
 async def add_xp(user_id: str, pillar: LifePillar, amount: int):
     """Add XP to a user's life pillar"""
-    user = await UserProfile.find_one({"user_id": user_id})
-    if not user:
+    result = await award_xp(user_id, pillar, amount)
+    if result is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Add XP
-    user.total_xp[pillar] = user.total_xp.get(pillar, 0) + amount
-    
-    # Check for level up (100 XP per level)
-    new_level = user.total_xp[pillar] // 100 + 1
-    if new_level > user.life_pillar_levels[pillar]:
-        user.life_pillar_levels[pillar] = new_level
+    return {"user_id": user_id, **result}
+
+
+@router.post("/{user_id}/xp/batch")
+async def add_xp_batch(user_id: str, batch: XPGrantBatch):
+    """Add XP to several life pillars in one atomic update"""
+    if not batch.grants:
+        raise HTTPException(status_code=400, detail="No XP grants given")
     
-    await user.save()
+    results = await grant_xp(user_id, batch.grants)
+    if results is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
     return {
         "user_id": user_id,
-        "pillar": pillar,
-        "xp_added": amount,
-        "total_xp": user.total_xp[pillar],
-        "level": user.life_pillar_levels[pillar],
-        "leveled_up": new_level > user.life_pillar_levels[pillar]
+        "grants": list(results.values()),
+        "leveled_up": any(r["leveled_up"] for r in results.values())
     }
+
+
+@router.get("/{user_id}/xp/history", response_model=XPHistoryPage)
+async def get_xp_history(
+    user_id: str,
+    pillar: Optional[LifePillar] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Page through a user's XP ledger, newest first"""
+    query_filter = xp_history_filter(user_id, pillar)
+    if cursor:
+        try:
+            last_values = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(last_values) != len(XP_HISTORY_SORT):
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        query_filter = {"$and": [query_filter, keyset_filter(XP_HISTORY_SORT, last_values)]}
+    
+    rows = await XPRecord.get_motor_collection().find(
+        query_filter, {"user_id": 0}
+    ).sort(XP_HISTORY_SORT).limit(limit + 1).to_list(length=limit + 1)
+    
+    return XPHistoryPage(
+        items=[
+            XPRecordResponse(
+                id=str(row["_id"]),
+                life_pillar=row["life_pillar"],
+                amount=row["amount"],
+                source=row.get("source", "manual"),
+                source_id=row.get("source_id"),
+                created_at=row["created_at"]
+            )
+            for row in rows[:limit]
+        ],
+        next_cursor=next_cursor(rows, limit, XP_HISTORY_SORT)
+    )
+
+
+@router.get("/{user_id}/xp/trend", response_model=XPTrendResponse)
+async def get_xp_trend(
+    user_id: str,
+    period: Literal["day", "week"] = "day",
+    buckets: int = Query(30, ge=1, le=366),
+    pillar: Optional[LifePillar] = None
+):
+    """XP earned per day or week, read from the pre-aggregated rollups"""
+    series: Dict[LifePillar, List[XPTrendPoint]] = {}
+    for row in await read_trend(user_id, period, buckets, pillar=pillar):
+        series.setdefault(LifePillar(row["life_pillar"]), []).append(
+            XPTrendPoint(bucket_start=row["bucket_start"], xp=row["xp"], grants=row["grants"])
+        )
+    
+    return XPTrendResponse(user_id=user_id, period=period, series=series)
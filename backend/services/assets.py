@@ -0,0 +1,201 @@
+"""
+Static 3D assets (GLB models, textures) served from settings.assets_dir.
+
+Files are memory-mapped once and served as slices of the mapping, so bodies
+and ranges go from the page cache to the socket without read() copies. Each
+file's strong ETag is a content hash computed once and kept until the file's
+size, mtime or inode changes. Precompressed siblings (`x.glb.br`,
+`x.glb.gz`) are served as alternative representations when the client
+accepts them.
+
+Deploy files by writing a new file and renaming it over the old one: views
+being sent keep the old inode, while truncating a mapped file in place
+would fault the process.
+"""
+import asyncio
+import hashlib
+import mimetypes
+import mmap
+import os
+import re
+import stat as stat_mode
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    from ..config import settings
+except ImportError:
+    from config import settings
+
+CONTENT_TYPES = {
+    ".glb": "model/gltf-binary",
+    ".gltf": "model/gltf+json",
+    ".bin": "application/octet-stream",
+    ".ktx2": "image/ktx2",
+    ".basis": "image/basis",
+    ".webp": "image/webp",
+}
+# Preference order of precompressed variants: (Content-Encoding, file suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# One byte-range-spec: first-last, first- or -suffix
+BYTE_RANGE = re.compile(r"([0-9]*)-([0-9]*)")
+
+
+class AssetFile:
+    """One representation of an asset on disk, mapped into memory, with its hash"""
+    
+    def __init__(self, path: Path, stat: os.stat_result, encoding: Optional[str] = None):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        self.encoding = encoding
+        with open(path, "rb") as f:
+            # mmap cannot map an empty file; the mapping outlives the descriptor
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.digest = hashlib.sha256(self.buffer).hexdigest()
+        self.etag = f'"{self.digest[:32]}"'
+    
+    @property
+    def version(self) -> str:
+        """Short content hash used in versioned URLs"""
+        return self.digest[:16]
+    
+    def view(self, start: int = 0, end: Optional[int] = None) -> memoryview:
+        return memoryview(self.buffer)[start:end]
+
+
+def content_type(path: Path) -> str:
+    return CONTENT_TYPES.get(path.suffix.lower()) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> List[str]:
+    """Codings the client accepts (q > 0), from an Accept-Encoding header"""
+    accepted = []
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The [start, end) of a single `bytes=` range, or None to serve the whole
+    file: no header, several ranges, or a header that is not valid syntax,
+    which is ignored rather than refused. Raises ValueError when the range
+    is valid but unsatisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None  # multipart ranges are not worth it for assets; a full 200 is allowed
+    match = BYTE_RANGE.fullmatch(spec)
+    if match is None or spec == "-":
+        return None
+    first, last = match.groups()
+    if first == "":
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - suffix), size
+    start = int(first)
+    if last and int(last) < start:
+        return None  # e.g. bytes=5-2
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    end = int(last) + 1 if last else size
+    return start, min(end, size)
+
+
+def _stat_file(path: Path) -> Optional[Tuple[Path, os.stat_result]]:
+    """The path and its stat if it is a regular file; blocking, so called in a thread"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (path, stat) if stat_mode.S_ISREG(stat.st_mode) else None
+
+
+class AssetStore:
+    """Asset files under one root, with an LRU of mapped and hashed files"""
+    
+    def __init__(self, root: str, cache_size: int):
+        self.root = Path(root).resolve()
+        self.cache_size = cache_size
+        self._files: "OrderedDict[Path, AssetFile]" = OrderedDict()
+    
+    def locate(self, relative: str) -> Optional[Tuple[Path, os.stat_result]]:
+        """
+        Absolute path and stat of an asset, or None if it is missing or outside
+        the root. Touches the filesystem, so callers on the event loop use get().
+        """
+        path = (self.root / relative.lstrip("/")).resolve()
+        if self.root not in path.parents:
+            return None
+        return _stat_file(path)
+    
+    async def _load(self, path: Path, stat: os.stat_result, encoding: Optional[str] = None) -> AssetFile:
+        cached = self._files.get(path)
+        if cached is not None and cached.key == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            self._files.move_to_end(path)
+            return cached
+        # Hashing a large model takes a while; keep it off the event loop
+        asset = await asyncio.to_thread(AssetFile, path, stat, encoding)
+        self._files[path] = asset
+        self._files.move_to_end(path)
+        while len(self._files) > self.cache_size:
+            # Dropped, not closed: responses still streaming hold views, and the mapping goes with the last one
+            self._files.popitem(last=False)
+        return asset
+    
+    async def get(self, relative: str) -> Optional[AssetFile]:
+        # resolve() and stat() block on the filesystem, so they run in a thread too
+        found = await asyncio.to_thread(self.locate, relative)
+        return await self._load(*found) if found else None
+    
+    async def representation(self, asset: AssetFile, accept_encoding: Optional[str]) -> AssetFile:
+        """The precompressed variant the client accepts, if one exists and is not older than the asset"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            found = await asyncio.to_thread(_stat_file, asset.path.with_name(asset.path.name + suffix))
+            if found is None:
+                continue
+            loaded = await self._load(*found, encoding)
+            if loaded.mtime >= asset.mtime:
+                return loaded
+        return asset
+    
+    def stats(self) -> dict:
+        return {
+            "files": len(self._files),
+            "mapped_bytes": sum(asset.size for asset in self._files.values()),
+        }
+
+
+store: Optional[AssetStore] = AssetStore(settings.assets_dir, settings.asset_cache_size) if settings.assets_dir else None
+
+
+async def asset_url(stored_path: Optional[str]) -> Optional[str]:
+    """
+    Versioned URL of a stored asset path (e.g. /models/x.glb -> /assets/models/x.glb?v=<hash>),
+    which clients may cache forever. The stored path is returned as is when the
+    file is not served by this backend.
+    """
+    if not stored_path or store is None:
+        return stored_path
+    asset = await store.get(stored_path)
+    if asset is None:
+        return stored_path
+    return f"/assets/{asset.path.relative_to(store.root).as_posix()}?v={asset.version}"
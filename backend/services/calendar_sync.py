@@ -0,0 +1,236 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+
+import httpx
+from dateutil import parser as date_parser
+from pymongo import DeleteOne, UpdateOne
+
+try:
+    from ..config import settings
+    from ..models.calendar import CalendarEvent, CalendarSyncState
+    from ..models.user import UserProfile
+    from .google_tokens import get_valid_access_token
+except ImportError:
+    from config import settings
+    from models.calendar import CalendarEvent, CalendarSyncState
+    from models.user import UserProfile
+    from services.google_tokens import get_valid_access_token
+
+# Called with a user_id after that user's events changed
+sync_listeners: List[Callable[[str], None]] = []
+
+
+class SyncTokenExpired(Exception):
+    """Google answered 410 Gone; the stored sync token must be discarded"""
+
+
+def _parse_time(value: dict) -> datetime:
+    """Naive UTC datetime from a Calendar API start/end object"""
+    if "dateTime" in value:
+        parsed = date_parser.isoparse(value["dateTime"])
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    # All-day events only carry a date
+    return datetime.fromisoformat(value["date"])
+
+
+async def _event_pages(
+    client: httpx.AsyncClient,
+    access_token: str,
+    calendar_id: str,
+    sync_token: Optional[str]
+) -> AsyncIterator[Tuple[list, Optional[str]]]:
+    """Yield (items, nextSyncToken) for every page of a full or incremental listing"""
+    url = f"{settings.google_api_url}/calendar/v3/calendars/{calendar_id}/events"
+    params = {
+        "maxResults": settings.calendar_sync_page_size,
+        "singleEvents": "true",
+        "showDeleted": "true",
+    }
+    if sync_token:
+        params["syncToken"] = sync_token
+    headers = {"Authorization": f"Bearer {access_token}"}
+    
+    while True:
+        response = await client.get(url, params=params, headers=headers)
+        if response.status_code == 410:
+            raise SyncTokenExpired()
+        response.raise_for_status()
+        body = response.json()
+        yield body.get("items", []), body.get("nextSyncToken")
+        
+        page_token = body.get("nextPageToken")
+        if not page_token:
+            return
+        params["pageToken"] = page_token
+
+
+async def _prefetch(pages: AsyncIterator, depth: int = 1) -> AsyncIterator:
+    """Fetch the next page while the caller is still writing the current one"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    done = object()
+    
+    async def produce():
+        try:
+            async for page in pages:
+                await queue.put(page)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+
+
+def changed_events_filter(user_id: str, synced_at: datetime) -> dict:
+    """Events the sync stamped `synced_at` created or edited"""
+    return {"user_id": user_id, "changed_at": synced_at}
+
+
+def _event_ops(user_id: str, items: list, synced_at: datetime) -> Iterable:
+    for item in items:
+        key = {"user_id": user_id, "event_id": item["id"]}
+        if item.get("status") == "cancelled":
+            yield DeleteOne(key)
+            continue
+        if "start" not in item or "end" not in item:
+            continue
+        fields = {
+            "title": item.get("summary", "(no title)"),
+            "description": item.get("description"),
+            "start_time": _parse_time(item["start"]),
+            "end_time": _parse_time(item["end"]),
+            "location": item.get("location"),
+            "attendees": [a["email"] for a in item.get("attendees", []) if "email" in a],
+        }
+        # $literal: Google's text must never be read as a field path or operator
+        values = {field: {"$literal": value} for field, value in fields.items()}
+        yield UpdateOne(
+            key,
+            [
+                # changed_at only moves when the content differs; last_synced marks every event seen
+                {"$set": {"changed_at": {"$cond": [
+                    {"$and": [{"$eq": [f"${field}", value]} for field, value in values.items()]},
+                    "$changed_at",
+                    synced_at,
+                ]}}},
+                {"$set": {
+                    **values,
+                    "last_synced": synced_at,
+                    # Pillar tags are assigned by us, never overwritten by a sync
+                    "life_pillar_tags": {"$ifNull": ["$life_pillar_tags", []]},
+                }},
+            ],
+            upsert=True,
+        )
+
+
+async def _apply_pages(
+    client: httpx.AsyncClient,
+    access_token: str,
+    user_id: str,
+    calendar_id: str,
+    sync_token: Optional[str],
+    synced_at: datetime
+) -> Tuple[int, Optional[str]]:
+    """Write every page of events; returns how many events were deleted and the next sync token"""
+    events = CalendarEvent.get_motor_collection()
+    deleted = 0
+    next_sync_token = None
+    async for items, page_sync_token in _prefetch(_event_pages(client, access_token, calendar_id, sync_token)):
+        ops = list(_event_ops(user_id, items, synced_at))
+        if ops:
+            # One bulk write per page, never one round trip per event
+            result = await events.bulk_write(ops, ordered=False)
+            deleted += result.deleted_count
+        next_sync_token = page_sync_token or next_sync_token
+    return deleted, next_sync_token
+
+
+async def sync_user(client: httpx.AsyncClient, user_id: str) -> dict:
+    """Bring a user's CalendarEvents up to date with Google Calendar"""
+    access_token = await get_valid_access_token(client, user_id)
+    if access_token is None:
+        return {"user_id": user_id, "status": "skipped", "changes": 0}
+    
+    states = CalendarSyncState.get_motor_collection()
+    state = await states.find_one({"user_id": user_id}) or {}
+    calendar_id = state.get("calendar_id", "primary")
+    sync_token = state.get("sync_token")
+    synced_at = datetime.utcnow()
+    
+    full = sync_token is None
+    try:
+        changes, next_sync_token = await _apply_pages(
+            client, access_token, user_id, calendar_id, sync_token, synced_at
+        )
+    except SyncTokenExpired:
+        full = True
+        changes, next_sync_token = await _apply_pages(
+            client, access_token, user_id, calendar_id, None, synced_at
+        )
+    
+    events = CalendarEvent.get_motor_collection()
+    if full:
+        # A full listing returns every live event, so anything it did not touch is gone
+        result = await events.delete_many({"user_id": user_id, "last_synced": {"$lt": synced_at}})
+        changes += result.deleted_count
+    # Events created or edited by this sync; re-listed but unchanged ones keep their changed_at
+    changes += await events.count_documents(changed_events_filter(user_id, synced_at))
+    
+    update = {"sync_token": next_sync_token, "last_synced": synced_at, "calendar_id": calendar_id}
+    if full:
+        update["last_full_sync"] = synced_at
+    if changes:
+        update["changed_at"] = synced_at
+    await states.update_one({"user_id": user_id}, {"$set": update}, upsert=True)
+    
+    if changes:
+        for listener in sync_listeners:
+            listener(user_id)
+    
+    return {"user_id": user_id, "status": "full" if full else "incremental", "changes": changes}
+
+
+async def sync_users(client: httpx.AsyncClient, user_ids: Iterable[str], concurrency: Optional[int] = None) -> List[dict]:
+    """Sync many users with a bounded pool of workers"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for user_id in user_ids:
+        queue.put_nowait(user_id)
+    results: List[dict] = []
+    
+    async def worker():
+        while True:
+            try:
+                user_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results.append(await sync_user(client, user_id))
+            except Exception as e:
+                results.append({"user_id": user_id, "status": "error", "error": str(e), "changes": 0})
+    
+    workers = min(concurrency or settings.calendar_sync_concurrency, queue.qsize())
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return results
+
+
+async def sync_all_users(client: httpx.AsyncClient) -> List[dict]:
+    """Sync every user who connected Google and left calendar sync enabled"""
+    cursor = UserProfile.get_motor_collection().find(
+        {"google_tokens": {"$ne": None}, "preferences.calendar_sync_enabled": {"$ne": False}},
+        {"_id": 0, "user_id": 1},
+    )
+    user_ids = [user["user_id"] async for user in cursor]
+    return await sync_users(client, user_ids)
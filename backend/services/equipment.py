@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+try:
+    from ..config import settings
+    from ..logs import logger
+    from ..models.avatar import Equipment
+    from .assets import asset_url
+except ImportError:
+    from config import settings
+    from logs import logger
+    from models.avatar import Equipment
+    from services.assets import asset_url
+
+# Fields of an equipment document served in the catalog
+CATALOG_PROJECTION = {
+    "_id": 0,
+    "item_id": 1,
+    "name": 1,
+    "type": 1,
+    "required_level": 1,
+    "asset_path": 1,
+    "texture_path": 1,
+    "unlock_condition": 1,
+    "is_default": 1,
+    "description": 1,
+    "rarity": 1,
+}
+# Optional fields the stored documents may lack, filled in as Equipment would
+ITEM_DEFAULTS = {
+    name: Equipment.model_fields[name].default
+    for name in ("required_level", "texture_path", "is_default", "description", "rarity")
+}
+
+
+class Catalog:
+    """
+    Immutable snapshot of the equipment catalog.
+    
+    The JSON body and its ETag are rendered once per snapshot. For every
+    pillar the items requiring it are kept sorted by required level, so the
+    items a set of levels unlocks is a bisect per pillar rather than a scan
+    of the catalog. An item needs all of its pillar requirements met.
+    """
+    
+    def __init__(self, items: List[dict]):
+        self.items = sorted(({**ITEM_DEFAULTS, **item} for item in items), key=lambda item: item["item_id"])
+        self.by_id = {item["item_id"]: item for item in self.items}
+        self.body = orjson.dumps(self.items)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        
+        self.requirements: Dict[str, Dict[str, int]] = {}
+        self.always: List[str] = []  # no level requirement
+        by_pillar: Dict[str, List[Tuple[int, str]]] = {}
+        for item in self.items:
+            required = {str(p): int(level) for p, level in (item.get("required_level") or {}).items()}
+            self.requirements[item["item_id"]] = required
+            if not required:
+                self.always.append(item["item_id"])
+            for pillar, level in required.items():
+                by_pillar.setdefault(pillar, []).append((level, item["item_id"]))
+        # pillar -> (required levels ascending, item ids in the same order)
+        self.thresholds: Dict[str, Tuple[List[int], List[str]]] = {}
+        for pillar, entries in by_pillar.items():
+            entries.sort()
+            self.thresholds[pillar] = ([level for level, _ in entries], [item_id for _, item_id in entries])
+    
+    def _meets(self, item_id: str, levels: Dict[str, int]) -> bool:
+        return all(levels.get(p, 1) >= level for p, level in self.requirements[item_id].items())
+    
+    def unlocked(self, levels: Dict[str, int]) -> List[str]:
+        """Ids of the items unlocked at `levels` (pillar -> level), in catalog order"""
+        met: Dict[str, int] = {}
+        for pillar, (required, item_ids) in self.thresholds.items():
+            for item_id in item_ids[:bisect_right(required, levels.get(pillar, 1))]:
+                met[item_id] = met.get(item_id, 0) + 1
+        unlocked = set(self.always)
+        unlocked.update(item_id for item_id, n in met.items() if n == len(self.requirements[item_id]))
+        return [item["item_id"] for item in self.items if item["item_id"] in unlocked]
+    
+    def newly_unlocked(self, old_levels: Dict[str, int], new_levels: Dict[str, int]) -> Dict[str, List[dict]]:
+        """
+        Items unlocked by going from `old_levels` to `new_levels`, keyed by the
+        pillar whose level-up unlocked them. Only the items with a threshold
+        between the old and new level of a pillar are looked at.
+        """
+        found: Dict[str, List[dict]] = {}
+        seen = set()
+        for pillar, new_level in new_levels.items():
+            old_level = old_levels.get(pillar, 1)
+            if new_level <= old_level or pillar not in self.thresholds:
+                continue
+            required, item_ids = self.thresholds[pillar]
+            for item_id in item_ids[bisect_right(required, old_level):bisect_right(required, new_level)]:
+                if item_id not in seen and self._meets(item_id, new_levels):
+                    seen.add(item_id)
+                    found.setdefault(pillar, []).append(_summary(self.by_id[item_id]))
+        return found
+
+
+def _summary(item: dict) -> dict:
+    return {key: item.get(key) for key in ("item_id", "name", "type", "rarity")}
+
+
+catalog = Catalog([])
+
+
+async def load_catalog() -> bool:
+    """Read the catalog from Mongo and swap it in if it changed; returns whether it did"""
+    global catalog
+    items = await Equipment.get_motor_collection().find({}, CATALOG_PROJECTION).to_list(length=None)
+    for item in items:
+        # Part of the ETag, so a changed model file also changes the catalog clients hold
+        item["asset_url"] = await asset_url(item.get("asset_path"))
+        item["texture_url"] = await asset_url(item.get("texture_path"))
+    fresh = Catalog(items)
+    if fresh.etag == catalog.etag:
+        return False
+    catalog = fresh
+    return True
+
+
+def get_catalog() -> Catalog:
+    return catalog
+
+
+class CatalogRefresher:
+    """Background job reloading the catalog, so edits made elsewhere reach every worker"""
+    
+    def __init__(self):
+        self.interval = settings.equipment_catalog_refresh_seconds
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await load_catalog():
+                    print(f"✓ Equipment catalog reloaded: {len(catalog.items)} items")
+            except Exception as e:
+                logger.warning("equipment_catalog_reload_failed", error=str(e))
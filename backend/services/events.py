@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+
+try:
+    from ..config import settings
+    from ..logs import logger
+except ImportError:
+    from config import settings
+    from logs import logger
+
+# Sent instead of the backlog when a client falls too far behind; it should refetch over REST
+RESYNC = {"type": "resync"}
+
+
+class Connection:
+    """
+    One WebSocket with a bounded send queue drained by its own sender task.
+    
+    Events that carry a coalesce key (state snapshots such as a pillar's XP)
+    replace a queued event with the same key instead of queueing behind it.
+    If the queue is still full, the backlog is dropped for a single resync.
+    """
+    
+    def __init__(self, websocket: WebSocket, user_id: str, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue_size = queue_size
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._queue: "OrderedDict[object, str]" = OrderedDict()
+        self._wake = asyncio.Event()
+        self._seq = 0
+    
+    def enqueue(self, payload: str, coalesce_key: Optional[str] = None):
+        if coalesce_key is not None and coalesce_key in self._queue:
+            self._queue[coalesce_key] = payload
+            self.coalesced += 1
+            return
+        if len(self._queue) >= self.queue_size:
+            self.dropped += len(self._queue)
+            self._queue.clear()
+            self._queue["resync"] = json.dumps(RESYNC)
+            self._wake.set()
+            return
+        if coalesce_key is None:
+            self._seq += 1
+            coalesce_key = self._seq
+        self._queue[coalesce_key] = payload
+        self._wake.set()
+    
+    async def run_sender(self, heartbeat: float, send_timeout: float):
+        """Send queued events in order, and a heartbeat whenever the connection has been idle"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                self._queue.setdefault("heartbeat", json.dumps({"type": "heartbeat", "ts": time.time()}))
+            self._wake.clear()
+            while self._queue:
+                _, payload = self._queue.popitem(last=False)
+                # A client that cannot take a frame in time is disconnected rather than buffered for
+                await asyncio.wait_for(self.websocket.send_text(payload), send_timeout)
+                self.sent += 1
+
+
+class EventHub:
+    """
+    Per-user fan-out of events to the WebSocket connections of this worker.
+    
+    With a Redis client, events are also published on a pub/sub channel and
+    every worker delivers the ones published by the others, so a user gets
+    an event whichever worker handled the write.
+    """
+    
+    def __init__(self, redis_client=None, channel: str = "events"):
+        self.connections: Dict[str, Set[Connection]] = {}
+        self.published = 0
+        self.delivered = 0
+        self._redis = redis_client
+        self._channel = channel
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+    
+    def add(self, connection: Connection):
+        self.connections.setdefault(connection.user_id, set()).add(connection)
+    
+    def remove(self, connection: Connection):
+        connections = self.connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.connections[connection.user_id]
+    
+    def deliver(self, user_id: str, payload: str, coalesce_key: Optional[str] = None):
+        """Queue an already-encoded event on every local connection of a user"""
+        for connection in self.connections.get(user_id, ()):
+            connection.enqueue(payload, coalesce_key)
+            self.delivered += 1
+    
+    async def publish(self, user_id: str, event_type: str, data: dict, coalesce_key: Optional[str] = None):
+        """Send an event to every connection of a user, on this worker and, with a backplane, on the others"""
+        self.published += 1
+        payload = json.dumps({"type": event_type, "ts": time.time(), "data": data}, default=str)
+        self.deliver(user_id, payload, coalesce_key)
+        if self._redis is not None:
+            message = {"origin": self._origin, "user_id": user_id, "payload": payload, "coalesce_key": coalesce_key}
+            await self._redis.publish(self._channel, json.dumps(message))
+    
+    async def start(self):
+        if self._redis is None or self._listener is not None:
+            return
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self._channel)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+    
+    async def _listen(self, pubsub):
+        try:
+            while True:
+                try:
+                    message = await pubsub.get_message(timeout=1.0)
+                except Exception as e:
+                    # redis-py reconnects and resubscribes on the next read
+                    logger.warning("event_backplane_read_failed", error=str(e))
+                    await asyncio.sleep(1.0)
+                    continue
+                if message is None:
+                    continue
+                try:
+                    event = json.loads(message["data"])
+                    # Our own events were delivered locally when they were published
+                    if event["origin"] != self._origin:
+                        self.deliver(event["user_id"], event["payload"], event["coalesce_key"])
+                except (ValueError, KeyError) as e:
+                    # Anyone can publish on the channel; one bad message must not stop the listener
+                    logger.warning("event_backplane_message_malformed", error=repr(e))
+        finally:
+            await pubsub.reset()
+    
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+    
+    def stats(self) -> dict:
+        connections = [c for group in self.connections.values() for c in group]
+        return {
+            "backplane": "redis" if self._redis is not None else None,
+            "users": len(self.connections),
+            "connections": len(connections),
+            "published": self.published,
+            "delivered": self.delivered,
+            "sent": sum(c.sent for c in connections),
+            "coalesced": sum(c.coalesced for c in connections),
+            "dropped": sum(c.dropped for c in connections),
+        }
+
+
+hub = EventHub()
+
+
+async def init_event_hub(redis_client=None):
+    """Select the configured backend; with "redis" the hub also listens on the shared channel"""
+    global hub
+    if settings.events_backend == "redis":
+        if redis_client is None:
+            from redis import asyncio as aioredis
+            redis_client = aioredis.from_url(settings.redis_url)
+        hub = EventHub(redis_client, settings.events_redis_channel)
+        try:
+            await hub.start()
+            return
+        except Exception as e:
+            logger.warning("event_backplane_unavailable", error=str(e))
+            await redis_client.aclose()
+    hub = EventHub()
+
+
+async def publish(user_id: str, event_type: str, data: dict, coalesce_key: Optional[str] = None):
+    """Publish to the current hub; events are a side channel, so failures never fail the write"""
+    try:
+        await hub.publish(user_id, event_type, data, coalesce_key)
+    except Exception as e:
+        logger.warning("event_publish_failed", user_id=user_id, error=str(e))
+
+
+async def publish_xp(user_id: str, results: dict):
+    """Events for the outcome of a grant_xp call: one XP snapshot per pillar, plus level-ups"""
+    for pillar, result in results.items():
+        await publish(user_id, "xp", {
+            "pillar": pillar.value,
+            "xp_added": result["xp_added"],
+            "total_xp": result["total_xp"],
+            "level": result["level"],
+        }, coalesce_key=f"xp:{pillar.value}")
+        if result["leveled_up"]:
+            await publish(user_id, "level_up", {
+                "pillar": pillar.value,
+                "level": result["level"],
+                "unlocked_items": result.get("unlocked_items", []),
+            })
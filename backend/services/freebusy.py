@@ -0,0 +1,122 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    from ..cache import TTLCache
+    from ..config import settings
+    from ..models.calendar import CalendarEvent
+    from .calendar_sync import sync_listeners
+except ImportError:
+    from cache import TTLCache
+    from config import settings
+    from models.calendar import CalendarEvent
+    from services.calendar_sync import sync_listeners
+
+Interval = Tuple[datetime, datetime]
+
+
+class BusyIndex:
+    """
+    Merged busy intervals of one user inside a window, kept as two parallel
+    sorted arrays. Because merged intervals never overlap, both arrays are
+    sorted and any range query is a bisect plus a walk over the k hits.
+    """
+    
+    __slots__ = ("starts", "ends", "window_start", "window_end")
+    
+    def __init__(self, intervals: Iterable[Interval], window_start: datetime, window_end: datetime):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            start, end = max(start, window_start), min(end, window_end)
+            if start >= end:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+    
+    def covers(self, start: datetime, end: datetime) -> bool:
+        return self.window_start <= start and end <= self.window_end
+    
+    def busy(self, start: datetime, end: datetime) -> List[Interval]:
+        """Busy blocks overlapping [start, end), clipped to it"""
+        result = []
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            result.append((max(self.starts[i], start), min(self.ends[i], end)))
+            i += 1
+        return result
+    
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        i = bisect_right(self.ends, start)
+        return i >= len(self.starts) or self.starts[i] >= end
+    
+    def free(self, start: datetime, end: datetime, min_duration: timedelta = timedelta(0)) -> List[Interval]:
+        """Gaps of at least min_duration inside [start, end)"""
+        gaps = []
+        cursor = start
+        for busy_start, busy_end in self.busy(start, end):
+            if busy_start - cursor >= min_duration and busy_start > cursor:
+                gaps.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if end - cursor >= min_duration and end > cursor:
+            gaps.append((cursor, end))
+        return gaps
+    
+    def next_free(self, at: datetime) -> datetime:
+        """Earliest instant at or after `at` that is not busy"""
+        i = bisect_left(self.ends, at)
+        if i < len(self.starts) and self.starts[i] <= at:
+            return self.ends[i]
+        return at
+
+
+# Per-user busy index covering the next few days, dropped whenever a sync changes events
+_cache = TTLCache(maxsize=settings.freebusy_cache_size, ttl=settings.freebusy_cache_ttl_seconds)
+
+
+def invalidate(user_id: str):
+    _cache.pop(user_id)
+
+
+sync_listeners.append(invalidate)
+
+
+def busy_filter(user_id: str, start: datetime, end: datetime) -> dict:
+    return {"user_id": user_id, "end_time": {"$gt": start}, "start_time": {"$lt": end}}
+
+
+async def load_busy_intervals(user_id: str, start: datetime, end: datetime) -> List[Interval]:
+    """Events overlapping [start, end), served by the (user_id, end_time, start_time) index"""
+    cursor = CalendarEvent.get_motor_collection().find(
+        busy_filter(user_id, start, end),
+        {"_id": 0, "start_time": 1, "end_time": 1},
+    ).hint("user_end_start")
+    return [(row["start_time"], row["end_time"]) async for row in cursor]
+
+
+def _cache_window(now: Optional[datetime] = None) -> Interval:
+    start = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=settings.freebusy_cache_days)
+
+
+async def get_busy_index(user_id: str, start: datetime, end: datetime) -> BusyIndex:
+    """Busy index covering [start, end), from the cache when the range falls inside its window"""
+    index = _cache.get(user_id)
+    if index is not None and index.covers(start, end):
+        return index
+    
+    window_start, window_end = _cache_window()
+    if window_start <= start and end <= window_end:
+        index = BusyIndex(await load_busy_intervals(user_id, window_start, window_end), window_start, window_end)
+        _cache.set(user_id, index)
+        return index
+    
+    # Outside the cached horizon: answer directly without caching
+    return BusyIndex(await load_busy_intervals(user_id, start, end), start, end)
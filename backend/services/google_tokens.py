@@ -0,0 +1,246 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from weakref import WeakValueDictionary
+
+import httpx
+from pymongo import ReturnDocument
+
+try:
+    from ..config import settings
+    from ..logs import logger
+    from ..models.user import UserProfile
+except ImportError:
+    from config import settings
+    from logs import logger
+    from models.user import UserProfile
+
+# Tokens this close to expiry are refreshed before use
+EXPIRY_MARGIN = timedelta(seconds=60)
+
+# A refresh is claimed by setting this lease in the user's document, so one
+# worker at a time spends a refresh token; an expired lease can be taken over
+LEASE_FIELD = "google_tokens.refreshing_until"
+LEASE_POLL_SECONDS = 0.2
+
+EXPIRING_SORT = [("google_tokens.token_expiry", 1)]
+
+# One lock per user so concurrent on-demand refreshes in this worker wait on one lease
+_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+
+def _user_lock(user_id: str) -> asyncio.Lock:
+    lock = _locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[user_id] = lock
+    return lock
+
+
+class RefreshRevoked(Exception):
+    """Google rejected the refresh token; the user must sign in again"""
+
+
+async def _request_refresh(client: httpx.AsyncClient, refresh_token: str) -> dict:
+    response = await client.post(
+        f"{settings.google_oauth_url}/token",
+        data={
+            "client_id": settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        },
+    )
+    if response.status_code == 400 and response.json().get("error") == "invalid_grant":
+        raise RefreshRevoked()
+    response.raise_for_status()
+    
+    tokens = response.json()
+    refreshed = {
+        "access_token": tokens["access_token"],
+        "token_expiry": datetime.utcnow() + timedelta(seconds=tokens.get("expires_in", 3600)),
+    }
+    # Google only sometimes rotates the refresh token
+    if tokens.get("refresh_token"):
+        refreshed["refresh_token"] = tokens["refresh_token"]
+    return refreshed
+
+
+def _token_update(refreshed: dict) -> dict:
+    return {
+        "$set": {f"google_tokens.{field}": value for field, value in refreshed.items()},
+        "$unset": {LEASE_FIELD: ""},
+    }
+
+
+REVOKED_UPDATE = {"$set": {"google_tokens.refresh_token": None}, "$unset": {LEASE_FIELD: ""}}
+RELEASE_UPDATE = {"$unset": {LEASE_FIELD: ""}}
+
+
+def _unleased(now: datetime) -> dict:
+    """Filter for tokens nobody holds a live lease on"""
+    return {LEASE_FIELD: {"$not": {"$gt": now}}}
+
+
+def expiring_filter(until: datetime, now: datetime) -> dict:
+    """Refreshable tokens expiring by `until` that nobody is refreshing"""
+    return {
+        "google_tokens.token_expiry": {"$lte": until},
+        "google_tokens.refresh_token": {"$ne": None},
+        **_unleased(now),
+    }
+
+
+async def _claim(user_id: str) -> Optional[Tuple[dict, datetime]]:
+    """
+    Take the refresh lease on a user's tokens. Returns the tokens as they
+    were when claimed and the lease, or None if another refresh holds the
+    lease or there is no refresh token.
+    """
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=settings.google_token_refresh_lease_seconds)
+    lease = lease.replace(microsecond=lease.microsecond // 1000 * 1000)  # as BSON stores it, to match on later
+    user = await UserProfile.get_motor_collection().find_one_and_update(
+        {"user_id": user_id, "google_tokens.refresh_token": {"$ne": None}, **_unleased(now)},
+        {"$set": {LEASE_FIELD: lease}},
+        projection={"_id": 0, "google_tokens": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not user:
+        return None
+    return user["google_tokens"], lease
+
+
+async def _write_leased(user_id: str, lease: datetime, update: dict) -> bool:
+    """
+    Apply `update` only while `lease` is still ours. Returns False if it
+    expired and another refresh took the tokens over, whose write wins.
+    """
+    result = await UserProfile.get_motor_collection().update_one({"user_id": user_id, LEASE_FIELD: lease}, update)
+    if not result.matched_count:
+        logger.warning("google_token_lease_lost", user_id=user_id)
+        return False
+    return True
+
+
+async def _read_tokens(user_id: str) -> Optional[dict]:
+    user = await UserProfile.get_motor_collection().find_one(
+        {"user_id": user_id}, {"_id": 0, "google_tokens": 1}
+    )
+    return (user or {}).get("google_tokens")
+
+
+async def get_valid_access_token(client: httpx.AsyncClient, user_id: str) -> Optional[str]:
+    """
+    Google access token for a user, refreshed on demand if it is about to
+    expire. Returns None if the user has no usable Google tokens.
+    """
+    tokens = await _read_tokens(user_id)
+    if not tokens:
+        return None
+    if tokens["token_expiry"] > datetime.utcnow() + EXPIRY_MARGIN:
+        return tokens["access_token"]
+    
+    async with _user_lock(user_id):
+        while True:
+            # Someone else may have refreshed while we waited for the lock or the lease
+            tokens = await _read_tokens(user_id)
+            if not tokens or not tokens.get("refresh_token"):
+                return None
+            if tokens["token_expiry"] > datetime.utcnow() + EXPIRY_MARGIN:
+                return tokens["access_token"]
+            claimed = await _claim(user_id)
+            if claimed is not None:
+                break
+            # Another worker is refreshing; its lease ends with a write or times out
+            await asyncio.sleep(LEASE_POLL_SECONDS)
+        
+        tokens, lease = claimed
+        # Checked again under the lease: the holder may have written just before we claimed
+        if tokens["token_expiry"] > datetime.utcnow() + EXPIRY_MARGIN:
+            await _write_leased(user_id, lease, RELEASE_UPDATE)
+            return tokens["access_token"]
+        try:
+            refreshed = await _request_refresh(client, tokens["refresh_token"])
+        except RefreshRevoked:
+            await _write_leased(user_id, lease, REVOKED_UPDATE)
+            return None
+        except BaseException:
+            await _write_leased(user_id, lease, RELEASE_UPDATE)
+            raise
+        # Usable even if the lease was lost meanwhile; only the stored tokens are the other refresh's
+        await _write_leased(user_id, lease, _token_update(refreshed))
+        return refreshed["access_token"]
+
+
+class TokenRefresher:
+    """Background job refreshing Google tokens shortly before they expire"""
+    
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.interval = settings.google_token_refresh_interval_seconds
+        self.window = timedelta(seconds=settings.google_token_refresh_window_seconds)
+        self.concurrency = settings.google_token_refresh_concurrency
+        self.batch_size = settings.google_token_refresh_batch_size
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        while True:
+            try:
+                refreshed = await self.refresh_expiring()
+                if refreshed:
+                    print(f"✓ Refreshed {refreshed} Google tokens")
+            except Exception as e:
+                logger.warning("google_token_refresh_failed", error=str(e))
+            await asyncio.sleep(self.interval)
+    
+    async def refresh_expiring(self) -> int:
+        """Refresh every token expiring within the window; returns how many were written"""
+        collection = UserProfile.get_motor_collection()
+        now = datetime.utcnow()
+        cursor = collection.find(
+            expiring_filter(now + self.window, now), {"_id": 0, "user_id": 1}
+        ).sort(EXPIRING_SORT).limit(self.batch_size)
+        due = await cursor.to_list(length=self.batch_size)
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def refresh(user: dict) -> bool:
+            """Refresh one user's tokens and write the outcome straight away, freeing the lease"""
+            user_id = user["user_id"]
+            async with semaphore:
+                claimed = await _claim(user_id)
+                if claimed is None:
+                    # Another worker, or an on-demand refresh, holds the lease
+                    return False
+                tokens, lease = claimed
+                if tokens["token_expiry"] > datetime.utcnow() + self.window:
+                    await _write_leased(user_id, lease, RELEASE_UPDATE)  # refreshed since it was selected
+                    return False
+                try:
+                    refreshed = await _request_refresh(self.client, tokens["refresh_token"])
+                except RefreshRevoked:
+                    return await _write_leased(user_id, lease, REVOKED_UPDATE)
+                except Exception as e:
+                    logger.warning("google_token_refresh_failed", user_id=user_id, error=str(e))
+                    await _write_leased(user_id, lease, RELEASE_UPDATE)
+                    return False
+                return await _write_leased(user_id, lease, _token_update(refreshed))
+        
+        outcomes = await asyncio.gather(*(refresh(user) for user in due), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                # A failed write leaves its lease to expire; the user is picked up again then
+                logger.warning("google_token_refresh_failed", error=str(outcome))
+        return sum(outcome is True for outcome in outcomes)
@@ -0,0 +1,281 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+try:
+    from ..config import settings
+    from ..logs import logger
+    from ..models.user import UserProfile
+    from ..models.enums import LifePillar
+except ImportError:
+    from config import settings
+    from logs import logger
+    from models.user import UserProfile
+    from models.enums import LifePillar
+
+GLOBAL_BOARD = "global"
+BOARDS = [GLOBAL_BOARD] + [pillar.value for pillar in LifePillar]
+
+
+def _entry(rank: int, user_id: str, score: int) -> dict:
+    return {"rank": rank, "user_id": user_id, "score": score}
+
+
+class _Board:
+    """Scores of one leaderboard kept in (-score, user_id) order for O(log n) ranks"""
+    
+    def __init__(self, entries: Iterable[Tuple[str, int]] = ()):
+        self.scores: Dict[str, int] = dict(entries)
+        self.order = SortedList((-score, user_id) for user_id, score in self.scores.items())
+    
+    def set(self, user_id: str, score: int):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.order.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.order.add((-score, user_id))
+    
+    def rank(self, user_id: str) -> Optional[int]:
+        """0-based position of the user, best first"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.order.index((-score, user_id))
+
+
+class MemoryLeaderboard:
+    """In-process leaderboards; each worker holds its own copy"""
+    
+    def __init__(self):
+        self._boards: Dict[str, _Board] = defaultdict(_Board)
+    
+    async def load(self, boards: Dict[str, List[Tuple[str, int]]]):
+        for board, entries in boards.items():
+            self._boards[board] = _Board(entries)
+    
+    async def set_score(self, board: str, user_id: str, score: int):
+        self._boards[board].set(user_id, score)
+    
+    async def add(self, board: str, user_id: str, score: int):
+        b = self._boards[board]
+        if user_id not in b.scores:
+            b.set(user_id, score)
+    
+    async def incr_score(self, board: str, user_id: str, delta: int):
+        b = self._boards[board]
+        b.set(user_id, b.scores.get(user_id, 0) + delta)
+    
+    async def top(self, board: str, k: int) -> List[dict]:
+        return [
+            _entry(i + 1, user_id, -neg_score)
+            for i, (neg_score, user_id) in enumerate(self._boards[board].order.islice(0, k))
+        ]
+    
+    async def rank(self, board: str, user_id: str) -> Optional[dict]:
+        b = self._boards[board]
+        position = b.rank(user_id)
+        if position is None:
+            return None
+        return _entry(position + 1, user_id, b.scores[user_id])
+    
+    async def around(self, board: str, user_id: str, radius: int) -> List[dict]:
+        b = self._boards[board]
+        position = b.rank(user_id)
+        if position is None:
+            return []
+        start = max(0, position - radius)
+        return [
+            _entry(start + i + 1, uid, -neg_score)
+            for i, (neg_score, uid) in enumerate(b.order.islice(start, position + radius + 1))
+        ]
+
+
+class RedisLeaderboard:
+    """Leaderboards kept in Redis sorted sets, shared by every worker"""
+    
+    def __init__(self, client, prefix: str = "leaderboard:"):
+        self._redis = client
+        self._prefix = prefix
+    
+    def _key(self, board: str) -> str:
+        return f"{self._prefix}{board}"
+    
+    async def load(self, boards: Dict[str, List[Tuple[str, int]]]):
+        # Another worker (or a previous run) already populated the sets
+        if await self._redis.exists(self._key(GLOBAL_BOARD)):
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for board, entries in boards.items():
+                for i in range(0, len(entries), 10_000):
+                    pipe.zadd(self._key(board), dict(entries[i:i + 10_000]))
+            await pipe.execute()
+    
+    async def members(self, board: str) -> List[str]:
+        return [_decode(uid) for uid in await self._redis.zrange(self._key(board), 0, -1)]
+    
+    async def reconcile(self, boards: Dict[str, List[Tuple[str, int]]], known: Iterable[str]):
+        """
+        Bring the sorted sets in line with `boards`, read from user_profiles
+        after `known` was read from the global board.
+        
+        Scores are only ever raised (ZADD GT): XP never goes down, so a
+        lower score read from Mongo is one a concurrent grant has already
+        overtaken. Users in `known` but not in `boards` have been deleted;
+        users added since `known` was read are left alone.
+        """
+        stale = list(set(known).difference(user_id for user_id, _ in boards[GLOBAL_BOARD]))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for board, entries in boards.items():
+                for i in range(0, len(entries), 10_000):
+                    pipe.zadd(self._key(board), dict(entries[i:i + 10_000]), gt=True)
+            for i in range(0, len(stale), 10_000):
+                for board in BOARDS:
+                    pipe.zrem(self._key(board), *stale[i:i + 10_000])
+            await pipe.execute()
+    
+    async def set_score(self, board: str, user_id: str, score: int):
+        await self._redis.zadd(self._key(board), {user_id: score})
+    
+    async def add(self, board: str, user_id: str, score: int):
+        await self._redis.zadd(self._key(board), {user_id: score}, nx=True)
+    
+    async def incr_score(self, board: str, user_id: str, delta: int):
+        await self._redis.zincrby(self._key(board), delta, user_id)
+    
+    async def top(self, board: str, k: int) -> List[dict]:
+        rows = await self._redis.zrevrange(self._key(board), 0, k - 1, withscores=True)
+        return [_entry(i + 1, _decode(uid), int(score)) for i, (uid, score) in enumerate(rows)]
+    
+    async def rank(self, board: str, user_id: str) -> Optional[dict]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(self._key(board), user_id)
+            pipe.zscore(self._key(board), user_id)
+            position, score = await pipe.execute()
+        if position is None:
+            return None
+        return _entry(position + 1, user_id, int(score))
+    
+    async def around(self, board: str, user_id: str, radius: int) -> List[dict]:
+        position = await self._redis.zrevrank(self._key(board), user_id)
+        if position is None:
+            return []
+        start = max(0, position - radius)
+        rows = await self._redis.zrevrange(self._key(board), start, position + radius, withscores=True)
+        return [_entry(start + i + 1, _decode(uid), int(score)) for i, (uid, score) in enumerate(rows)]
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+leaderboard = MemoryLeaderboard()
+
+
+async def _read_boards() -> Dict[str, List[Tuple[str, int]]]:
+    """Every board's entries, read from user_profiles"""
+    boards: Dict[str, List[Tuple[str, int]]] = {board: [] for board in BOARDS}
+    unknown = set()
+    cursor = UserProfile.get_motor_collection().find(
+        {}, {"_id": 0, "user_id": 1, "total_xp": 1}
+    ).batch_size(5000)
+    async for row in cursor:
+        total_xp = row.get("total_xp") or {}
+        for pillar, xp in total_xp.items():
+            if pillar in boards:
+                boards[pillar].append((row["user_id"], xp))
+            else:
+                unknown.add(pillar)
+        boards[GLOBAL_BOARD].append((row["user_id"], sum(total_xp.values())))
+    if unknown:
+        # Still counted on the global board, which sums every pillar stored
+        logger.warning("leaderboard_unknown_pillars", pillars=sorted(unknown))
+    return boards
+
+
+async def init_leaderboard(redis_client=None):
+    """Select the configured backend and fill it from user_profiles"""
+    global leaderboard
+    if settings.leaderboard_backend == "redis":
+        if redis_client is None:
+            from redis import asyncio as aioredis
+            redis_client = aioredis.from_url(settings.redis_url)
+        leaderboard = RedisLeaderboard(redis_client)
+    else:
+        leaderboard = MemoryLeaderboard()
+    await leaderboard.load(await _read_boards())
+
+
+async def reload_leaderboard():
+    """
+    Bring the boards back in line with user_profiles: the memory boards are
+    rebuilt and swapped in, the Redis ones reconciled in place.
+    """
+    global leaderboard
+    if isinstance(leaderboard, RedisLeaderboard):
+        # Read before user_profiles, so users created in between are not taken for deleted ones
+        known = await leaderboard.members(GLOBAL_BOARD)
+        await leaderboard.reconcile(await _read_boards(), known)
+        return
+    fresh = MemoryLeaderboard()
+    await fresh.load(await _read_boards())
+    leaderboard = fresh
+
+
+class LeaderboardRefresher:
+    """
+    Background job reloading the boards. Each memory worker only sees its own
+    grants, so this is what brings in the XP granted by the other workers.
+    The shared Redis boards are reconciled instead, repairing updates that
+    failed (see record_xp) and removing deleted users.
+    """
+    
+    def __init__(self):
+        self.interval = settings.leaderboard_reload_seconds
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await reload_leaderboard()
+            except Exception as e:
+                logger.warning("leaderboard_reload_failed", error=str(e))
+
+
+async def add_user(user_id: str, total_xp: Optional[Dict[str, int]] = None):
+    """Put a new user on every board; users already on a board keep their score"""
+    total_xp = total_xp or {}
+    try:
+        for pillar in LifePillar:
+            await leaderboard.add(pillar.value, user_id, total_xp.get(pillar.value, 0))
+        await leaderboard.add(GLOBAL_BOARD, user_id, sum(total_xp.values()))
+    except Exception as e:
+        logger.warning("leaderboard_update_failed", user_id=user_id, error=str(e))
+
+
+async def record_xp(user_id: str, results: Dict[LifePillar, dict]):
+    """Apply the outcome of a grant_xp call to the pillar and global boards"""
+    try:
+        for pillar, result in results.items():
+            await leaderboard.set_score(pillar.value, user_id, result["total_xp"])
+        await leaderboard.incr_score(
+            GLOBAL_BOARD, user_id, sum(result["xp_added"] for result in results.values())
+        )
+    except Exception as e:
+        # The boards are derived data; a failed update must not fail the grant
+        logger.warning("leaderboard_update_failed", user_id=user_id, error=str(e))
@@ -0,0 +1,454 @@
+"""
+Binary face-mesh format and its GridFS storage.
+
+A mesh file is a fixed little-endian header, optional quantization bounds and a
+payload of packed arrays, optionally deflated:
+
+    header   magic "LVMS", version u16, flags u16, vertex_count u32,
+             index_count u32, payload_size u32 (bytes as stored)
+    bounds   6 x float32 min/max xyz, only with FLAG_QUANTIZED
+    payload  positions  float32 x 3n, or uint16 x 3n (+ padding to 4 bytes) when quantized
+             normals    float32 x 3n  with FLAG_NORMALS
+             uvs        float32 x 2n  with FLAG_UVS
+             indices    uint32 x m
+
+Unquantized, uncompressed files decode with np.frombuffer views and no copies.
+"""
+import asyncio
+import hashlib
+import struct
+import zlib
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+try:
+    from ..config import settings
+    from ..logs import logger
+    from ..models.avatar import AvatarConfiguration
+except ImportError:
+    from config import settings
+    from logs import logger
+    from models.avatar import AvatarConfiguration
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b"LVMS"
+VERSION = 1
+MEDIA_TYPE = "application/vnd.levelup.mesh"
+
+FLAG_NORMALS = 1
+FLAG_UVS = 2
+FLAG_QUANTIZED = 4
+FLAG_DEFLATE = 8
+KNOWN_FLAGS = FLAG_NORMALS | FLAG_UVS | FLAG_QUANTIZED | FLAG_DEFLATE
+
+HEADER = struct.Struct("<4sHHIII")
+BOUNDS = struct.Struct("<6f")
+QUANT_MAX = 65535
+
+
+class MeshError(ValueError):
+    """The mesh data is malformed"""
+
+
+class MeshHeader:
+    def __init__(self, flags: int, vertex_count: int, index_count: int, payload_size: int, bounds=None):
+        self.flags = flags
+        self.vertex_count = vertex_count
+        self.index_count = index_count
+        self.payload_size = payload_size
+        self.bounds = bounds
+    
+    @property
+    def size(self) -> int:
+        """Bytes before the payload"""
+        return HEADER.size + (BOUNDS.size if self.flags & FLAG_QUANTIZED else 0)
+    
+    @property
+    def raw_payload_size(self) -> int:
+        """Payload bytes once inflated"""
+        n = self.vertex_count
+        size = _padded(2 * 3 * n) if self.flags & FLAG_QUANTIZED else 4 * 3 * n
+        if self.flags & FLAG_NORMALS:
+            size += 4 * 3 * n
+        if self.flags & FLAG_UVS:
+            size += 4 * 2 * n
+        return size + 4 * self.index_count
+
+
+def _padded(size: int) -> int:
+    return (size + 3) & ~3
+
+
+def parse_header(data: bytes) -> MeshHeader:
+    """Header of a mesh file from its first bytes; needs HEADER.size, plus BOUNDS.size when quantized"""
+    if len(data) < HEADER.size:
+        raise MeshError("Truncated mesh header")
+    magic, version, flags, vertex_count, index_count, payload_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise MeshError("Not a mesh file")
+    if version != VERSION:
+        raise MeshError(f"Unsupported mesh version {version}")
+    if flags & ~KNOWN_FLAGS:
+        raise MeshError(f"Unknown mesh flags {flags:#x}")
+    if vertex_count > settings.mesh_max_vertices:
+        raise MeshError(f"Too many vertices ({vertex_count} > {settings.mesh_max_vertices})")
+    if index_count > settings.mesh_max_indices:
+        raise MeshError(f"Too many indices ({index_count} > {settings.mesh_max_indices})")
+    if index_count % 3:
+        raise MeshError("Index count is not a multiple of 3")
+    bounds = None
+    if flags & FLAG_QUANTIZED:
+        if len(data) < HEADER.size + BOUNDS.size:
+            raise MeshError("Truncated mesh header")
+        bounds = BOUNDS.unpack_from(data, HEADER.size)
+    header = MeshHeader(flags, vertex_count, index_count, payload_size, bounds)
+    if not flags & FLAG_DEFLATE and payload_size != header.raw_payload_size:
+        raise MeshError("Payload size does not match the header")
+    return header
+
+
+def encode(positions, indices, normals=None, uvs=None, quantize: bool = False, compress: bool = False) -> bytes:
+    """Pack arrays (positions (n, 3), indices (m,), normals (n, 3), uvs (n, 2)) into a mesh file"""
+    import numpy as np  # imported on first use, it is slow to import and most workers never need it
+    
+    positions = np.asarray(positions, dtype="<f4").reshape(-1, 3)
+    indices = np.asarray(indices, dtype="<u4").reshape(-1)
+    n = len(positions)
+    if len(indices) % 3:
+        raise MeshError("Index count is not a multiple of 3")
+    if indices.size and int(indices.max()) >= n:
+        raise MeshError("Index out of range")
+    
+    flags = 0
+    parts = []
+    bounds = b""
+    if quantize and n:
+        flags |= FLAG_QUANTIZED
+        lo, hi = positions.min(axis=0), positions.max(axis=0)
+        scale = np.where(hi > lo, hi - lo, 1.0)
+        quantized = np.rint((positions - lo) / scale * QUANT_MAX).astype("<u2").tobytes()
+        parts.append(quantized + b"\0" * (_padded(len(quantized)) - len(quantized)))
+        bounds = BOUNDS.pack(*lo.tolist(), *hi.tolist())
+    else:
+        parts.append(positions.tobytes())
+    if normals is not None:
+        flags |= FLAG_NORMALS
+        parts.append(np.asarray(normals, dtype="<f4").reshape(n, 3).tobytes())
+    if uvs is not None:
+        flags |= FLAG_UVS
+        parts.append(np.asarray(uvs, dtype="<f4").reshape(n, 2).tobytes())
+    parts.append(indices.tobytes())
+    
+    payload = b"".join(parts)
+    if compress:
+        flags |= FLAG_DEFLATE
+        payload = zlib.compress(payload, 6)
+    header = HEADER.pack(MAGIC, VERSION, flags, n, len(indices), len(payload))
+    return header + bounds + payload
+
+
+def decode(data) -> Dict[str, "np.ndarray"]:
+    """
+    Arrays of a mesh file. Float32 positions, normals and uvs and the indices
+    are views into `data` (or into the inflated payload), not copies;
+    quantized positions are expanded to float32. Raises MeshError, or
+    zlib.error for a corrupt deflate stream.
+    """
+    import numpy as np
+    
+    data = memoryview(data)
+    header = parse_header(data)
+    payload = data[header.size:header.size + header.payload_size]
+    if len(payload) != header.payload_size:
+        raise MeshError("Truncated mesh payload")
+    if header.flags & FLAG_DEFLATE:
+        # Inflate at most one byte more than the header promises, so a deflate bomb cannot exhaust memory
+        inflater = zlib.decompressobj()
+        payload = memoryview(inflater.decompress(payload, header.raw_payload_size + 1))
+        if len(payload) != header.raw_payload_size or not inflater.eof:
+            raise MeshError("Payload size does not match the header")
+    
+    n, offset = header.vertex_count, 0
+    
+    def take(dtype: str, count: int):
+        nonlocal offset
+        array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+    
+    mesh = {}
+    if header.flags & FLAG_QUANTIZED:
+        lo = np.array(header.bounds[:3], dtype="<f4")
+        hi = np.array(header.bounds[3:], dtype="<f4")
+        quantized = take("<u2", 3 * n).reshape(n, 3)
+        offset = _padded(offset)
+        mesh["positions"] = lo + quantized.astype("<f4") * ((hi - lo) / QUANT_MAX)
+    else:
+        mesh["positions"] = take("<f4", 3 * n).reshape(n, 3)
+    if header.flags & FLAG_NORMALS:
+        mesh["normals"] = take("<f4", 3 * n).reshape(n, 3)
+    if header.flags & FLAG_UVS:
+        mesh["uvs"] = take("<f4", 2 * n).reshape(n, 2)
+    mesh["indices"] = take("<u4", header.index_count)
+    if header.index_count and int(mesh["indices"].max()) >= n:
+        raise MeshError("Index out of range")
+    return mesh
+
+
+class _PayloadCheck:
+    """
+    The checks of decode() on a payload fed in pieces as it streams in:
+    inflated size, deflate stream and index ranges. Holds at most one
+    chunk (inflated in chunk-sized steps) rather than the whole file.
+    """
+    
+    def __init__(self, header: MeshHeader):
+        self.header = header
+        self.inflater = zlib.decompressobj() if header.flags & FLAG_DEFLATE else None
+        self.seen = 0  # payload bytes, once inflated
+        self.indices_at = header.raw_payload_size - 4 * header.index_count
+        self.carry = b""  # a partial index left over from the last piece
+    
+    def feed(self, data: bytes):
+        if self.inflater is None:
+            return self._check(data)
+        while data:
+            self._check(self.inflater.decompress(data, settings.mesh_chunk_bytes))
+            data = self.inflater.unconsumed_tail
+    
+    def finish(self):
+        if self.inflater is not None and not self.inflater.eof:
+            raise MeshError("Payload size does not match the header")
+        if self.seen != self.header.raw_payload_size:
+            raise MeshError("Payload size does not match the header")
+    
+    def _check(self, data: bytes):
+        import numpy as np
+        
+        start = self.seen
+        self.seen += len(data)
+        if self.seen > self.header.raw_payload_size:
+            raise MeshError("Payload size does not match the header")
+        if self.seen <= self.indices_at:
+            return
+        data = self.carry + data[max(0, self.indices_at - start):]
+        usable = len(data) & ~3
+        if usable and int(np.frombuffer(data, dtype="<u4", count=usable // 4).max()) >= self.header.vertex_count:
+            raise MeshError("Index out of range")
+        self.carry = data[usable:]
+
+
+def to_lists(mesh: Dict[str, "np.ndarray"]) -> dict:
+    """JSON-friendly form of decoded arrays, in the legacy mesh_data shape"""
+    return {name: array.tolist() for name, array in mesh.items()}
+
+
+def from_legacy(mesh_data: dict, quantize: bool = False, compress: bool = False) -> bytes:
+    """Encode a legacy inline mesh: {"vertices" | "positions": [...], "indices" | "faces": [...], "normals"?, "uvs"?}"""
+    positions = mesh_data.get("positions", mesh_data.get("vertices"))
+    indices = mesh_data.get("indices", mesh_data.get("faces"))
+    if positions is None or indices is None:
+        raise MeshError("Mesh needs vertices and indices")
+    try:
+        return encode(
+            positions, indices, mesh_data.get("normals"), mesh_data.get("uvs"),
+            quantize=quantize, compress=compress,
+        )
+    except (TypeError, ValueError) as e:
+        if isinstance(e, MeshError):
+            raise
+        raise MeshError(f"Malformed mesh arrays: {e}")
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    database = AvatarConfiguration.get_motor_collection().database
+    return AsyncIOMotorGridFSBucket(
+        database, bucket_name=settings.mesh_bucket, chunk_size_bytes=settings.mesh_chunk_bytes
+    )
+
+
+async def store_mesh(user_id: str, chunks: AsyncIterator[bytes]) -> dict:
+    """
+    Stream a mesh file into GridFS, validating the header as soon as it has
+    arrived and the payload chunk by chunk, so memory stays bounded by the
+    chunk size. Returns the fields of a MeshRef; on any error the partial
+    upload is removed.
+    """
+    upload = _bucket().open_upload_stream(f"{user_id}.mesh", metadata={"user_id": user_id})
+    digest = hashlib.sha256()
+    pending = b""
+    header: Optional[MeshHeader] = None
+    check: Optional[_PayloadCheck] = None
+    received = 0
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            received += len(chunk)
+            if received > settings.mesh_max_bytes:
+                raise MeshError(f"Mesh larger than {settings.mesh_max_bytes} bytes")
+            if header is None:
+                # Hold data back until the whole header is here
+                pending += chunk
+                try:
+                    header = parse_header(pending)
+                except MeshError:
+                    if len(pending) < HEADER.size + BOUNDS.size:
+                        continue
+                    raise
+                chunk, pending = pending, b""
+                check = _PayloadCheck(header)
+                payload = chunk[header.size:]
+            else:
+                payload = chunk
+            if received > header.size + header.payload_size:
+                raise MeshError("Mesh size does not match the header")
+            # Inflating and scanning indices is CPU work; keep it off the event loop
+            await asyncio.to_thread(check.feed, payload)
+            digest.update(chunk)
+            await upload.write(chunk)
+        if header is None:
+            header = parse_header(pending)  # raises: the body ended inside the header
+        if received != header.size + header.payload_size:
+            raise MeshError("Mesh size does not match the header")
+        # Readers then never see a bad file: deflated payloads and index ranges are checked too
+        check.finish()
+        await upload.close()
+    except zlib.error as e:
+        await upload.abort()
+        raise MeshError(f"Corrupt deflate stream: {e}")
+    except BaseException:
+        await upload.abort()
+        raise
+    
+    return {
+        "file_id": str(upload._id),
+        "vertex_count": header.vertex_count,
+        "index_count": header.index_count,
+        "size_bytes": received,
+        "sha256": digest.hexdigest(),
+        "quantized": bool(header.flags & FLAG_QUANTIZED),
+        "compressed": bool(header.flags & FLAG_DEFLATE),
+        "uploaded_at": datetime.utcnow(),
+    }
+
+
+async def open_mesh(file_id: str):
+    """GridOut of a stored mesh; iterate it with readchunk()"""
+    from bson import ObjectId
+    
+    return await _bucket().open_download_stream(ObjectId(file_id))
+
+
+async def read_mesh(file_id: str) -> bytes:
+    return await (await open_mesh(file_id)).read()
+
+
+async def delete_mesh(file_id: str):
+    from bson import ObjectId
+    
+    try:
+        await _bucket().delete(ObjectId(file_id))
+    except NoFile:
+        pass
+
+
+async def attach_mesh(user_id: str, ref: dict) -> Optional[dict]:
+    """
+    Point the user's avatar at a stored mesh (creating the avatar if needed)
+    and drop any legacy inline mesh. Returns the mesh reference it replaced.
+    """
+    from pymongo import ReturnDocument
+    
+    collection = AvatarConfiguration.get_motor_collection()
+    now = datetime.utcnow()
+    # Setting a sub-field fails while face_scan_data is null, so give it a document first
+    await collection.update_one(
+        {"user_id": user_id, "face_scan_data": None},
+        {"$set": {"face_scan_data": {"created_at": now}}},
+    )
+    defaults = AvatarConfiguration(user_id=user_id).model_dump(
+        exclude={"id", "revision_id", "user_id", "face_scan_data", "updated_at"}
+    )
+    before = await collection.find_one_and_update(
+        {"user_id": user_id},
+        {
+            "$set": {"face_scan_data.mesh": ref, "updated_at": now},
+            "$unset": {"face_scan_data.mesh_data": ""},
+            "$setOnInsert": {**defaults, "face_scan_data.created_at": now},
+        },
+        projection={"face_scan_data.mesh": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    return ((before or {}).get("face_scan_data") or {}).get("mesh")
+
+
+async def detach_mesh(user_id: str) -> Optional[dict]:
+    """Remove the user's mesh (stored or legacy); returns the stored reference it removed"""
+    from pymongo import ReturnDocument
+    
+    before = await AvatarConfiguration.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        {"$unset": {"face_scan_data.mesh": "", "face_scan_data.mesh_data": ""}, "$currentDate": {"updated_at": True}},
+        projection={"face_scan_data.mesh": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    return ((before or {}).get("face_scan_data") or {}).get("mesh")
+
+
+async def migrate_legacy_meshes(quantize: bool = False, compress: bool = True) -> Dict[str, int]:
+    """Move inline mesh_data of every avatar into GridFS; avatars with malformed data are left alone"""
+    counts = {"migrated": 0, "failed": 0}
+    cursor = AvatarConfiguration.get_motor_collection().find(
+        {"face_scan_data.mesh_data": {"$type": "object"}},
+        {"user_id": 1, "face_scan_data.mesh_data": 1},
+    )
+    async for avatar in cursor:
+        user_id = avatar["user_id"]
+        try:
+            data = from_legacy(avatar["face_scan_data"]["mesh_data"], quantize=quantize, compress=compress)
+        except MeshError as e:
+            logger.warning("mesh_migration_failed", user_id=user_id, error=str(e))
+            counts["failed"] += 1
+            continue
+        
+        async def one_chunk():
+            yield data
+        
+        ref = await store_mesh(user_id, one_chunk())
+        replaced = await attach_mesh(user_id, ref)
+        if replaced:
+            await delete_mesh(replaced["file_id"])
+        counts["migrated"] += 1
+    return counts
+
+
+async def _main():
+    import argparse
+    
+    try:
+        from ..database import init_db, close_db
+    except ImportError:
+        from database import init_db, close_db
+    
+    parser = argparse.ArgumentParser(description="Move legacy inline face meshes into GridFS")
+    parser.add_argument("--quantize", action="store_true", help="store positions as uint16 within their bounds")
+    parser.add_argument("--no-compress", dest="compress", action="store_false")
+    args = parser.parse_args()
+    
+    await init_db()
+    try:
+        counts = await migrate_legacy_meshes(quantize=args.quantize, compress=args.compress)
+        print(f"✓ Migrated {counts['migrated']} meshes, {counts['failed']} failed")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,206 @@
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+try:
+    from .. import database
+    from ..cache import invalidate_user
+    from ..config import settings
+    from ..models.user import UserProfile
+    from ..models.enums import LifePillar
+    from . import equipment
+    from .xp_ledger import record_grants
+    from .leaderboard import record_xp
+    from .events import publish_xp
+except ImportError:
+    import database
+    from cache import invalidate_user
+    from config import settings
+    from models.user import UserProfile
+    from models.enums import LifePillar
+    from services import equipment
+    from services.xp_ledger import record_grants
+    from services.leaderboard import record_xp
+    from services.events import publish_xp
+
+XP_PER_LEVEL = 100
+
+T = TypeVar("T")
+
+
+def level_for_xp(xp: int) -> int:
+    """Level reached with `xp` experience points in one pillar"""
+    return xp // XP_PER_LEVEL + 1
+
+
+# Stored aggregates that GET /users sorts on; derived from the per-pillar maps in the same update
+AGGREGATES_STAGE = {"$set": {
+    "xp_total": {"$add": [{"$ifNull": [f"$total_xp.{p.value}", 0]} for p in LifePillar]},
+    "overall_level": {"$max": [{"$ifNull": [f"$life_pillar_levels.{p.value}", 1]} for p in LifePillar]},
+}}
+
+
+def _xp_update_pipeline(grants: Dict[LifePillar, int]) -> list:
+    """
+    Update pipeline that adds XP to each granted pillar and derives the
+    pillar levels, the overall level and the XP total inside Mongo. Levels
+    never go down.
+    """
+    add_xp = {}
+    derive_levels = {"updated_at": "$$NOW"}
+    for pillar, amount in grants.items():
+        xp_field = f"total_xp.{pillar.value}"
+        level_field = f"life_pillar_levels.{pillar.value}"
+        add_xp[xp_field] = {"$add": [{"$ifNull": [f"${xp_field}", 0]}, amount]}
+        derive_levels[level_field] = {"$max": [
+            {"$ifNull": [f"${level_field}", 1]},
+            {"$add": [{"$toInt": {"$floor": {"$divide": [f"${xp_field}", XP_PER_LEVEL]}}}, 1]},
+        ]}
+    return [{"$set": add_xp}, {"$set": derive_levels}, AGGREGATES_STAGE]
+
+
+async def backfill_user_aggregates() -> int:
+    """Set overall_level and xp_total on profiles written before they were stored; returns the count"""
+    result = await UserProfile.get_motor_collection().update_many(
+        {"$or": [{"xp_total": {"$exists": False}}, {"overall_level": {"$exists": False}}]},
+        [AGGREGATES_STAGE],
+    )
+    return result.modified_count
+
+
+async def run_transaction(callback: Callable[[Optional[object]], Awaitable[T]]) -> T:
+    """
+    Run `callback(session)` in a transaction when the deployment supports it
+    (replica set or sharded cluster), otherwise run `callback(None)`.
+    
+    The whole callback is retried on a TransientTransactionError and the
+    commit alone on an UnknownTransactionCommitResult, up to
+    settings.mongodb_transaction_attempts times each, so the callback must
+    not have effects outside the session. Anything else it raises aborts
+    the transaction and propagates.
+    """
+    if not settings.mongodb_transactions or database.mongodb_client is None:
+        return await callback(None)
+    attempts = max(1, settings.mongodb_transaction_attempts)
+    async with await database.mongodb_client.start_session() as session:
+        for attempt in range(1, attempts + 1):
+            session.start_transaction()
+            try:
+                result = await callback(session)
+            except PyMongoError as e:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                if e.has_error_label("TransientTransactionError") and attempt < attempts:
+                    continue
+                raise
+            except BaseException:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                raise
+            
+            for commit_attempt in range(1, attempts + 1):
+                try:
+                    await session.commit_transaction()
+                    return result
+                except PyMongoError as e:
+                    if e.has_error_label("UnknownTransactionCommitResult") and commit_attempt < attempts:
+                        continue  # committing again is safe: it either already happened or it did not
+                    if e.has_error_label("TransientTransactionError") and attempt < attempts:
+                        break
+                    raise
+    raise AssertionError("unreachable")
+
+
+async def stage_xp(
+    user_id: str,
+    grants: Dict[LifePillar, int],
+    source: str = "manual",
+    source_id: Optional[str] = None,
+    session=None
+) -> Optional[Dict[LifePillar, dict]]:
+    """
+    The database writes of grant_xp, without its side effects, so they can
+    be part of a transaction. Pass the results to apply_xp_effects once it
+    has committed.
+    """
+    # All levels, not just the granted ones: items can require several pillars
+    projection = {"life_pillar_levels": 1}
+    for pillar in grants:
+        projection[f"total_xp.{pillar.value}"] = 1
+    
+    before = await UserProfile.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        _xp_update_pipeline(grants),
+        projection=projection,
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+    if before is None:
+        return None
+    
+    await record_grants(user_id, grants, source=source, source_id=source_id, session=session)
+    
+    # The update is atomic, so the before-image is exactly the state it was applied to
+    old_xp = before.get("total_xp", {})
+    old_levels = before.get("life_pillar_levels", {})
+    new_levels = dict(old_levels)
+    results = {}
+    for pillar, amount in grants.items():
+        old_level = old_levels.get(pillar.value, 1)
+        new_xp = old_xp.get(pillar.value, 0) + amount
+        new_level = max(old_level, level_for_xp(new_xp))
+        new_levels[pillar.value] = new_level
+        results[pillar] = {
+            "pillar": pillar,
+            "xp_added": amount,
+            "total_xp": new_xp,
+            "level": new_level,
+            "leveled_up": new_level > old_level,
+            "unlocked_items": [],
+        }
+    for pillar, items in equipment.get_catalog().newly_unlocked(old_levels, new_levels).items():
+        results[LifePillar(pillar)]["unlocked_items"] = items
+    return results
+
+
+async def apply_xp_effects(user_id: str, results: Dict[LifePillar, dict]):
+    """Invalidate cached reads, update the leaderboards and publish events for committed XP"""
+    invalidate_user(user_id)
+    await record_xp(user_id, results)
+    await publish_xp(user_id, results)
+
+
+async def grant_xp(
+    user_id: str,
+    grants: Dict[LifePillar, int],
+    source: str = "manual",
+    source_id: Optional[str] = None
+) -> Optional[Dict[LifePillar, dict]]:
+    """
+    Atomically add XP to one or more pillars of a user's profile in a single
+    round trip, then append the grants to the XP ledger.
+    
+    Returns None if the user does not exist, otherwise the new XP and level of
+    every granted pillar, whether the grant crossed a level boundary and the
+    catalog items that level-up unlocked. Only the granted pillars' XP and the
+    level map are read back from Mongo.
+    """
+    results = await stage_xp(user_id, grants, source=source, source_id=source_id)
+    if results is not None:
+        await apply_xp_effects(user_id, results)
+    return results
+
+
+async def award_xp(
+    user_id: str,
+    pillar: LifePillar,
+    amount: int,
+    source: str = "manual",
+    source_id: Optional[str] = None
+) -> Optional[dict]:
+    """Atomically add XP to a single pillar, see grant_xp"""
+    results = await grant_xp(user_id, {pillar: amount}, source=source, source_id=source_id)
+    if results is None:
+        return None
+    return results[pillar]
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from ..cache import TTLCache
+    from ..config import settings
+except ImportError:
+    from cache import TTLCache
+    from config import settings
+
+SCORE_BUCKET = 5
+LEVEL_BUCKET = 5
+
+
+def rule_recommendations(
+    adhd_score: Optional[int],
+    anxiety_score: Optional[int],
+    depression_score: Optional[int],
+    pillar_levels: Optional[Dict[str, int]] = None
+) -> List[str]:
+    """Recommendations from the declarative rule table; the fallback for the AI path"""
+    return _rule_engine().evaluate(adhd_score, anxiety_score, depression_score, pillar_levels)
+
+
+def rules_use_pillar_levels() -> bool:
+    """Whether any rule looks at pillar levels, i.e. whether callers need to load them"""
+    return _rule_engine().uses_pillar_levels
+
+
+def _rule_engine():
+    # Imported on first use: the rule engine pulls in numpy, which would otherwise dominate startup
+    try:
+        from .rules import get_rule_engine
+    except ImportError:
+        from services.rules import get_rule_engine
+    return get_rule_engine()
+
+
+def _bucket(value: Optional[int], size: int) -> int:
+    return -1 if value is None else value // size
+
+
+def normalize_inputs(
+    adhd_score: Optional[int],
+    anxiety_score: Optional[int],
+    depression_score: Optional[int],
+    pillar_levels: Optional[Dict[str, int]] = None
+) -> tuple:
+    """
+    Cache key for a submission: score buckets plus pillar level buckets.
+    Prompts are built from this key, so one answer is valid for every
+    submission that maps to it.
+    """
+    levels = tuple(sorted((str(p), _bucket(l, LEVEL_BUCKET)) for p, l in (pillar_levels or {}).items()))
+    return (
+        _bucket(adhd_score, SCORE_BUCKET),
+        _bucket(anxiety_score, SCORE_BUCKET),
+        _bucket(depression_score, SCORE_BUCKET),
+        levels,
+    )
+
+
+def build_prompt(key: tuple) -> str:
+    adhd, anxiety, depression, levels = key
+    
+    def score(bucket: int) -> str:
+        if bucket < 0:
+            return "not assessed"
+        return f"{bucket * SCORE_BUCKET}-{bucket * SCORE_BUCKET + SCORE_BUCKET - 1}"
+    
+    pillars = ", ".join(
+        f"{pillar} level {bucket * LEVEL_BUCKET + 1}-{bucket * LEVEL_BUCKET + LEVEL_BUCKET}" for pillar, bucket in levels
+    )
+    return (
+        f"ADHD screening score {score(adhd)}, anxiety score {score(anxiety)}, "
+        f"depression score {score(depression)}. Life pillars: {pillars or 'unknown'}."
+    )
+
+
+class RecommendationModel(ABC):
+    """Generates recommendations for a batch of prompts in one call"""
+    
+    @abstractmethod
+    async def generate(self, prompts: List[str]) -> List[List[str]]:
+        """One list of recommendations per prompt, in order"""
+
+
+class GeminiModel(RecommendationModel):
+    """Google Gemini, asked for a JSON object with one list per numbered prompt"""
+    
+    def __init__(self, api_key: str, model_name: str):
+        # Imported lazily: the SDK is heavy and only needed when AI is enabled
+        import google.generativeai as genai
+        
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+    
+    async def generate(self, prompts: List[str]) -> List[List[str]]:
+        numbered = "\n".join(f"{i}. {prompt}" for i, prompt in enumerate(prompts, 1))
+        response = await self._model.generate_content_async(
+            "You are a supportive productivity coach. For each numbered user profile below, "
+            "give 2-4 short, practical, non-clinical productivity recommendations. "
+            "Answer only with a JSON object mapping each number to a list of strings.\n\n" + numbered
+        )
+        text = response.text.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+        answers = json.loads(text)
+        return [[str(r) for r in answers.get(str(i), [])] for i in range(1, len(prompts) + 1)]
+
+
+class StubModel(RecommendationModel):
+    """Local stand-in with configurable latency, for tests and benchmarks"""
+    
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+    
+    async def generate(self, prompts: List[str]) -> List[List[str]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        return [[f"Recommendation for: {prompt}"] for prompt in prompts]
+
+
+class RecommendationService:
+    """
+    Batches prompts into shared model calls, caps concurrent calls, caches
+    answers per normalized input and falls back to the rule engine when the
+    model is too slow or fails.
+    """
+    
+    def __init__(
+        self,
+        model: RecommendationModel,
+        concurrency: int = 4,
+        timeout: float = 10.0,
+        batch_size: int = 8,
+        batch_window: float = 0.05,
+        cache_size: int = 10000,
+        cache_ttl: float = 3600
+    ):
+        self.model = model
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.fallbacks = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending: List[Tuple[tuple, asyncio.Future]] = []
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; these must not be collected mid-batch
+        self._batches: Set[asyncio.Task] = set()
+    
+    async def recommend(
+        self,
+        adhd_score: Optional[int],
+        anxiety_score: Optional[int],
+        depression_score: Optional[int],
+        pillar_levels: Optional[Dict[str, int]] = None
+    ) -> Tuple[List[str], str]:
+        """Return (recommendations, source) where source is "ai" or "rules" """
+        key = normalize_inputs(adhd_score, anxiety_score, depression_score, pillar_levels)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, "ai"
+        
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._enqueue(key, future)
+        
+        try:
+            # Shielded: a timed-out caller leaves the batch running so it still fills the cache
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout), "ai"
+        except Exception:
+            self.fallbacks += 1
+            return rule_recommendations(adhd_score, anxiety_score, depression_score, pillar_levels), "rules"
+    
+    def _enqueue(self, key: tuple, future: asyncio.Future):
+        self._pending.append((key, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        try:
+            async with self._semaphore:
+                results = await self.model.generate([build_prompt(key) for key, _ in batch])
+            for (key, future), recommendations in zip(batch, results):
+                if recommendations:
+                    self.cache.set(key, recommendations)
+                    future.set_result(recommendations)
+                else:
+                    future.set_exception(ValueError("Model returned no recommendations"))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, future in batch:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(ValueError("Model returned too few answers"))
+                # Mark errors as retrieved in case every caller already timed out
+                if not future.cancelled():
+                    future.exception()
+    
+    def stats(self) -> dict:
+        return {"cache": self.cache.stats(), "fallbacks": self.fallbacks, "inflight": len(self._inflight)}
+
+
+_service: Optional[RecommendationService] = None
+
+
+def get_recommendation_service() -> Optional[RecommendationService]:
+    """The configured service, or None when AI recommendations are off"""
+    global _service
+    if _service is None:
+        if settings.recommendation_model == "stub":
+            model = StubModel()
+        elif settings.recommendation_model == "gemini" and settings.gemini_api_key:
+            model = GeminiModel(settings.gemini_api_key, settings.gemini_model)
+        else:
+            return None
+        _service = RecommendationService(
+            model,
+            concurrency=settings.recommendation_concurrency,
+            timeout=settings.recommendation_timeout_seconds,
+            batch_size=settings.recommendation_batch_size,
+            batch_window=settings.recommendation_batch_window_ms / 1000,
+            cache_size=settings.recommendation_cache_size,
+            cache_ttl=settings.recommendation_cache_ttl_seconds,
+        )
+    return _service
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+try:
+    from ..config import settings
+    from ..logs import logger
+    from ..models.assessment import AssessmentResults
+    from ..models.user import UserProfile
+except ImportError:
+    from config import settings
+    from logs import logger
+    from models.assessment import AssessmentResults
+    from models.user import UserProfile
+
+SCORE_FIELDS = ("adhd_score", "anxiety_score", "depression_score")
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent / "rules" / "recommendations.json"
+
+# Largest lookup table a rule file may compile to
+MAX_TABLE_CELLS = 5_000_000
+
+
+class RuleError(ValueError):
+    """The rule table is malformed"""
+
+
+def _half_open(condition: dict) -> Tuple[float, float]:
+    """Turn {"gt": 15, "lte": 30} into the integer range [16, 31)"""
+    lo, hi = -np.inf, np.inf
+    for op, value in condition.items():
+        if op == "gt":
+            lo = max(lo, value + 1)
+        elif op == "gte":
+            lo = max(lo, value)
+        elif op == "lt":
+            hi = min(hi, value)
+        elif op == "lte":
+            hi = min(hi, value + 1)
+        else:
+            raise RuleError(f"Unknown operator {op!r}")
+    return lo, hi
+
+
+class RuleEngine:
+    """
+    A declarative rule table compiled into a dense lookup table.
+    
+    Every input dimension (the three scores and each pillar some rule
+    mentions) is cut at the rule thresholds into buckets, plus one bucket
+    for a missing value. The recommendations of every bucket combination are
+    precomputed, so evaluating a submission is a bisect per dimension and
+    one table read, and a cohort is a searchsorted per dimension and one
+    fancy-indexing read.
+    """
+    
+    def __init__(self, table: dict):
+        rules = table.get("rules", [])
+        self.version = table.get("version")
+        self.rule_ids = [rule["id"] for rule in rules]
+        
+        conditions: List[Dict[str, Tuple[float, float]]] = []
+        pillars = []
+        for rule in rules:
+            when = dict(rule.get("when", {}))
+            parsed = {}
+            for pillar, condition in when.pop("pillar_levels", {}).items():
+                parsed[f"pillar:{pillar}"] = _half_open(condition)
+                if pillar not in pillars:
+                    pillars.append(pillar)
+            for field, condition in when.items():
+                if field not in SCORE_FIELDS:
+                    raise RuleError(f"Rule {rule['id']!r} uses unknown field {field!r}")
+                parsed[field] = _half_open(condition)
+            conditions.append(parsed)
+        
+        self.pillars = pillars
+        self.dimensions = list(SCORE_FIELDS) + [f"pillar:{p}" for p in pillars]
+        self.boundaries = [
+            np.array(sorted({b for c in conditions if d in c for b in c[d] if np.isfinite(b)}), dtype=np.float64)
+            for d in self.dimensions
+        ]
+        # Buckets 0..len(b) are value ranges; bucket len(b)+1 means "missing"
+        self.shape = tuple(len(b) + 2 for b in self.boundaries)
+        if int(np.prod(self.shape)) > MAX_TABLE_CELLS:
+            raise RuleError("Rule table compiles to too many combinations")
+        
+        # matches[r] broadcasts to the full grid: True where rule r applies
+        cell_rules = np.zeros((len(rules),) + self.shape, dtype=bool)
+        for r, condition in enumerate(conditions):
+            mask = np.ones(self.shape, dtype=bool)
+            for axis, dimension in enumerate(self.dimensions):
+                if dimension not in condition:
+                    continue
+                lo, hi = condition[dimension]
+                b = self.boundaries[axis]
+                # Representative value of each bucket: its lower bound
+                representative = np.concatenate(([-np.inf], b, [np.nan]))
+                axis_match = (representative >= lo) & (representative < hi)
+                axis_match[0] = lo == -np.inf
+                shape = [1] * len(self.shape)
+                shape[axis] = -1
+                mask &= axis_match.reshape(shape)
+            cell_rules[r] = mask
+        
+        # Collapse identical rule sets so the table stores small ids
+        flat = cell_rules.reshape(len(rules), -1).T
+        unique_sets, ids = np.unique(flat, axis=0, return_inverse=True)
+        self.table = ids.reshape(-1).astype(np.int32)
+        self.results: List[Tuple[str, ...]] = []
+        for rule_set in unique_sets:
+            recommendations = []
+            for r in np.flatnonzero(rule_set):
+                for text in rules[r]["recommendations"]:
+                    if text not in recommendations:
+                        recommendations.append(text)
+            self.results.append(tuple(recommendations))
+        self._strides = np.array([int(np.prod(self.shape[i + 1:])) for i in range(len(self.shape))])
+    
+    def _bucket(self, axis: int, value: Optional[float]) -> int:
+        if value is None:
+            return self.shape[axis] - 1
+        return bisect_right(self.boundaries[axis], value)
+    
+    def _values(self, scores: Sequence[Optional[int]], pillar_levels: Optional[Dict[str, int]]) -> list:
+        levels = pillar_levels or {}
+        return list(scores) + [levels.get(p) for p in self.pillars]
+    
+    def evaluate(
+        self,
+        adhd_score: Optional[int],
+        anxiety_score: Optional[int],
+        depression_score: Optional[int],
+        pillar_levels: Optional[Dict[str, int]] = None
+    ) -> List[str]:
+        values = self._values((adhd_score, anxiety_score, depression_score), pillar_levels)
+        index = sum(self._bucket(axis, v) * int(self._strides[axis]) for axis, v in enumerate(values))
+        return list(self.results[self.table[index]])
+    
+    def evaluate_batch(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Score a cohort at once. `columns` maps each dimension name to a float
+        array with NaN for missing values; returns an id per row indexing
+        into self.results.
+        """
+        n = len(next(iter(columns.values())))
+        flat = np.zeros(n, dtype=np.int64)
+        for axis, dimension in enumerate(self.dimensions):
+            values = columns.get(dimension, np.full(n, np.nan))
+            buckets = np.searchsorted(self.boundaries[axis], values, side="right")
+            buckets[np.isnan(values)] = self.shape[axis] - 1
+            flat += buckets * self._strides[axis]
+        return self.table[flat]
+    
+    @property
+    def uses_pillar_levels(self) -> bool:
+        return bool(self.pillars)
+
+
+def _rules_path() -> Path:
+    return Path(settings.recommendation_rules_path) if settings.recommendation_rules_path else DEFAULT_RULES_PATH
+
+
+def load_rule_engine(path: Optional[Path] = None) -> RuleEngine:
+    with open(path or _rules_path()) as f:
+        return RuleEngine(json.load(f))
+
+
+class _Holder:
+    engine: Optional[RuleEngine] = None
+    mtime: float = 0.0
+    checked_at: float = 0.0
+    reloading: Optional[asyncio.Task] = None
+
+
+_holder = _Holder()
+
+
+def _compile(path: Path, mtime: float):
+    """Compile the rule file and swap it in; a broken edit keeps the last good table"""
+    try:
+        engine = load_rule_engine(path)
+    except Exception as e:
+        if _holder.engine is None:
+            raise
+        logger.warning("recommendation_rules_reload_failed", path=str(path), error=str(e))
+    else:
+        _holder.engine = engine
+        print(f"✓ Loaded recommendation rules version {engine.version}")
+    _holder.mtime = mtime
+
+
+async def _recompile(path: Path, mtime: float):
+    try:
+        await asyncio.to_thread(_compile, path, mtime)
+    finally:
+        _holder.reloading = None
+
+
+def get_rule_engine() -> RuleEngine:
+    """
+    The compiled rule table, recompiled when the file changes on disk.
+    Each worker checks the file's mtime at most every few seconds, so
+    edits roll out without restarts. Under an event loop the recompile runs
+    in a thread and callers keep the current table until it is swapped in.
+    """
+    now = time.monotonic()
+    if _holder.engine is not None and now - _holder.checked_at < settings.recommendation_rules_reload_seconds:
+        return _holder.engine
+    _holder.checked_at = now
+    
+    path = _rules_path()
+    mtime = os.stat(path).st_mtime
+    if _holder.engine is None:
+        _compile(path, mtime)  # nothing to serve yet; startup does this in _warm_up's thread
+    elif mtime != _holder.mtime and _holder.reloading is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _compile(path, mtime)  # no loop to block, e.g. the warm-up thread
+        else:
+            _holder.reloading = loop.create_task(_recompile(path, mtime))
+    return _holder.engine
+
+
+async def backfill_recommendations(batch_size: int = 5000) -> int:
+    """
+    Re-score every rule-based assessment with the current rules, in
+    vectorised batches. AI-generated recommendations are left alone.
+    Returns the number of assessments updated.
+    """
+    engine = get_rule_engine()
+    assessments = AssessmentResults.get_motor_collection()
+    profiles = UserProfile.get_motor_collection()
+    cursor = assessments.find(
+        {"recommendations_source": {"$ne": "ai"}},
+        {"user_id": 1, "recommendations": 1, **{field: 1 for field in SCORE_FIELDS}},
+    ).batch_size(batch_size)
+    
+    updated = 0
+    batch: List[dict] = []
+    
+    async def flush():
+        nonlocal updated
+        columns = {
+            field: np.array([np.nan if row.get(field) is None else row[field] for row in batch], dtype=np.float64)
+            for field in SCORE_FIELDS
+        }
+        if engine.uses_pillar_levels:
+            levels = {
+                user["user_id"]: user.get("life_pillar_levels", {})
+                async for user in profiles.find(
+                    {"user_id": {"$in": list({row["user_id"] for row in batch})}},
+                    {"_id": 0, "user_id": 1, "life_pillar_levels": 1},
+                )
+            }
+            for pillar in engine.pillars:
+                columns[f"pillar:{pillar}"] = np.array(
+                    [levels.get(row["user_id"], {}).get(pillar, np.nan) for row in batch], dtype=np.float64
+                )
+        ids = engine.evaluate_batch(columns)
+        ops = []
+        for row, result_id in zip(batch, ids):
+            recommendations = list(engine.results[result_id])
+            if recommendations != row.get("recommendations"):
+                ops.append(UpdateOne(
+                    {"_id": row["_id"]},
+                    {"$set": {"recommendations": recommendations, "recommendations_source": "rules"}},
+                ))
+        if ops:
+            await assessments.bulk_write(ops, ordered=False)
+            updated += len(ops)
+        batch.clear()
+    
+    async for row in cursor:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return updated
+
+
+async def _main():
+    try:
+        from ..database import init_db, close_db
+    except ImportError:
+        from database import init_db, close_db
+    
+    await init_db()
+    try:
+        updated = await backfill_recommendations()
+        print(f"✓ Updated recommendations of {updated} assessments")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,235 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+try:
+    from ..config import settings
+    from ..models.calendar import ActionStep, CalendarEvent, CalendarSyncState, SchedulerRun, TaskSchedule
+    from ..models.enums import Priority
+except ImportError:
+    from config import settings
+    from models.calendar import ActionStep, CalendarEvent, CalendarSyncState, SchedulerRun, TaskSchedule
+    from models.enums import Priority
+
+# How many "priority steps" a task is pulled ahead of its deadline when ordering
+PRIORITY_WEIGHT = {Priority.LOW: 0, Priority.MEDIUM: 1, Priority.HIGH: 2, Priority.URGENT: 3}
+
+OPEN_TASK_PROJECTION = {
+    "user_id": 1,
+    "title": 1,
+    "estimated_duration": 1,
+    "priority": 1,
+    "due_date": 1,
+    "created_at": 1,
+}
+
+REPLAN_JOB = "replan"
+REPLAN_CHUNK = 500
+
+
+def open_tasks_filter(user_ids: List[str]) -> dict:
+    return {"user_id": {"$in": user_ids}, "completed": False}
+
+
+def busy_filter(user_ids: List[str], start: datetime, end: datetime) -> dict:
+    return {"user_id": {"$in": user_ids}, "end_time": {"$gt": start}, "start_time": {"$lt": end}}
+
+
+def task_changes_filter(since: datetime) -> dict:
+    return {"$or": [{"created_at": {"$gt": since}}, {"completed_at": {"$gt": since}}]}
+
+
+def calendar_changes_filter(since: datetime) -> dict:
+    # Not CalendarEvent.last_synced: every full sync bumps it on events that did not change
+    return {"changed_at": {"$gt": since}}
+
+
+def task_deletions_filter(since: datetime) -> dict:
+    # Deleted tasks leave nothing in action_steps; delete_task marks the stored plan instead
+    return {"tasks_changed_at": {"$gt": since}}
+
+
+def horizon_start(now: Optional[datetime] = None) -> datetime:
+    """First slot boundary at or after now"""
+    now = now or datetime.utcnow()
+    slot = settings.schedule_slot_minutes
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = math.ceil((now - midnight).total_seconds() / 60 / slot) * slot
+    return midnight + timedelta(minutes=minutes)
+
+
+def working_mask(start: datetime, n_slots: int) -> np.ndarray:
+    """True for slots that fall entirely inside working hours"""
+    slot = settings.schedule_slot_minutes
+    minutes = (start.weekday() * 1440 + start.hour * 60 + start.minute) + np.arange(n_slots) * slot
+    minute_of_day = minutes % 1440
+    mask = (minute_of_day >= settings.schedule_work_start_hour * 60) & (
+        minute_of_day + slot <= settings.schedule_work_end_hour * 60
+    )
+    if settings.schedule_weekdays_only:
+        mask &= (minutes // 1440) % 7 < 5
+    return mask
+
+
+def busy_mask(start: datetime, n_slots: int, busy: List[Tuple[datetime, datetime]]) -> np.ndarray:
+    """True for slots touched by any busy interval"""
+    if not busy:
+        return np.zeros(n_slots, dtype=bool)
+    slot_seconds = settings.schedule_slot_minutes * 60
+    bounds = np.array(
+        [((s - start).total_seconds(), (e - start).total_seconds()) for s, e in busy], dtype=np.float64
+    ) / slot_seconds
+    first = np.clip(np.floor(bounds[:, 0]).astype(np.int64), 0, n_slots)
+    last = np.clip(np.ceil(bounds[:, 1]).astype(np.int64), 0, n_slots)
+    # Difference array: +1 where an interval opens, -1 where it closes
+    diff = np.zeros(n_slots + 1, dtype=np.int32)
+    np.add.at(diff, first, 1)
+    np.add.at(diff, last, -1)
+    return np.cumsum(diff[:-1]) > 0
+
+
+def _order_key(task: dict, start: datetime):
+    shift = timedelta(hours=settings.schedule_priority_shift_hours)
+    weight = PRIORITY_WEIGHT.get(Priority(task.get("priority", Priority.MEDIUM)), 1)
+    due = task.get("due_date") or start + timedelta(days=3650)
+    return (due - shift * weight, -weight, task.get("created_at") or start)
+
+
+def plan(tasks: List[dict], busy: List[Tuple[datetime, datetime]], start: datetime, days: int) -> dict:
+    """
+    Place open tasks into free working-hour slots, earliest (priority-adjusted)
+    deadline first. Every placement is a contiguous run of free slots, so the
+    plan never overlaps busy time or another task. Tasks that only fit after
+    their due date are flagged at_risk; tasks that do not fit at all are
+    returned as unscheduled.
+    """
+    slot = settings.schedule_slot_minutes
+    n_slots = days * 1440 // slot
+    free = working_mask(start, n_slots) & ~busy_mask(start, n_slots, busy)
+    
+    entries, unscheduled = [], []
+    for task in sorted(tasks, key=lambda t: _order_key(t, start)):
+        k = max(1, math.ceil(task.get("estimated_duration", 30) / slot))
+        if k > n_slots:
+            unscheduled.append(str(task["_id"]))
+            continue
+        # runs[i] == k exactly when slots i..i+k-1 are all free
+        cumulative = np.concatenate(([0], np.cumsum(free, dtype=np.int32)))
+        fits = np.flatnonzero(cumulative[k:] - cumulative[:-k] == k)
+        if fits.size == 0:
+            unscheduled.append(str(task["_id"]))
+            continue
+        i = int(fits[0])
+        free[i:i + k] = False
+        task_start = start + timedelta(minutes=i * slot)
+        task_end = task_start + timedelta(minutes=k * slot)
+        due = task.get("due_date")
+        entries.append({
+            "task_id": str(task["_id"]),
+            "title": task["title"],
+            "start": task_start,
+            "end": task_end,
+            "at_risk": due is not None and task_end > due,
+        })
+    
+    return {
+        "horizon_start": start,
+        "horizon_end": start + timedelta(days=days),
+        "entries": entries,
+        "unscheduled": unscheduled,
+    }
+
+
+async def _load_inputs(user_ids: List[str], start: datetime, end: datetime) -> Tuple[Dict[str, list], Dict[str, list]]:
+    """Open tasks and busy intervals for a group of users, two queries in total"""
+    tasks: Dict[str, list] = {user_id: [] for user_id in user_ids}
+    busy: Dict[str, list] = {user_id: [] for user_id in user_ids}
+    
+    async for task in ActionStep.get_motor_collection().find(open_tasks_filter(user_ids), OPEN_TASK_PROJECTION):
+        tasks[task["user_id"]].append(task)
+    async for event in CalendarEvent.get_motor_collection().find(
+        busy_filter(user_ids, start, end), {"_id": 0, "user_id": 1, "start_time": 1, "end_time": 1}
+    ):
+        busy[event["user_id"]].append((event["start_time"], event["end_time"]))
+    return tasks, busy
+
+
+def _schedule_doc(user_id: str, result: dict, generated_at: datetime) -> dict:
+    return {"user_id": user_id, "generated_at": generated_at, **result}
+
+
+def _store_update(schedule: dict) -> dict:
+    # $set rather than a replacement: a tasks_changed_at written meanwhile must survive for the next run
+    return {"$set": schedule}
+
+
+async def plan_user(user_id: str, days: Optional[int] = None) -> dict:
+    """Plan one user's open tasks and store the result, replacing the previous plan"""
+    days = days or settings.schedule_horizon_days
+    start = horizon_start()
+    tasks, busy = await _load_inputs([user_id], start, start + timedelta(days=days))
+    result = _schedule_doc(user_id, plan(tasks[user_id], busy[user_id], start, days), datetime.utcnow())
+    await TaskSchedule.get_motor_collection().update_one({"user_id": user_id}, _store_update(result), upsert=True)
+    return result
+
+
+async def replan_changed(since: Optional[datetime] = None) -> int:
+    """
+    Batch job, run by `python -m backend.services.scheduler` (e.g. from cron):
+    re-plan only users whose tasks or calendar changed since the previous
+    run (or since `since`): tasks created, completed or deleted, or calendar
+    events changed. Returns the number of users re-planned.
+    """
+    runs = SchedulerRun.get_motor_collection()
+    run_started = datetime.utcnow()
+    if since is None:
+        last_run = await runs.find_one({"job": REPLAN_JOB})
+        since = last_run["last_run"] if last_run else datetime.min
+    
+    changed = set(await ActionStep.get_motor_collection().distinct("user_id", task_changes_filter(since)))
+    changed.update(await CalendarSyncState.get_motor_collection().distinct("user_id", calendar_changes_filter(since)))
+    schedules = TaskSchedule.get_motor_collection()
+    changed.update(await schedules.distinct("user_id", task_deletions_filter(since)))
+    
+    days = settings.schedule_horizon_days
+    start = horizon_start(run_started)
+    end = start + timedelta(days=days)
+    user_ids = sorted(changed)
+    for i in range(0, len(user_ids), REPLAN_CHUNK):
+        chunk = user_ids[i:i + REPLAN_CHUNK]
+        tasks, busy = await _load_inputs(chunk, start, end)
+        generated_at = datetime.utcnow()
+        await schedules.bulk_write([
+            UpdateOne(
+                {"user_id": user_id},
+                _store_update(_schedule_doc(user_id, plan(tasks[user_id], busy[user_id], start, days), generated_at)),
+                upsert=True,
+            )
+            for user_id in chunk
+        ], ordered=False)
+    
+    await runs.update_one({"job": REPLAN_JOB}, {"$set": {"last_run": run_started}}, upsert=True)
+    return len(user_ids)
+
+
+async def _main():
+    try:
+        from ..database import init_db, close_db
+    except ImportError:
+        from database import init_db, close_db
+    
+    await init_db()
+    try:
+        users = await replan_changed()
+        print(f"✓ Re-planned {users} users")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    import asyncio
+    
+    asyncio.run(_main())
@@ -0,0 +1,204 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+try:
+    from ..models.enums import LifePillar
+    from ..models.xp import XPRecord, XPRollup
+except ImportError:
+    from models.enums import LifePillar
+    from models.xp import XPRecord, XPRollup
+
+PERIODS = ("day", "week")
+PERIOD_LENGTH = {"day": timedelta(days=1), "week": timedelta(days=7)}
+
+TREND_SORT = [("bucket_start", 1)]
+# The order of the user_created_desc index, one user after the other
+REBUILD_SORT = [("user_id", 1), ("created_at", -1), ("_id", -1)]
+
+# How long after a bucket ends a grant stamped inside it may still be incrementing it
+SETTLE_TIME = timedelta(minutes=5)
+
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    """Start of the day or (Monday-based) week containing `ts`"""
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _rollup_key(user_id: str, pillar: str, period: str, start: datetime) -> dict:
+    return {"user_id": user_id, "life_pillar": pillar, "period": period, "bucket_start": start}
+
+
+async def record_grants(
+    user_id: str,
+    grants: Dict[LifePillar, int],
+    source: str = "manual",
+    source_id: Optional[str] = None,
+    session=None,
+    now: Optional[datetime] = None
+):
+    """Append the grants to the ledger and bump the matching day/week rollups"""
+    now = now or datetime.utcnow()
+    records = [
+        {
+            "user_id": user_id,
+            "life_pillar": pillar.value,
+            "amount": amount,
+            "source": source,
+            "source_id": source_id,
+            "created_at": now,
+        }
+        for pillar, amount in grants.items()
+    ]
+    rollups = [
+        UpdateOne(
+            _rollup_key(user_id, pillar.value, period, bucket_start(now, period)),
+            {"$inc": {"xp": amount, "grants": 1}},
+            upsert=True,
+        )
+        for pillar, amount in grants.items()
+        for period in PERIODS
+    ]
+    await XPRecord.get_motor_collection().insert_many(records, ordered=False, session=session)
+    await XPRollup.get_motor_collection().bulk_write(rollups, ordered=False, session=session)
+
+
+def trend_filter(user_id: str, period: str, since: datetime, pillar: Optional[LifePillar] = None) -> dict:
+    query = {"user_id": user_id, "period": period, "bucket_start": {"$gte": since}}
+    if pillar is not None:
+        query["life_pillar"] = pillar.value
+    return query
+
+
+async def read_trend(
+    user_id: str,
+    period: str,
+    buckets: int,
+    pillar: Optional[LifePillar] = None,
+    now: Optional[datetime] = None
+) -> List[dict]:
+    """Read the last `buckets` pre-aggregated rollups, oldest first"""
+    now = now or datetime.utcnow()
+    since = bucket_start(now, period) - PERIOD_LENGTH[period] * (buckets - 1)
+    
+    return await XPRollup.get_motor_collection().find(
+        trend_filter(user_id, period, since, pillar), {"_id": 0, "life_pillar": 1, "bucket_start": 1, "xp": 1, "grants": 1}
+    ).sort(TREND_SORT).to_list(length=None)
+
+
+def _closed_since(cutoff: datetime) -> dict:
+    """Per period, the latest bucket start whose bucket had ended by `cutoff`"""
+    return {period: cutoff - PERIOD_LENGTH[period] for period in PERIODS}
+
+
+async def _reconcile_rollups(user_id: str, totals: Dict[tuple, List[int]], cutoff: datetime):
+    """
+    Bring a user's closed rollups in line with `totals`, the ledger sums of
+    the buckets that ended by `cutoff`.
+    
+    Grants are stamped with the current time, so nothing lands in a closed
+    bucket any more and each one is corrected with an $inc of its drift.
+    Buckets the ledger no longer backs are deleted only while they still
+    hold what was read here.
+    """
+    rollups = XPRollup.get_motor_collection()
+    closed_since = _closed_since(cutoff)
+    stored = await rollups.find({
+        "user_id": user_id,
+        "$or": [{"period": period, "bucket_start": {"$lte": since}} for period, since in closed_since.items()],
+    }).to_list(length=None)
+    
+    ops = []
+    for rollup in stored:
+        key = (rollup["life_pillar"], rollup["period"], rollup["bucket_start"])
+        xp, grants = totals.pop(key, (0, 0))
+        if not grants:
+            ops.append(DeleteOne({"_id": rollup["_id"], "xp": rollup["xp"], "grants": rollup["grants"]}))
+        elif (xp, grants) != (rollup["xp"], rollup["grants"]):
+            ops.append(UpdateOne({"_id": rollup["_id"]}, {"$inc": {"xp": xp - rollup["xp"], "grants": grants - rollup["grants"]}}))
+    for (pillar, period, start), (xp, grants) in totals.items():
+        ops.append(UpdateOne(_rollup_key(user_id, pillar, period, start), {"$inc": {"xp": xp, "grants": grants}}, upsert=True))
+    if ops:
+        await rollups.bulk_write(ops, ordered=False)
+
+
+def rebuild_filter(cutoff: datetime, user_id: Optional[str] = None) -> dict:
+    query = {"created_at": {"$lt": cutoff}}
+    if user_id:
+        query["user_id"] = user_id
+    return query
+
+
+async def rebuild_rollups(
+    user_id: Optional[str] = None,
+    batch_size: int = 1000,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Recompute rollups from the ledger.
+    
+    Only buckets that ended more than SETTLE_TIME ago are rebuilt: the scan
+    is bounded by that cutoff, so grants made while it runs can neither be
+    missed nor counted twice. Buckets still open are left to the live
+    increments and picked up by the first rebuild after they close.
+    
+    The ledger is streamed in the order of its user_created_desc index, so
+    only one user's buckets are held in memory at a time. Returns the number
+    of users rebuilt.
+    """
+    cutoff = (now or datetime.utcnow()) - SETTLE_TIME
+    closed_since = _closed_since(cutoff)
+    cursor = XPRecord.get_motor_collection().find(
+        rebuild_filter(cutoff, user_id), {"_id": 0, "user_id": 1, "life_pillar": 1, "amount": 1, "created_at": 1}
+    ).sort(REBUILD_SORT).batch_size(batch_size)
+    
+    current_user = None
+    totals: Dict[tuple, List[int]] = {}
+    users = 0
+    async for record in cursor:
+        if record["user_id"] != current_user:
+            if current_user is not None:
+                await _reconcile_rollups(current_user, totals, cutoff)
+                users += 1
+            current_user = record["user_id"]
+            totals = {}
+        for period in PERIODS:
+            start = bucket_start(record["created_at"], period)
+            if start > closed_since[period]:
+                continue
+            bucket = totals.setdefault((record["life_pillar"], period, start), [0, 0])
+            bucket[0] += record["amount"]
+            bucket[1] += 1
+    
+    if current_user is not None:
+        await _reconcile_rollups(current_user, totals, cutoff)
+        users += 1
+    elif user_id:
+        await _reconcile_rollups(user_id, {}, cutoff)  # no ledger left, so no closed rollups either
+        users += 1
+    return users
+
+
+async def _main():
+    import sys
+    
+    try:
+        from ..database import init_db, close_db
+    except ImportError:
+        from database import init_db, close_db
+    
+    await init_db()
+    try:
+        users = await rebuild_rollups(sys.argv[1] if len(sys.argv) > 1 else None)
+        print(f"✓ Rebuilt XP rollups for {users} users")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
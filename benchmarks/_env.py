@@ -0,0 +1,8 @@
+import os
+
+# The benchmarks import backend modules, whose settings require these variables.
+# None of the values are used to reach real services.
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "benchmark-client")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "benchmark-secret")
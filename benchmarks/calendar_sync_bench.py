@@ -0,0 +1,69 @@
+"""
+Calendar sync benchmark against benchmarks.fake_google and a local MongoDB.
+
+    FAKE_GOOGLE_EVENTS=500 uvicorn benchmarks.fake_google:app --port 9100 &
+    GOOGLE_OAUTH_URL=http://localhost:9100 GOOGLE_API_URL=http://localhost:9100 \
+        python -m benchmarks.calendar_sync_bench --users 10000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from . import _env  # noqa: F401
+from backend.database import close_db, init_db
+from backend.http_client import create_http_client
+from backend.models.user import UserProfile
+from backend.services.calendar_sync import sync_users
+
+
+async def seed(users: int):
+    profiles = UserProfile.get_motor_collection()
+    await profiles.delete_many({"user_id": {"$regex": "^bench-"}})
+    expiry = datetime.utcnow() + timedelta(hours=1)
+    for i in range(0, users, 1000):
+        await profiles.insert_many([
+            {
+                "user_id": f"bench-{n}",
+                "email": f"bench-{n}@example.com",
+                "google_tokens": {
+                    "access_token": f"access-bench-{n}",
+                    "refresh_token": f"refresh-bench-{n}",
+                    "token_expiry": expiry,
+                },
+            }
+            for n in range(i, min(i + 1000, users))
+        ])
+
+
+async def run(users: int, concurrency: int):
+    await init_db()
+    client = create_http_client()
+    try:
+        await seed(users)
+        user_ids = [f"bench-{n}" for n in range(users)]
+        for label in ("full", "incremental"):
+            start = time.perf_counter()
+            results = await sync_users(client, user_ids, concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            changes = sum(r["changes"] for r in results)
+            errors = sum(1 for r in results if r["status"] == "error")
+            print(
+                f"{label:>11}: {users} users in {elapsed:.1f}s "
+                f"({users / elapsed:.0f} users/s, {changes / elapsed:.0f} changes/s, {errors} errors)"
+            )
+    finally:
+        await client.aclose()
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Local stand-in for the Google endpoints the backend calls: OAuth token
+exchange/refresh, userinfo and Calendar events with paging and sync tokens.
+
+    uvicorn benchmarks.fake_google:app --port 9100
+
+Point the backend at it with GOOGLE_OAUTH_URL=http://localhost:9100 and
+GOOGLE_API_URL=http://localhost:9100. FAKE_GOOGLE_EVENTS sets how many
+events every calendar has.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, Form, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Google")
+
+EVENTS_PER_CALENDAR = int(os.environ.get("FAKE_GOOGLE_EVENTS", "500"))
+EPOCH = datetime(2026, 1, 5, 9, 0)
+
+
+def _user_from_token(authorization: str) -> str:
+    if not authorization.startswith("Bearer access-"):
+        raise HTTPException(status_code=401)
+    return authorization[len("Bearer access-"):]
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/token")
+async def token(
+    grant_type: str = Form(...),
+    code: str = Form(None),
+    refresh_token: str = Form(None)
+):
+    # Codes and refresh tokens are "code-<user>" / "refresh-<user>"
+    source = code if grant_type == "authorization_code" else refresh_token
+    if not source or "-" not in source:
+        return JSONResponse(status_code=400, content={"error": "invalid_grant"})
+    user = source.split("-", 1)[1]
+    return {
+        "access_token": f"access-{user}",
+        "refresh_token": f"refresh-{user}",
+        "expires_in": 3600,
+        "token_type": "Bearer",
+    }
+
+
+@app.get("/oauth2/v2/userinfo")
+async def userinfo(authorization: str = Header(...)):
+    user = _user_from_token(authorization)
+    return {"id": user, "email": f"{user}@example.com", "name": f"User {user}"}
+
+
+def _event(user: str, i: int, version: int) -> dict:
+    start = EPOCH + timedelta(hours=i * 5)
+    return {
+        "id": f"{user}-evt-{i}",
+        "status": "confirmed",
+        "summary": f"Event {i} v{version}",
+        "start": {"dateTime": start.isoformat() + "Z"},
+        "end": {"dateTime": (start + timedelta(minutes=45)).isoformat() + "Z"},
+    }
+
+
+@app.get("/calendar/v3/calendars/{calendar_id}/events")
+async def events(
+    calendar_id: str,
+    authorization: str = Header(...),
+    maxResults: int = Query(250),
+    pageToken: str = Query(None),
+    syncToken: str = Query(None)
+):
+    user = _user_from_token(authorization)
+    if syncToken is not None:
+        # Incremental sync: every tenth event changed since the token was issued
+        changed = [_event(user, i, int(time.time())) for i in range(0, EVENTS_PER_CALENDAR, 10)]
+        return {"items": changed, "nextSyncToken": f"sync-{time.time()}"}
+    
+    offset = int(pageToken or 0)
+    items = [_event(user, i, 0) for i in range(offset, min(offset + maxResults, EVENTS_PER_CALENDAR))]
+    body = {"items": items}
+    if offset + maxResults < EVENTS_PER_CALENDAR:
+        body["nextPageToken"] = str(offset + maxResults)
+    else:
+        body["nextSyncToken"] = f"sync-{time.time()}"
+    return body
@@ -0,0 +1,62 @@
+"""
+Free/busy query benchmark: BusyIndex bisects versus a naive scan over the
+raw event list (what a start_time range scan has to do per request).
+
+    python -m benchmarks.freebusy_bench --events 2000 --queries 20000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from . import _env  # noqa: F401
+from backend.services.freebusy import BusyIndex
+
+
+def naive_busy(events, start, end):
+    return [(max(s, start), min(e, end)) for s, e in events if s < end and e > start]
+
+
+def run(n_events: int, n_queries: int):
+    rng = random.Random(7)
+    origin = datetime(2026, 1, 1)
+    horizon = timedelta(days=30)
+    events = []
+    for _ in range(n_events):
+        start = origin + timedelta(minutes=rng.randrange(0, int(horizon.total_seconds() // 60)))
+        events.append((start, start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))))
+    
+    build_start = time.perf_counter()
+    index = BusyIndex(events, origin, origin + horizon)
+    build = time.perf_counter() - build_start
+    
+    queries = []
+    for _ in range(n_queries):
+        start = origin + timedelta(minutes=rng.randrange(0, int(horizon.total_seconds() // 60)))
+        queries.append((start, start + timedelta(hours=rng.choice([1, 4, 8]))))
+    
+    t0 = time.perf_counter()
+    for start, end in queries:
+        naive_busy(events, start, end)
+    naive = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    for start, end in queries:
+        index.busy(start, end)
+    indexed = time.perf_counter() - t0
+    
+    print(f"{n_events} events, {len(index.starts)} merged blocks, index built in {build * 1000:.1f}ms")
+    print(f"naive scan: {naive / n_queries * 1e6:8.1f}us/query")
+    print(f"busy index: {indexed / n_queries * 1e6:8.1f}us/query  ({naive / indexed:.0f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.events, args.queries)
+
+
+if __name__ == "__main__":
+    main()
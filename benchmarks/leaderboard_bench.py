@@ -0,0 +1,78 @@
+"""
+Leaderboard benchmark with synthetic users.
+
+    python -m benchmarks.leaderboard_bench --users 1000000
+    python -m benchmarks.leaderboard_bench --backend redis   # needs fakeredis or REDIS_URL
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from . import _env  # noqa: F401
+from backend.services.leaderboard import GLOBAL_BOARD, MemoryLeaderboard, RedisLeaderboard
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def _time_op(op, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await op()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def run(users: int, ops: int, backend: str):
+    rng = random.Random(42)
+    user_ids = [f"user-{i}" for i in range(users)]
+    entries = [(uid, rng.randint(0, 1_000_000)) for uid in user_ids]
+    
+    if backend == "redis":
+        try:
+            import fakeredis
+            client = fakeredis.FakeAsyncRedis()
+        except ImportError:
+            from redis import asyncio as aioredis
+            from backend.config import settings
+            client = aioredis.from_url(settings.redis_url)
+        board = RedisLeaderboard(client, prefix="leaderboard-bench:")
+    else:
+        board = MemoryLeaderboard()
+    
+    start = time.perf_counter()
+    await board.load({GLOBAL_BOARD: entries})
+    print(f"load {users} users: {time.perf_counter() - start:.2f}s")
+    
+    def pick():
+        return rng.choice(user_ids)
+    
+    results = {
+        "update": await _time_op(lambda: board.incr_score(GLOBAL_BOARD, pick(), rng.randint(1, 100)), ops),
+        "rank": await _time_op(lambda: board.rank(GLOBAL_BOARD, pick()), ops),
+        "around": await _time_op(lambda: board.around(GLOBAL_BOARD, pick(), 5), ops),
+        "top100": await _time_op(lambda: board.top(GLOBAL_BOARD, 100), ops),
+    }
+    for name, samples in results.items():
+        print(
+            f"{name:>7}: mean {statistics.fmean(samples):8.1f}us  "
+            f"p50 {_percentile(samples, 0.5):8.1f}us  p99 {_percentile(samples, 0.99):8.1f}us"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=10_000)
+    parser.add_argument("--backend", choices=["memory", "redis"], default="memory")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.ops, args.backend))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Per-row cost of the lean read path against Beanie hydration for the list endpoints.
+
+Needs a MongoDB at MONGODB_URL; documents are seeded into a scratch
+`<MONGODB_DB_NAME>_bench` database that is left in place for later runs.
+
+    python -m benchmarks.lean_read_bench --rows 10000 --repeat 5
+
+Each resource is timed twice:
+  end-to-end  query + decode + response building + JSON rendering
+  in-process  the same on documents already fetched, i.e. without the server round trip
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from . import _env  # noqa: F401
+from beanie import init_beanie
+from beanie.odm.utils.parsing import parse_obj
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.config import settings
+from backend.models.assessment import AssessmentResults
+from backend.models.calendar import ActionStep
+from backend.models.user import UserProfile
+from backend.routers import assessments, tasks, users
+
+PILLARS = ["health", "career", "relationships", "personal_growth", "finance", "recreation"]
+BENCH_USER = "bench-user"
+
+
+def _user_doc(i: int, rng: random.Random) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": f"bench-{i}",
+        "email": f"bench-{i}@example.com",
+        "full_name": f"Bench User {i}",
+        "google_tokens": {"access_token": "x" * 180, "refresh_token": "y" * 100, "token_expiry": now},
+        "assessment_results": {},
+        "life_pillar_levels": {p: rng.randint(1, 30) for p in PILLARS},
+        "total_xp": {p: rng.randint(0, 3000) for p in PILLARS},
+        "preferences": {"theme": "default", "notifications_enabled": True},
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _task_doc(i: int, rng: random.Random) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": BENCH_USER,
+        "title": f"Task {i}",
+        "description": "Do the thing " * 8,
+        "life_pillar": rng.choice(PILLARS),
+        "priority": rng.choice(["low", "medium", "high"]),
+        "estimated_duration": rng.choice([15, 30, 60]),
+        "xp_reward": 10,
+        "completed": rng.random() < 0.3,
+        "due_date": now + timedelta(hours=rng.randint(1, 500)),
+        "created_at": now - timedelta(seconds=i),
+    }
+
+
+def _assessment_doc(i: int, rng: random.Random) -> dict:
+    return {
+        "user_id": BENCH_USER,
+        "adhd_score": rng.randint(0, 40),
+        "anxiety_score": rng.randint(0, 21),
+        "depression_score": rng.randint(0, 27),
+        "responses": {f"q{n}": rng.randint(0, 4) for n in range(40)},
+        "recommendations": ["Take a short walk", "Break tasks into steps", "Keep a sleep schedule"],
+        "recommendations_source": "rules",
+        "completed_date": datetime.utcnow() - timedelta(minutes=i),
+    }
+
+
+async def _seed(model, make, rows: int, query: dict):
+    collection = model.get_motor_collection()
+    have = await collection.count_documents(query)
+    rng = random.Random(have)
+    for start in range(have, rows, 1000):
+        await collection.insert_many([make(i, rng) for i in range(start, min(rows, start + 1000))])
+
+
+def _user_response(user: UserProfile) -> users.UserResponse:
+    return users.UserResponse(
+        user_id=user.user_id,
+        email=user.email,
+        username=user.user_id,
+        full_name=user.full_name,
+        level=max(user.life_pillar_levels.values()),
+        xp=sum(user.total_xp.values()),
+        coins=0,
+        life_pillar_levels=user.life_pillar_levels,
+        total_xp=user.total_xp
+    )
+
+
+def _task_response(task: ActionStep) -> tasks.TaskResponse:
+    return tasks.TaskResponse(
+        id=str(task.id),
+        user_id=task.user_id,
+        title=task.title,
+        description=task.description,
+        life_pillar=task.life_pillar,
+        priority=task.priority,
+        estimated_duration=task.estimated_duration,
+        xp_reward=task.xp_reward,
+        completed=task.completed,
+        due_date=task.due_date,
+        created_at=task.created_at
+    )
+
+
+def _assessment_response(assessment: AssessmentResults) -> assessments.AssessmentResponse:
+    return assessments.AssessmentResponse(
+        id=str(assessment.id),
+        user_id=assessment.user_id,
+        adhd_score=assessment.adhd_score,
+        anxiety_score=assessment.anxiety_score,
+        depression_score=assessment.depression_score,
+        recommendations=assessment.recommendations,
+        recommendations_source=assessment.recommendations_source,
+        completed_date=assessment.completed_date
+    )
+
+
+# (name, document model, filter, sort, lean projection, lean row builder, response builder, response model)
+CASES = [
+    ("users", UserProfile, {"user_id": {"$regex": "^bench-"}}, None,
+     users.USER_PROJECTION, users._user_row, _user_response, users.UserResponse),
+    ("tasks", ActionStep, {"user_id": BENCH_USER}, tasks.TASK_SORTS["created_at"],
+     tasks.TASK_PROJECTION, tasks._task_row, _task_response, tasks.TaskResponse),
+    ("assessments", AssessmentResults, {"user_id": BENCH_USER}, assessments.HISTORY_SORT,
+     assessments.ASSESSMENT_PROJECTION, assessments._assessment_row, _assessment_response, assessments.AssessmentResponse),
+]
+
+
+async def _beanie_render(model, docs: List[dict], build, field) -> bytes:
+    """What the endpoints did before: hydrate, copy into the response model, let FastAPI validate and render"""
+    responses = [build(parse_obj(model, doc)) for doc in docs]
+    content = await serialize_response(field=field, response_content=responses)
+    return JSONResponse(content).body
+
+
+def _lean_render(docs: List[dict], row) -> bytes:
+    return ORJSONResponse([row(doc) for doc in docs]).body
+
+
+async def _best(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(rows: int, repeat: int):
+    client = AsyncIOMotorClient(settings.mongodb_url, serverSelectionTimeoutMS=5000)
+    await init_beanie(database=client[f"{settings.mongodb_db_name}_bench"], document_models=[UserProfile, ActionStep, AssessmentResults])
+    await _seed(UserProfile, _user_doc, rows, {"user_id": {"$regex": "^bench-"}})
+    await _seed(ActionStep, _task_doc, rows, {"user_id": BENCH_USER})
+    await _seed(AssessmentResults, _assessment_doc, rows, {"user_id": BENCH_USER})
+    
+    print(f"{rows} rows per resource, best of {repeat}; times are per row")
+    print(f"{'resource':<12} {'mode':<11} {'beanie':>9} {'lean':>9} {'speedup':>8}")
+    for name, model, query, sort, lean_projection, row, build, response_model in CASES:
+        collection = model.get_motor_collection()
+        field = create_response_field(name=f"{name}_response", type_=List[response_model], mode="serialization")
+        
+        def cursor(projection=None):
+            found = collection.find(query, projection)
+            return (found.sort(sort) if sort else found).limit(rows)
+        
+        async def beanie_path():
+            docs = await cursor().to_list(length=rows)
+            await _beanie_render(model, docs, build, field)
+        
+        async def lean_path():
+            docs = await cursor(lean_projection).to_list(length=rows)
+            _lean_render(docs, row)
+        
+        full_docs = await cursor().to_list(length=rows)
+        lean_docs = await cursor(lean_projection).to_list(length=rows)
+        
+        async def beanie_cpu():
+            await _beanie_render(model, full_docs, build, field)
+        
+        async def lean_cpu():
+            _lean_render(lean_docs, row)
+        
+        for mode, old, new in (("end-to-end", beanie_path, lean_path), ("in-process", beanie_cpu, lean_cpu)):
+            old_s, new_s = await _best(repeat, old), await _best(repeat, new)
+            print(
+                f"{name:<12} {mode:<11} {old_s / rows * 1e6:>7.1f}us {new_s / rows * 1e6:>7.1f}us "
+                f"{old_s / new_s:>7.1f}x"
+            )
+    
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
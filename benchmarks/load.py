@@ -0,0 +1,402 @@
+"""
+End-to-end load benchmark of the API with a mixed, realistic workload.
+
+Starts benchmarks.fake_google and backend.main:app (one uvicorn worker) as
+subprocesses against a scratch `<MONGODB_DB_NAME>_load` database, seeds users
+through the real login flow plus tasks, assessments and calendar events, then
+drives the mix below and reports throughput and latency percentiles per route.
+
+    python -m benchmarks.load --users 200 --concurrency 64 --duration 30 --out load.json
+    python -m benchmarks.load --mongomock ...            # no MongoDB needed (not comparable)
+    python -m benchmarks.load --url http://host:8000 ... # an already running, configured server
+    python -m benchmarks.load --baseline load-main.json --out load.json
+
+With --baseline the run fails (exit code 1) if any route's p95 grew by more
+than --max-p95-regression or total throughput dropped by more than
+--max-throughput-drop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from . import _env  # noqa: F401
+
+PILLARS = ["health", "career", "relationships", "personal_growth", "finance", "recreation"]
+
+# Operation -> share of the mix
+WORKLOAD = {
+    "login": 2,
+    "me": 20,
+    "get_user": 8,
+    "list_tasks": 18,
+    "create_task": 10,
+    "complete_task": 8,
+    "add_xp": 10,
+    "list_users": 5,
+    "latest_assessment": 6,
+    "create_assessment": 3,
+    "leaderboard": 6,
+    "freebusy": 4,
+}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+    
+    def add(self, route: str, seconds: float, ok: bool):
+        self.latencies.setdefault(route, []).append(seconds * 1000)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+    
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            routes[route] = {
+                "count": len(samples),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(_percentile(samples, 0.50), 2),
+                "p95_ms": round(_percentile(samples, 0.95), 2),
+                "p99_ms": round(_percentile(samples, 0.99), 2),
+                "max_ms": round(max(samples), 2),
+            }
+        total = sum(r["count"] for r in routes.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "rps": round(total / elapsed, 1),
+            "routes": routes,
+        }
+
+
+class Client:
+    """One simulated user: a session token plus the ids of their open tasks"""
+    
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.token: Optional[str] = None
+        self.open_tasks: List[str] = []
+    
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def _timed(recorder: Recorder, route: str, request):
+    start = time.perf_counter()
+    try:
+        response = await request
+        ok = response.status_code < 400 or response.status_code == 307
+    except Exception:
+        response, ok = None, False
+    recorder.add(route, time.perf_counter() - start, ok)
+    return response
+
+
+async def login(http, recorder: Recorder, client: Client):
+    response = await _timed(recorder, "GET /auth/google/callback", http.get(
+        "/auth/google/callback", params={"code": f"code-{client.user_id}"}
+    ))
+    if response is not None and response.status_code == 307:
+        client.token = parse_qs(urlparse(response.headers["location"]).query)["token"][0]
+
+
+async def create_task(http, recorder: Recorder, client: Client, rng: random.Random):
+    due = datetime.now(timezone.utc) + timedelta(hours=rng.randint(1, 240))
+    response = await _timed(recorder, "POST /tasks/", http.post("/tasks/", json={
+        "user_id": client.user_id,
+        "title": f"Task {rng.randint(0, 10**6)}",
+        "description": "Synthetic load-test task",
+        "life_pillar": rng.choice(PILLARS),
+        "priority": rng.choice(["low", "medium", "high"]),
+        "estimated_duration": rng.choice([15, 30, 60]),
+        "due_date": due.isoformat(),
+    }))
+    if response is not None and response.status_code == 200:
+        client.open_tasks.append(response.json()["id"])
+
+
+async def create_assessment(http, recorder: Recorder, client: Client, rng: random.Random):
+    await _timed(recorder, "POST /assessments/", http.post("/assessments/", json={
+        "user_id": client.user_id,
+        "adhd_score": rng.randint(0, 40),
+        "anxiety_score": rng.randint(0, 21),
+        "depression_score": rng.randint(0, 27),
+        "responses": {f"q{i}": rng.randint(0, 4) for i in range(20)},
+    }))
+
+
+async def operation(name: str, http, recorder: Recorder, client: Client, rng: random.Random):
+    uid = client.user_id
+    if name == "login":
+        await login(http, recorder, client)
+    elif name == "me":
+        await _timed(recorder, "GET /auth/me", http.get("/auth/me", headers=client.headers))
+    elif name == "get_user":
+        await _timed(recorder, "GET /users/{user_id}", http.get(f"/users/{uid}"))
+    elif name == "list_tasks":
+        params = rng.choice([{}, {"completed": "false"}, {"sort": "due_date"}])
+        await _timed(recorder, "GET /tasks/user/{user_id}", http.get(f"/tasks/user/{uid}", params=params))
+    elif name == "create_task":
+        await create_task(http, recorder, client, rng)
+    elif name == "complete_task":
+        if not client.open_tasks:
+            return await create_task(http, recorder, client, rng)
+        task_id = client.open_tasks.pop(rng.randrange(len(client.open_tasks)))
+        await _timed(recorder, "PATCH /tasks/{task_id}/complete", http.patch(f"/tasks/{task_id}/complete"))
+    elif name == "add_xp":
+        await _timed(recorder, "POST /users/{user_id}/xp", http.post(
+            f"/users/{uid}/xp", params={"pillar": rng.choice(PILLARS), "amount": rng.randint(5, 50)}
+        ))
+    elif name == "list_users":
+        await _timed(recorder, "GET /users/", http.get("/users/", params={"sort": rng.choice(["level", "xp"]), "limit": 20}))
+    elif name == "latest_assessment":
+        await _timed(recorder, "GET /assessments/user/{user_id}", http.get(f"/assessments/user/{uid}"))
+    elif name == "create_assessment":
+        await create_assessment(http, recorder, client, rng)
+    elif name == "leaderboard":
+        board = rng.choice(["global"] + PILLARS)
+        await _timed(recorder, "GET /leaderboards/{board}", http.get(f"/leaderboards/{board}", params={"limit": 10}))
+    elif name == "freebusy":
+        start = datetime(2026, 1, 5, tzinfo=timezone.utc) + timedelta(days=rng.randint(0, 20))
+        await _timed(recorder, "GET /calendar/user/{user_id}/free", http.get(
+            f"/calendar/user/{uid}/free",
+            params={"start": start.isoformat(), "end": (start + timedelta(days=7)).isoformat()},
+        ))
+
+
+async def _with_backoff(attempt, retries: int = 5, backoff: float = 0.2) -> bool:
+    """Call `attempt` until it returns True, sleeping 0.2s, 0.4s, ... in between; False if it never did"""
+    for n in range(retries):
+        if await attempt():
+            return True
+        if n < retries - 1:
+            await asyncio.sleep(backoff * 2 ** n)
+    return False
+
+
+async def seed(http, clients: List[Client], tasks_per_user: int, calendar: bool, concurrency: int):
+    """Log every user in through the fake Google flow, then give them tasks, an assessment and calendar events"""
+    recorder = Recorder()  # seeding latencies are not part of the results
+    rng = random.Random(7)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def logged_in(client: Client) -> bool:
+        await login(http, recorder, client)
+        return client.token is not None
+    
+    async def synced(client: Client) -> bool:
+        # A full sync pulls hundreds of events from fake Google; slow, hence the longer timeout
+        response = await _timed(recorder, "POST /calendar/user/{user_id}/sync", http.post(
+            f"/calendar/user/{client.user_id}/sync", timeout=300
+        ))
+        return response is not None and response.status_code < 500
+    
+    async def one(client: Client):
+        async with semaphore:
+            # Under load the app's calls to fake Google occasionally fail transiently; retry rather than abort
+            if not await _with_backoff(lambda: logged_in(client)):
+                return
+            for _ in range(tasks_per_user):
+                await create_task(http, recorder, client, rng)
+            await create_assessment(http, recorder, client, rng)
+            if calendar:
+                await _with_backoff(lambda: synced(client))
+    
+    await asyncio.gather(*(one(c) for c in clients))
+    failed = sum(1 for c in clients if c.token is None)
+    if failed:
+        raise RuntimeError(f"{failed} of {len(clients)} users could not log in; is the server using fake_google?")
+
+
+async def drive(http, clients: List[Client], concurrency: int, duration: float, seed_value: int) -> dict:
+    recorder = Recorder()
+    names, weights = zip(*WORKLOAD.items())
+    deadline = time.perf_counter() + duration
+    
+    async def worker(n: int):
+        rng = random.Random(seed_value * 1000 + n)
+        while time.perf_counter() < deadline:
+            client = rng.choice(clients)
+            await operation(rng.choices(names, weights)[0], http, recorder, client, rng)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return recorder.summary(time.perf_counter() - start)
+
+
+def compare(result: dict, baseline: dict, max_p95_regression: float, max_throughput_drop: float) -> List[str]:
+    """Threshold violations of `result` against `baseline`, as readable lines"""
+    failures = []
+    if result["rps"] < baseline["rps"] * (1 - max_throughput_drop):
+        failures.append(f"throughput {result['rps']} rps vs baseline {baseline['rps']} rps")
+    for route, stats in result["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before or before["count"] < 20 or stats["count"] < 20:
+            continue  # too few samples for a stable p95
+        if stats["p95_ms"] > before["p95_ms"] * (1 + max_p95_regression):
+            failures.append(f"{route}: p95 {stats['p95_ms']}ms vs baseline {before['p95_ms']}ms")
+    return failures
+
+
+def _print_report(result: dict, baseline: Optional[dict]):
+    print(f"{result['requests']} requests in {result['elapsed_s']}s: {result['rps']} rps, {result['errors']} errors")
+    print(f"{'route':<38} {'count':>7} {'err':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'base p95':>9}")
+    for route, s in result["routes"].items():
+        base = (baseline or {}).get("routes", {}).get(route, {}).get("p95_ms", "")
+        print(
+            f"{route:<38} {s['count']:>7} {s['errors']:>5} {s['rps']:>7} "
+            f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} {base:>9}"
+        )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _start(args: List[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(http, path: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await http.get(path)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"server not ready at {path} after {timeout}s")
+
+
+def serve_mongomock(port: int):
+    """Run the app on an in-memory mongomock-motor database; numbers are not comparable with a real MongoDB"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--mongomock needs `pip install mongomock-motor`")
+    import uvicorn
+    from backend import database
+    
+    database.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+    uvicorn.run("backend.main:app", port=port, log_level="warning")
+
+
+async def run(args) -> int:
+    import httpx
+    
+    processes = []
+    url = args.url
+    if url is None:
+        env = {
+            **os.environ,
+            "MONGODB_DB_NAME": f"{os.environ.get('MONGODB_DB_NAME', 'gamified_productivity')}_load",
+            "GOOGLE_OAUTH_URL": f"http://127.0.0.1:{args.port + 1}",
+            "GOOGLE_API_URL": f"http://127.0.0.1:{args.port + 1}",
+            "GOOGLE_TOKEN_REFRESH_ENABLED": "false",
+            "RECOMMENDATION_MODEL": "stub",
+            "LOG_LEVEL": "error",
+        }
+        processes.append(_start(["-m", "uvicorn", "benchmarks.fake_google:app", "--port", str(args.port + 1), "--log-level", "warning"], env))
+        if args.mongomock:
+            processes.append(_start(["-m", "benchmarks.load", "--serve-mongomock", "--port", str(args.port)], env))
+        else:
+            processes.append(_start(["-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning"], env))
+        url = f"http://127.0.0.1:{args.port}"
+    
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as http:
+            if processes:
+                await _wait_ready(http, f"http://127.0.0.1:{args.port + 1}/health", 30)
+            await _wait_ready(http, "/health/ready", 90)
+            clients = [Client(f"load-{i}") for i in range(args.users)]
+            started = time.perf_counter()
+            await seed(http, clients, args.tasks_per_user, not args.no_calendar, args.concurrency)
+            print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+            if args.warmup:
+                await drive(http, clients, args.concurrency, args.warmup, args.seed + 1)
+            result = await drive(http, clients, args.concurrency, args.duration, args.seed)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+    
+    result = {
+        "commit": _git_commit(),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "users": args.users, "concurrency": args.concurrency, "duration": args.duration,
+            "tasks_per_user": args.tasks_per_user, "calendar": not args.no_calendar, "seed": args.seed, "mongomock": args.mongomock,
+            "workload": WORKLOAD,
+        },
+        **result,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    _print_report(result, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.out}")
+    
+    if baseline:
+        failures = compare(result, baseline, args.max_p95_regression, args.max_throughput_drop)
+        for line in failures:
+            print(f"REGRESSION {line}")
+        return 1 if failures else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=9300, help="app port; fake Google uses port + 1")
+    parser.add_argument("--mongomock", action="store_true", help="run the app on mongomock-motor")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks-per-user", type=int, default=10)
+    parser.add_argument("--no-calendar", action="store_true", help="skip seeding calendar events")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-p95-regression", type=float, default=0.25)
+    parser.add_argument("--max-throughput-drop", type=float, default=0.20)
+    parser.add_argument("--serve-mongomock", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_mongomock:
+        return serve_mongomock(args.port)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
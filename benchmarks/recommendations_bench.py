@@ -0,0 +1,69 @@
+"""
+Recommendation pipeline benchmark against the local stub model.
+
+    python -m benchmarks.recommendations_bench --requests 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from . import _env  # noqa: F401
+from backend.services.recommendations import RecommendationService, StubModel
+
+PILLARS = ["health", "career", "relationships", "personal_growth", "finance", "recreation"]
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _submission(rng: random.Random) -> tuple:
+    # Scores cluster around typical values, so many submissions share a bucket
+    def score():
+        return None if rng.random() < 0.1 else max(0, min(40, int(rng.gauss(14, 7))))
+    levels = {pillar: max(1, int(rng.expovariate(1 / 4))) for pillar in PILLARS}
+    return score(), score(), score(), levels
+
+
+async def run(requests: int, concurrency: int, latency: float, timeout: float):
+    rng = random.Random(1)
+    model = StubModel(latency=latency, jitter=latency)
+    service = RecommendationService(model, concurrency=4, timeout=timeout)
+    submissions = [_submission(rng) for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sources = [], {"ai": 0, "rules": 0}
+    
+    async def one(submission):
+        async with semaphore:
+            start = time.perf_counter()
+            _, source = await service.recommend(*submission)
+            latencies.append((time.perf_counter() - start) * 1000)
+            sources[source] += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(s) for s in submissions))
+    elapsed = time.perf_counter() - start
+    
+    stats = service.cache.stats()
+    print(f"{requests} requests in {elapsed:.2f}s, {model.calls} model calls")
+    print(f"cache hit rate {stats['hit_rate']:.1%}, ai {sources['ai']}, rule fallbacks {sources['rules']}")
+    print(
+        f"latency p50 {_percentile(latencies, 0.5):.1f}ms  p95 {_percentile(latencies, 0.95):.1f}ms  "
+        f"p99 {_percentile(latencies, 0.99):.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
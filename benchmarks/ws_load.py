@@ -0,0 +1,140 @@
+"""
+WebSocket fan-out load test: many concurrent sockets on one worker.
+
+The server side is the real /ws endpoint and event hub, mounted on a bare app
+(no MongoDB needed) with two extra endpoints to trigger bursts and read stats:
+
+    ulimit -n 65536
+    uvicorn benchmarks.ws_load:app --port 9200 --workers 1 &
+    python -m benchmarks.ws_load --sockets 10000 --rounds 20 --slow 0.01
+
+Each round publishes one coalescable event to every connected user. Clients
+record delivery latency from the event timestamp; a --slow fraction of clients
+never read, to exercise the per-connection queue limit and send timeout.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from . import _env  # noqa: F401
+from fastapi import FastAPI
+from jose import jwt
+
+from backend.config import settings
+from backend.routers import events as events_router
+from backend.services import events
+
+app = FastAPI()
+app.include_router(events_router.router)
+
+
+@app.post("/_bench/burst")
+async def burst(rounds: int = 10, interval: float = 0.5):
+    """Publish one event per round to every user connected to this worker"""
+    for i in range(rounds):
+        for user_id in list(events.hub.connections):
+            await events.publish(user_id, "xp", {"round": i}, coalesce_key="xp:bench")
+        await asyncio.sleep(interval)
+    return events.hub.stats()
+
+
+@app.get("/_bench/stats")
+async def server_stats():
+    with open(f"/proc/{os.getpid()}/status") as f:
+        rss_kb = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), None)
+    return {**events.hub.stats(), "rss_mb": rss_kb / 1024 if rss_kb else None}
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else float("nan")
+
+
+def _token(user_id: str) -> str:
+    return jwt.encode(
+        {"sub": user_id, "exp": time.time() + 3600}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm
+    )
+
+
+async def run(url: str, sockets: int, rounds: int, interval: float, slow: float, connect_concurrency: int):
+    import httpx
+    import websockets
+
+    rng = random.Random(1)
+    ws_url = url.replace("http", "ws", 1) + "/ws?token="
+    latencies, counts = [], {"xp": 0, "heartbeat": 0, "resync": 0}
+    connected, failed = [], 0
+    semaphore = asyncio.Semaphore(connect_concurrency)
+
+    async def reader(ws):
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                counts[event["type"]] = counts.get(event["type"], 0) + 1
+                if event["type"] == "xp":
+                    latencies.append((time.time() - event["ts"]) * 1000)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def connect(i: int):
+        nonlocal failed
+        is_slow = rng.random() < slow
+        async with semaphore:
+            try:
+                # Slow clients buffer a single frame, so the kernel buffers fill and the server feels it
+                ws = await websockets.connect(ws_url + _token(f"ws-{i}"), max_queue=1 if is_slow else 32)
+            except Exception:
+                failed += 1
+                return None
+        connected.append(ws)
+        return None if is_slow else ws
+
+    start = time.perf_counter()
+    clients = await asyncio.gather(*(connect(i) for i in range(sockets)))
+    connect_s = time.perf_counter() - start
+    readers = [asyncio.create_task(reader(ws)) for ws in clients if ws is not None]
+    print(f"connected {len(connected)}/{sockets} in {connect_s:.1f}s ({failed} failed)")
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as http:
+        start = time.perf_counter()
+        hub_stats = (await http.post("/_bench/burst", params={"rounds": rounds, "interval": interval})).json()
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(1.0)
+        stats = (await http.get("/_bench/stats")).json()
+
+    print(f"{rounds} rounds in {elapsed:.1f}s, {hub_stats['published']} events published")
+    print(
+        f"delivered {counts['xp']} xp events to readers, {counts['resync']} resyncs, "
+        f"server coalesced {stats['coalesced']}, dropped {stats['dropped']}, "
+        f"{stats['connections']} connections left"
+    )
+    print(
+        f"latency p50 {_percentile(latencies, 0.5):.1f}ms  p95 {_percentile(latencies, 0.95):.1f}ms  "
+        f"p99 {_percentile(latencies, 0.99):.1f}ms  max {max(latencies, default=float('nan')):.1f}ms"
+    )
+    print(f"server RSS {stats['rss_mb']:.0f} MB" if stats["rss_mb"] else "server RSS unknown")
+
+    for ws in connected:
+        await ws.close()
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:9200")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--slow", type=float, default=0.01, help="fraction of clients that never read")
+    parser.add_argument("--connect-concurrency", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.sockets, args.rounds, args.interval, args.slow, args.connect_concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -48,11 +48,13 @@ export default function Dashboard() {
 
   const fetchUserData = async (token: string) => {
     try {
-      const response = await axios.get(`http://localhost:8000/auth/me?token=${token}`)
+      const response = await axios.get(`http://localhost:8000/auth/me`, {
+        headers: { Authorization: `Bearer ${token}` }
+      })
       setUser(response.data)
       
       const tasksResponse = await axios.get(`http://localhost:8000/tasks/user/${response.data.user_id}`)
-      setTasks(tasksResponse.data)
+      setTasks(tasksResponse.data.items)
     } catch (error) {
       console.error('Error fetching user data:', error)
       localStorage.removeItem('token')
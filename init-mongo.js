@@ -1,29 +1,20 @@
 // MongoDB initialization script
 db = db.getSiblingDB('gamified_productivity');
 
-// Create collections
-db.createCollection('users');
+// Create collections (names match the Beanie models in backend/models/)
+db.createCollection('user_profiles');
 db.createCollection('calendar_events');
+db.createCollection('calendar_sync_states');
 db.createCollection('action_steps');
-db.createCollection('assessments');
-db.createCollection('avatars');
+db.createCollection('assessment_results');
+db.createCollection('avatar_configurations');
+db.createCollection('equipment');
 db.createCollection('xp_records');
+db.createCollection('xp_rollups');
+db.createCollection('task_schedules');
+db.createCollection('scheduler_runs');
 
-// Create indexes for better performance
-db.users.createIndex({ "email": 1 }, { unique: true });
-db.users.createIndex({ "user_id": 1 }, { unique: true });
+// Indexes are declared next to each model and built by the backend on startup.
+// Report them with: python -m backend.indexes (add --verify to check query plans)
 
-db.calendar_events.createIndex({ "user_id": 1, "start_time": 1 });
-db.calendar_events.createIndex({ "event_id": 1 }, { unique: true });
-
-db.action_steps.createIndex({ "user_id": 1, "due_date": 1 });
-db.action_steps.createIndex({ "life_pillar": 1 });
-
-db.assessments.createIndex({ "user_id": 1, "completed_date": -1 });
-
-db.avatars.createIndex({ "user_id": 1 }, { unique: true });
-
-db.xp_records.createIndex({ "user_id": 1, "life_pillar": 1 });
-db.xp_records.createIndex({ "created_at": -1 });
-
-print('Database initialized successfully!');
\ No newline at end of file
+print('Database initialized successfully!');
@@ -0,0 +1,50 @@
+import os
+
+# Required settings, set before anything imports backend.config
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+
+import asyncio
+from functools import wraps
+
+import pytest
+import pytest_asyncio
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+
+from backend.database import document_models
+
+
+@pytest_asyncio.fixture
+async def db():
+    """A fresh in-memory database with every document model initialised"""
+    database = AsyncMongoMockClient()["test"]
+    await init_beanie(database=database, document_models=document_models())
+    yield database
+
+
+# Collection calls that can read or write a document
+INTERLEAVED_METHODS = (
+    "find_one", "find_one_and_update", "find_one_and_replace", "update_one", "update_many",
+    "replace_one", "insert_one", "insert_many", "bulk_write", "delete_one", "delete_many",
+)
+
+
+@pytest.fixture
+def interleaved(monkeypatch):
+    """
+    Make every collection call yield to the event loop first, as a round trip
+    to a real server does. mongomock runs each call to completion without
+    yielding, so concurrent read-modify-write code would never interleave.
+    """
+    def yielding(method):
+        @wraps(method)
+        async def call(self, *args, **kwargs):
+            await asyncio.sleep(0)
+            return await method(self, *args, **kwargs)
+        return call
+    
+    for name in INTERLEAVED_METHODS:
+        monkeypatch.setattr(AsyncMongoMockCollection, name, yielding(getattr(AsyncMongoMockCollection, name)))
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models.assessment import AssessmentResults
+from backend.routers.assessments import get_assessment_history, get_assessment_trend
+
+START = datetime(2026, 1, 1)
+
+
+async def add_assessments(scores):
+    """One assessment a day, oldest first; returns their ids"""
+    ids = []
+    for day, (adhd, anxiety) in enumerate(scores):
+        assessment = AssessmentResults(
+            user_id="u1", adhd_score=adhd, anxiety_score=anxiety, completed_date=START + timedelta(days=day)
+        )
+        await assessment.insert()
+        ids.append(str(assessment.id))
+    return ids
+
+
+async def test_history_pages_newest_first(db):
+    ids = await add_assessments([(i, i) for i in range(7)])
+    # Same completed_date as the newest one: _id breaks the tie
+    tied = AssessmentResults(user_id="u1", adhd_score=0, completed_date=START + timedelta(days=6))
+    await tied.insert()
+    
+    seen, cursor = [], None
+    while True:
+        page = json.loads((await get_assessment_history("u1", limit=3, cursor=cursor)).body)
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [str(tied.id)] + ids[::-1]
+    
+    with pytest.raises(HTTPException) as error:
+        await get_assessment_history("u1", limit=3, cursor="not-a-cursor")
+    assert error.value.status_code == 400
+
+
+async def test_trend_downsamples_moving_averages(db):
+    await add_assessments([(i, None if i % 2 else 10) for i in range(10)])
+    
+    trend = await get_assessment_trend("u1", window=2, last=3, points=5)
+    assert trend.total == 10
+    assert [point.count for point in trend.points] == [2] * 5
+    assert [point.start for point in trend.points] == [START + timedelta(days=d) for d in range(0, 10, 2)]
+    assert [point.end for point in trend.points] == [START + timedelta(days=d) for d in range(1, 10, 2)]
+    # Moving averages over 2 assessments are 0, 0.5, 1.5, 2.5, ...; each point averages two of them
+    assert [point.adhd_avg for point in trend.points] == [0.25, 2.0, 4.0, 6.0, 8.0]
+    # Missing scores are skipped, so every window still averages to 10
+    assert [point.anxiety_avg for point in trend.points] == [10.0] * 5
+    assert all(point.depression_avg is None for point in trend.points)
+    assert trend.change == {"adhd_score": 3, "anxiety_score": None, "depression_score": None}
+    assert trend.compared_to == START + timedelta(days=6)
+
+
+async def test_trend_of_a_short_history(db):
+    await add_assessments([(4, 5)])
+    
+    trend = await get_assessment_trend("u1", window=3, last=5, points=50)
+    assert [(point.count, point.adhd_avg) for point in trend.points] == [(1, 4.0)]
+    assert trend.change == {"adhd_score": None, "anxiety_score": None, "depression_score": None}
+    assert trend.compared_to is None
+    
+    with pytest.raises(HTTPException) as error:
+        await get_assessment_trend("nobody", window=3, last=5, points=50)
+    assert error.value.status_code == 404
@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import pytest
+from fakeredis import FakeServer, aioredis
+
+from backend.services.events import Connection, EventHub
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+        self.open = asyncio.Event()
+        self.open.set()
+    
+    async def send_text(self, payload: str):
+        await self.open.wait()
+        self.frames.append(json.loads(payload))
+    
+    def types(self):
+        return [frame["type"] for frame in self.frames]
+
+
+async def until(condition, timeout: float = 2.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.fixture
+async def senders():
+    """Run connections' sender tasks, cancelled at the end of the test"""
+    tasks = []
+    
+    def run(connection: Connection, heartbeat: float = 60.0, send_timeout: float = 1.0) -> asyncio.Task:
+        task = asyncio.create_task(connection.run_sender(heartbeat, send_timeout))
+        tasks.append(task)
+        return task
+    
+    yield run
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def test_publish_fans_out_to_every_connection_of_the_user(senders):
+    hub = EventHub()
+    phone, laptop, other = (Connection(FakeWebSocket(), user_id, 10) for user_id in ("u1", "u1", "u2"))
+    for connection in (phone, laptop, other):
+        hub.add(connection)
+        senders(connection)
+    
+    await hub.publish("u1", "task_completed", {"task_id": "t1"})
+    await until(lambda: phone.sent and laptop.sent)
+    assert phone.websocket.frames[0]["data"] == {"task_id": "t1"}
+    assert laptop.websocket.types() == ["task_completed"]
+    assert other.websocket.frames == []
+    
+    hub.remove(phone)
+    hub.remove(laptop)
+    assert list(hub.connections) == ["u2"]
+    assert hub.stats()["delivered"] == 2
+
+
+def test_snapshots_coalesce_and_overflow_becomes_one_resync():
+    connection = Connection(FakeWebSocket(), "u1", queue_size=3)
+    connection.enqueue(json.dumps({"type": "xp", "v": 1}), "xp:health")
+    connection.enqueue(json.dumps({"type": "xp", "v": 2}), "xp:health")
+    connection.enqueue(json.dumps({"type": "level_up"}))
+    assert connection.coalesced == 1
+    assert [json.loads(p)["type"] for p in connection._queue.values()] == ["xp", "level_up"]
+    assert json.loads(connection._queue["xp:health"])["v"] == 2
+    
+    connection.enqueue(json.dumps({"type": "level_up"}))
+    connection.enqueue(json.dumps({"type": "level_up"}))  # the queue is full: it and the backlog become a resync
+    assert connection.dropped == 3
+    assert [json.loads(p) for p in connection._queue.values()] == [{"type": "resync"}]
+
+
+async def test_slow_client_gets_a_resync_then_catches_up(senders):
+    websocket = FakeWebSocket()
+    websocket.open.clear()
+    connection = Connection(websocket, "u1", queue_size=2)
+    senders(connection)
+    
+    connection.enqueue(json.dumps({"type": "event", "i": 0}))
+    await until(lambda: not connection._queue)  # taken by the sender, which is stuck sending it
+    for i in range(1, 5):
+        connection.enqueue(json.dumps({"type": "event", "i": i}))
+    websocket.open.set()
+    await until(lambda: len(websocket.frames) >= 3)
+    # Events 1 and 2 filled the queue, so 3 turned the backlog into a resync; 4 queued behind it
+    assert websocket.types() == ["event", "resync", "event"]
+    assert [frame.get("i") for frame in websocket.frames] == [0, None, 4]
+    assert connection.dropped == 2
+
+
+async def test_client_that_stops_reading_is_disconnected(senders):
+    websocket = FakeWebSocket()
+    websocket.open.clear()
+    connection = Connection(websocket, "u1", queue_size=10)
+    sender = senders(connection, send_timeout=0.05)
+    
+    connection.enqueue(json.dumps({"type": "event"}))
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(sender, 1.0)
+
+
+async def test_idle_connection_gets_heartbeats(senders):
+    connection = Connection(FakeWebSocket(), "u1", queue_size=10)
+    senders(connection, heartbeat=0.02)
+    
+    await until(lambda: len(connection.websocket.frames) >= 2)
+    assert set(connection.websocket.types()) == {"heartbeat"}
+
+
+@pytest.fixture
+def redis_server():
+    return FakeServer()
+
+
+@pytest.fixture
+async def workers(redis_server):
+    """Two hubs, as on two workers, sharing one Redis"""
+    hubs = [EventHub(aioredis.FakeRedis(server=redis_server), "events") for _ in range(2)]
+    for hub in hubs:
+        await hub.start()
+    yield hubs
+    for hub in hubs:
+        await hub.stop()
+
+
+async def test_backplane_delivers_events_published_on_another_worker(workers, senders):
+    first, second = workers
+    here, there = Connection(FakeWebSocket(), "u1", 10), Connection(FakeWebSocket(), "u1", 10)
+    first.add(here)
+    second.add(there)
+    senders(here)
+    senders(there)
+    
+    await first.publish("u1", "xp", {"total_xp": 10}, coalesce_key="xp:health")
+    await until(lambda: there.sent == 1)
+    await asyncio.sleep(0.05)
+    # Delivered once on each worker: the publisher ignores its own message coming back
+    assert here.websocket.types() == ["xp"]
+    assert there.websocket.frames[0]["data"] == {"total_xp": 10}
+    assert first.stats()["backplane"] == "redis"
+
+
+async def test_backplane_survives_malformed_messages(workers, senders, redis_server):
+    first, second = workers
+    there = Connection(FakeWebSocket(), "u1", 10)
+    second.add(there)
+    senders(there)
+    
+    publisher = aioredis.FakeRedis(server=redis_server)
+    await publisher.publish("events", "not json")
+    await publisher.publish("events", json.dumps({"origin": "elsewhere"}))
+    await first.publish("u1", "task_completed", {"task_id": "t1"})
+    await until(lambda: there.sent == 1)
+    assert there.websocket.types() == ["task_completed"]
+    await publisher.aclose()
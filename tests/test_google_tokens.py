@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import httpx
+
+from backend.models.user import GoogleTokens, UserProfile
+from backend.services.google_tokens import LEASE_FIELD, TokenRefresher, get_valid_access_token
+
+
+async def expiring_user(user_id: str):
+    tokens = GoogleTokens(access_token="old", refresh_token="refresh", token_expiry=datetime.utcnow())
+    await UserProfile(user_id=user_id, email=f"{user_id}@example.com", google_tokens=tokens).insert()
+
+
+async def stored_tokens(user_id: str) -> dict:
+    user = await UserProfile.get_motor_collection().find_one({"user_id": user_id})
+    return user["google_tokens"]
+
+
+def google(on_refresh=None) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if on_refresh:
+            await on_refresh()
+        return httpx.Response(200, json={"access_token": "new", "expires_in": 3600})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_refresher_writes_each_outcome_and_frees_the_lease(db):
+    for user_id in ("a", "b"):
+        await expiring_user(user_id)
+    
+    assert await TokenRefresher(google()).refresh_expiring() == 2
+    for user_id in ("a", "b"):
+        tokens = await stored_tokens(user_id)
+        assert tokens["access_token"] == "new"
+        assert LEASE_FIELD.split(".")[1] not in tokens
+
+
+async def test_write_after_losing_the_lease_is_dropped(db):
+    await expiring_user("a")
+    
+    async def taken_over():
+        # The lease expired mid-request and another refresh claimed the tokens
+        await UserProfile.get_motor_collection().update_one(
+            {"user_id": "a"}, {"$set": {LEASE_FIELD: datetime.utcnow() + timedelta(minutes=1)}}
+        )
+    
+    assert await TokenRefresher(google(taken_over)).refresh_expiring() == 0
+    assert (await stored_tokens("a"))["access_token"] == "old"
+    # The on-demand path still hands out what it fetched
+    await UserProfile.get_motor_collection().update_one({"user_id": "a"}, {"$unset": {LEASE_FIELD: ""}})
+    assert await get_valid_access_token(google(taken_over), "a") == "new"
+    assert (await stored_tokens("a"))["access_token"] == "old"
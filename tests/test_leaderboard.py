@@ -0,0 +1,121 @@
+import pytest
+from fakeredis import aioredis
+
+from backend.config import settings
+from backend.models.enums import LifePillar
+from backend.models.user import UserProfile
+from backend.services import leaderboard as leaderboards
+from backend.services.leaderboard import GLOBAL_BOARD, MemoryLeaderboard, RedisLeaderboard
+
+SCORES = [("ana", 50), ("ben", 40), ("cal", 30), ("dee", 20), ("eve", 10)]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(settings, "leaderboard_backend", request.param)
+    monkeypatch.setattr(leaderboards, "leaderboard", MemoryLeaderboard())
+    return request.param
+
+
+@pytest.fixture
+def board(backend):
+    return MemoryLeaderboard() if backend == "memory" else RedisLeaderboard(aioredis.FakeRedis())
+
+
+async def test_top_is_best_first(board):
+    await board.load({"health": SCORES})
+    assert await board.top("health", 3) == [
+        {"rank": 1, "user_id": "ana", "score": 50},
+        {"rank": 2, "user_id": "ben", "score": 40},
+        {"rank": 3, "user_id": "cal", "score": 30},
+    ]
+    assert len(await board.top("health", 100)) == len(SCORES)
+
+
+async def test_rank(board):
+    await board.load({"health": SCORES})
+    assert await board.rank("health", "cal") == {"rank": 3, "user_id": "cal", "score": 30}
+    assert await board.rank("health", "nobody") is None
+
+
+async def test_around_pages_the_neighbourhood(board):
+    await board.load({"health": SCORES})
+    assert [e["user_id"] for e in await board.around("health", "cal", 1)] == ["ben", "cal", "dee"]
+    # Clipped at the top of the board, ranks stay absolute
+    assert [(e["rank"], e["user_id"]) for e in await board.around("health", "ben", 2)] == [
+        (1, "ana"), (2, "ben"), (3, "cal"), (4, "dee"),
+    ]
+    assert await board.around("health", "nobody", 2) == []
+
+
+async def test_scores_move_ranks(board):
+    await board.load({"health": SCORES})
+    await board.set_score("health", "eve", 45)
+    await board.incr_score("health", "dee", 100)
+    assert [e["user_id"] for e in await board.top("health", 3)] == ["dee", "ana", "eve"]
+
+
+async def test_add_keeps_existing_scores(board):
+    await board.load({"health": SCORES})
+    await board.add("health", "ana", 0)
+    await board.add("health", "zed", 0)
+    assert await board.rank("health", "ana") == {"rank": 1, "user_id": "ana", "score": 50}
+    assert await board.rank("health", "zed") == {"rank": 6, "user_id": "zed", "score": 0}
+
+
+async def test_new_users_and_grants_reach_the_boards(db, backend):
+    await UserProfile(user_id="old", email="old@example.com", total_xp={"health": 70}).insert()
+    await leaderboards.init_leaderboard(aioredis.FakeRedis() if backend == "redis" else None)
+    
+    await leaderboards.add_user("new")
+    assert (await leaderboards.leaderboard.rank(GLOBAL_BOARD, "new"))["score"] == 0
+    await leaderboards.record_xp("new", {
+        LifePillar.HEALTH: {"xp_added": 100, "total_xp": 100},
+        LifePillar.CAREER: {"xp_added": 5, "total_xp": 5},
+    })
+    assert await leaderboards.leaderboard.top("health", 2) == [
+        {"rank": 1, "user_id": "new", "score": 100},
+        {"rank": 2, "user_id": "old", "score": 70},
+    ]
+    assert await leaderboards.leaderboard.rank(GLOBAL_BOARD, "new") == {"rank": 1, "user_id": "new", "score": 105}
+
+
+async def test_reload_picks_up_other_workers_grants(db, monkeypatch):
+    monkeypatch.setattr(leaderboards, "leaderboard", MemoryLeaderboard())
+    await UserProfile(user_id="a", email="a@example.com", total_xp={"health": 10}).insert()
+    await leaderboards.reload_leaderboard()
+    # Written by another worker, straight to Mongo
+    await UserProfile(user_id="b", email="b@example.com", total_xp={"health": 20}).insert()
+    assert await leaderboards.leaderboard.rank("health", "b") is None
+    
+    await leaderboards.reload_leaderboard()
+    assert [e["user_id"] for e in await leaderboards.leaderboard.top("health", 2)] == ["b", "a"]
+
+
+async def test_reconcile_repairs_the_redis_boards(db, monkeypatch):
+    monkeypatch.setattr(settings, "leaderboard_backend", "redis")
+    for user_id, xp in (("a", 10), ("b", 20), ("c", 30)):
+        await UserProfile(user_id=user_id, email=f"{user_id}@example.com", total_xp={"health": xp}).insert()
+    await leaderboards.init_leaderboard(aioredis.FakeRedis())
+    board = leaderboards.leaderboard
+    
+    profiles = UserProfile.get_motor_collection()
+    await profiles.update_one({"user_id": "a"}, {"$set": {"total_xp.health": 50}})  # its board update failed
+    await profiles.delete_one({"user_id": "b"})
+    await board.set_score("health", "c", 40)  # a grant the read below predates
+    await leaderboards.reload_leaderboard()
+    
+    assert await board.top("health", 5) == [
+        {"rank": 1, "user_id": "a", "score": 50},
+        {"rank": 2, "user_id": "c", "score": 40},
+    ]
+    assert await board.rank(GLOBAL_BOARD, "b") is None
+
+
+async def test_unknown_pillars_are_skipped(db, monkeypatch):
+    monkeypatch.setattr(leaderboards, "leaderboard", MemoryLeaderboard())
+    await UserProfile.get_motor_collection().insert_one({"user_id": "a", "total_xp": {"health": 10, "retired": 5}})
+    
+    await leaderboards.reload_leaderboard()
+    assert (await leaderboards.leaderboard.rank("health", "a"))["score"] == 10
+    assert (await leaderboards.leaderboard.rank(GLOBAL_BOARD, "a"))["score"] == 15
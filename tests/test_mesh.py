@@ -0,0 +1,64 @@
+import zlib
+
+import numpy as np
+import pytest
+from mongomock_motor import enabled_gridfs_integration
+
+from backend.config import settings
+from backend.services.mesh import FLAG_DEFLATE, HEADER, MeshError, decode, encode, read_mesh, store_mesh
+
+POSITIONS = np.arange(30, dtype="<f4").reshape(10, 3)
+INDICES = np.array([0, 1, 2, 7, 8, 9, 2, 3, 4], dtype="<u4")
+
+
+@pytest.fixture
+def gridfs(db):
+    with enabled_gridfs_integration():
+        yield db
+
+
+async def upload(data: bytes, size: int = 7):
+    async def chunks():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return await store_mesh("u1", chunks())
+
+
+async def stored_files(db) -> int:
+    return await db[f"{settings.mesh_bucket}.files"].count_documents({})
+
+
+@pytest.mark.parametrize("compress", [False, True])
+async def test_store_validates_while_streaming(gridfs, compress):
+    data = encode(POSITIONS, INDICES, normals=POSITIONS, quantize=compress, compress=compress)
+    ref = await upload(data)
+    assert ref["size_bytes"] == len(data)
+    stored = decode(await read_mesh(ref["file_id"]))
+    assert stored["indices"].tolist() == INDICES.tolist()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+async def test_out_of_range_index_split_across_chunks_is_rejected(gridfs, compress):
+    data = bytearray(encode(POSITIONS, INDICES))
+    data[-4:] = (10).to_bytes(4, "little")
+    if compress:
+        magic, version, flags, n, m, _ = HEADER.unpack_from(data)
+        payload = zlib.compress(bytes(data[HEADER.size:]))
+        data = HEADER.pack(magic, version, flags | FLAG_DEFLATE, n, m, len(payload)) + payload
+    
+    with pytest.raises(MeshError, match="Index out of range"):
+        await upload(bytes(data), size=5)  # indices straddle the chunk boundaries
+    assert await stored_files(gridfs) == 0
+
+
+async def test_corrupt_or_oversized_deflate_stream_is_rejected(gridfs):
+    data = encode(POSITIONS, INDICES, compress=True)
+    header = HEADER.unpack_from(data)
+    with pytest.raises(MeshError, match="Corrupt deflate stream"):
+        await upload(data[:HEADER.size] + bytes(len(data) - HEADER.size))
+    
+    # Inflates past the size the header promises
+    bomb = zlib.compress(bytes(1 << 20))
+    with pytest.raises(MeshError, match="Payload size does not match"):
+        await upload(HEADER.pack(*header[:-1], len(bomb)) + bomb, size=1024)
+    assert await stored_files(gridfs) == 0
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.pagination import decode_cursor, encode_cursor, keyset_filter
+from backend.routers import users
+
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 1, 12, 30), ObjectId(), "u1", 3, 2.5, None, True]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize("values", [
+    [{"$ne": None}, {"$o": "000000000000000000000000"}],
+    [{"$d": "2024-01-01T00:00:00", "$ne": None}],
+    [{"$o": {"$gt": ""}}],
+    [["a", "b"]],
+    [{}],
+])
+def test_tampered_cursor_is_rejected(values):
+    with pytest.raises(ValueError):
+        decode_cursor(_raw_cursor(values))
+
+
+def test_keyset_filter_after_last_row():
+    oid = ObjectId()
+    assert keyset_filter([("xp_total", -1), ("_id", 1)], [10, oid]) == {"$or": [
+        {"xp_total": {"$lt": 10}},
+        {"xp_total": 10, "_id": {"$gt": oid}},
+    ]}
+
+
+def test_tampered_cursor_is_a_400():
+    app = FastAPI()
+    app.include_router(users.router)
+    response = TestClient(app).get("/users/", params={"cursor": _raw_cursor([{"$ne": None}])})
+    assert response.status_code == 400
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from backend.services.recommendations import RecommendationModel, RecommendationService, StubModel
+
+
+def service(model: StubModel, **kwargs) -> RecommendationService:
+    options = {"concurrency": 4, "timeout": 1.0, "batch_size": 4, "batch_window": 0.01}
+    options.update(kwargs)
+    return RecommendationService(model, **options)
+
+
+def test_model_must_implement_generate():
+    with pytest.raises(TypeError):
+        RecommendationModel()
+
+
+async def test_requests_are_batched():
+    model = StubModel(latency=0.01)
+    svc = service(model, batch_size=4)
+    
+    answers = await asyncio.gather(*(svc.recommend(score, 0, 0) for score in range(0, 40, 5)))
+    assert all(source == "ai" for _, source in answers)
+    assert model.calls == 2  # eight distinct inputs, four per call
+    assert len({tuple(recommendations) for recommendations, _ in answers}) == 8
+
+
+async def test_partial_batch_flushes_after_the_window():
+    model = StubModel(latency=0.01)
+    svc = service(model, batch_size=100, batch_window=0.02)
+    
+    answers = await asyncio.gather(svc.recommend(5, 0, 0), svc.recommend(10, 0, 0))
+    assert [source for _, source in answers] == ["ai", "ai"]
+    assert model.calls == 1
+
+
+async def test_identical_requests_share_one_prompt():
+    model = StubModel(latency=0.01)
+    svc = service(model)
+    
+    # 12 and 14 fall in the same score bucket
+    answers = await asyncio.gather(*(svc.recommend(12 + i % 3, 3, 4) for i in range(20)))
+    assert model.calls == 1
+    assert len({tuple(recommendations) for recommendations, _ in answers}) == 1
+    
+    # Answered from the cache from now on
+    assert await svc.recommend(13, 3, 4) == answers[0]
+    assert model.calls == 1
+
+
+async def test_slow_model_falls_back_to_rules_and_still_fills_the_cache():
+    model = StubModel(latency=0.2)
+    svc = service(model, timeout=0.05)
+    
+    recommendations, source = await svc.recommend(20, 10, 10)
+    assert source == "rules"
+    assert recommendations
+    assert svc.fallbacks == 1
+    
+    await asyncio.sleep(0.3)  # the shielded batch finishes after the caller gave up
+    assert (await svc.recommend(20, 10, 10))[1] == "ai"
+    assert model.calls == 1
+    assert not svc._batches
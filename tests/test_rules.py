@@ -0,0 +1,95 @@
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+from backend.config import settings
+from backend.models.assessment import AssessmentResults
+from backend.models.user import UserProfile
+from backend.services import rules
+from backend.services.rules import SCORE_FIELDS, RuleEngine, backfill_recommendations, load_rule_engine
+
+TABLE = {
+    "version": 1,
+    "rules": [
+        {"id": "adhd", "when": {"adhd_score": {"gt": 15}}, "recommendations": ["a"]},
+        {"id": "anxious", "when": {"anxiety_score": {"gte": 10, "lt": 20}}, "recommendations": ["b", "a"]},
+        {"id": "low-health", "when": {"depression_score": {"gt": 5}, "pillar_levels": {"health": {"lte": 2}}}, "recommendations": ["c"]},
+    ],
+}
+
+
+def cohort(n: int, pillars) -> list:
+    rng = random.Random(7)
+    
+    def maybe(value):
+        return None if rng.random() < 0.2 else value
+    
+    return [
+        (
+            [maybe(rng.randint(0, 27)) for _ in SCORE_FIELDS],
+            {pillar: level for pillar in pillars if (level := maybe(rng.randint(1, 6))) is not None},
+        )
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("engine", [RuleEngine(TABLE), load_rule_engine()], ids=["table", "shipped"])
+def test_batch_matches_scalar_evaluation(engine):
+    rows = cohort(2000, engine.pillars)
+    columns = {
+        field: np.array([np.nan if scores[i] is None else scores[i] for scores, _ in rows], dtype=np.float64)
+        for i, field in enumerate(SCORE_FIELDS)
+    }
+    for pillar in engine.pillars:
+        columns[f"pillar:{pillar}"] = np.array([levels.get(pillar, np.nan) for _, levels in rows], dtype=np.float64)
+    
+    ids = engine.evaluate_batch(columns)
+    assert [list(engine.results[i]) for i in ids] == [engine.evaluate(*scores, levels) for scores, levels in rows]
+
+
+@pytest.fixture
+def rule_file(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(TABLE))
+    monkeypatch.setattr(settings, "recommendation_rules_path", str(path))
+    monkeypatch.setattr(settings, "recommendation_rules_reload_seconds", 0)
+    monkeypatch.setattr(rules, "_holder", rules._Holder())
+    return path
+
+
+def rewrite(path, table):
+    path.write_text(table if isinstance(table, str) else json.dumps(table))
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+async def test_reload_swaps_the_rules_off_the_request_path(rule_file):
+    assert rules.get_rule_engine().version == 1
+    rewrite(rule_file, {**TABLE, "version": 2})
+    
+    # The caller gets the current table while the new one compiles in a thread
+    assert rules.get_rule_engine().version == 1
+    await rules._holder.reloading
+    assert rules.get_rule_engine().version == 2
+    
+    rewrite(rule_file, "{not json")
+    rules.get_rule_engine()
+    await rules._holder.reloading
+    assert rules.get_rule_engine().version == 2
+
+
+async def test_backfill_rescores_rule_based_assessments(db, rule_file):
+    await UserProfile(user_id="u1", email="u1@example.com", life_pillar_levels={"health": 1}).insert()
+    stale = AssessmentResults(user_id="u1", adhd_score=20, depression_score=9, recommendations=["old"])
+    current = AssessmentResults(user_id="u1", anxiety_score=12, recommendations=["b", "a"])
+    ai = AssessmentResults(user_id="u1", adhd_score=20, recommendations=["ai"], recommendations_source="ai")
+    for assessment in (stale, current, ai):
+        await assessment.insert()
+    
+    assert await backfill_recommendations(batch_size=2) == 1
+    assert (await AssessmentResults.get(stale.id)).recommendations == ["a", "c"]
+    assert (await AssessmentResults.get(current.id)).recommendations == ["b", "a"]
+    assert (await AssessmentResults.get(ai.id)).recommendations == ["ai"]
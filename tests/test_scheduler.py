@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models.calendar import ActionStep, TaskSchedule
+from backend.models.enums import LifePillar
+from backend.routers.tasks import delete_task, get_task_schedule, plan_task_schedule
+from backend.services.scheduler import replan_changed
+
+
+async def add_task(title: str) -> str:
+    task = ActionStep(user_id="u1", title=title, description="", life_pillar=LifePillar.CAREER, estimated_duration=60)
+    await task.insert()
+    return str(task.id)
+
+
+async def test_reading_the_schedule_does_not_plan(db):
+    await add_task("write report")
+    with pytest.raises(HTTPException) as error:
+        await get_task_schedule("u1", days=7)
+    assert error.value.status_code == 404
+    assert await TaskSchedule.get_motor_collection().count_documents({}) == 0
+    
+    planned = await plan_task_schedule("u1", days=7)
+    assert [entry["title"] for entry in planned["entries"]] == ["write report"]
+    stored = await get_task_schedule("u1", days=7)
+    assert [entry["task_id"] for entry in stored["entries"]] == [entry["task_id"] for entry in planned["entries"]]
+
+
+async def test_deleted_tasks_leave_the_plan_and_trigger_a_replan(db):
+    keep, drop = await add_task("keep"), await add_task("drop")
+    await plan_task_schedule("u1", days=7)
+    await replan_changed()  # moves the watermark past the inserts
+    await asyncio.sleep(0.01)  # stored datetimes have millisecond precision
+    
+    await delete_task(drop)
+    stored = await get_task_schedule("u1", days=7)
+    assert [entry["task_id"] for entry in stored["entries"]] == [keep]
+    
+    assert await replan_changed() == 1
+    stored = await get_task_schedule("u1", days=7)
+    assert [entry["task_id"] for entry in stored["entries"]] == [keep]
+    assert await replan_changed() == 0
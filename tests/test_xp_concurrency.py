@@ -0,0 +1,72 @@
+import asyncio
+from collections import Counter
+
+from backend.models.enums import LifePillar
+from backend.models.user import UserProfile
+from backend.models.xp import XPRecord
+from backend.services.progression import XP_PER_LEVEL, grant_xp, level_for_xp
+
+GRANTS = 300
+
+
+async def _read_modify_write(user_id: str, pillar: LifePillar, amount: int):
+    """How add_xp granted XP before the update pipeline: load, change in Python, save"""
+    user = await UserProfile.find_one({"user_id": user_id})
+    user.total_xp[pillar] = user.total_xp.get(pillar, 0) + amount
+    user.life_pillar_levels[pillar] = max(user.life_pillar_levels[pillar], level_for_xp(user.total_xp[pillar]))
+    await user.save()
+
+
+async def test_interleaving_loses_read_modify_write_grants(db, interleaved):
+    """The harness is able to catch the regression: the old approach loses grants under it"""
+    await UserProfile(user_id="old", email="old@example.com").insert()
+    
+    await asyncio.gather(*(_read_modify_write("old", LifePillar.HEALTH, 1) for _ in range(GRANTS)))
+    profile = await UserProfile.find_one(UserProfile.user_id == "old")
+    assert profile.total_xp[LifePillar.HEALTH.value] < GRANTS
+
+
+async def test_concurrent_grants_are_all_applied(db, interleaved):
+    await UserProfile(user_id="u1", email="u1@example.com").insert()
+    pillars = list(LifePillar)
+    grants = [(pillars[i % len(pillars)], i % 7 + 1) for i in range(GRANTS)]
+    
+    results = await asyncio.gather(*(
+        grant_xp("u1", {pillar: amount}, source="test", source_id=str(i))
+        for i, (pillar, amount) in enumerate(grants)
+    ))
+    assert all(result is not None for result in results)
+    
+    expected = Counter()
+    for pillar, amount in grants:
+        expected[pillar.value] += amount
+    profile = await UserProfile.find_one(UserProfile.user_id == "u1")
+    for pillar in pillars:
+        assert profile.total_xp[pillar.value] == expected[pillar.value]
+        assert profile.life_pillar_levels[pillar.value] == level_for_xp(expected[pillar.value])
+    assert sum(profile.total_xp.values()) == sum(amount for _, amount in grants)
+    
+    records = await XPRecord.get_motor_collection().find({"user_id": "u1"}).to_list(length=None)
+    assert len(records) == GRANTS
+    assert sorted(int(record["source_id"]) for record in records) == list(range(GRANTS))
+
+
+async def test_grant_reports_level_ups(db):
+    await UserProfile(user_id="u2", email="u2@example.com").insert()
+    
+    result = await grant_xp("u2", {LifePillar.HEALTH: XP_PER_LEVEL - 1})
+    assert not result[LifePillar.HEALTH]["leveled_up"]
+    result = await grant_xp("u2", {LifePillar.HEALTH: 1})
+    assert result[LifePillar.HEALTH] == {
+        "pillar": LifePillar.HEALTH,
+        "xp_added": 1,
+        "total_xp": XP_PER_LEVEL,
+        "level": 2,
+        "leveled_up": True,
+        "unlocked_items": [],
+    }
+
+
+async def test_grant_to_missing_user(db):
+    assert await grant_xp("nobody", {LifePillar.HEALTH: 10}) is None
+    assert await XPRecord.get_motor_collection().count_documents({"user_id": "nobody"}) == 0
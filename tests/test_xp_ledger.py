@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from backend.models.enums import LifePillar
+from backend.models.xp import XPRollup
+from backend.services.xp_ledger import bucket_start, rebuild_rollups, record_grants
+
+NOW = datetime(2026, 10, 14, 12, 0)  # a Wednesday
+LAST_WEEK = NOW - timedelta(days=7)
+
+
+async def rollup(period: str, ts: datetime, pillar: LifePillar = LifePillar.HEALTH) -> dict:
+    return await XPRollup.get_motor_collection().find_one(
+        {"user_id": "u1", "life_pillar": pillar.value, "period": period, "bucket_start": bucket_start(ts, period)}
+    )
+
+
+async def test_rebuild_fixes_closed_buckets_only(db):
+    await record_grants("u1", {LifePillar.HEALTH: 10}, now=LAST_WEEK)
+    await record_grants("u1", {LifePillar.HEALTH: 5}, now=LAST_WEEK)
+    await record_grants("u1", {LifePillar.HEALTH: 7}, now=NOW)
+    rollups = XPRollup.get_motor_collection()
+    # Drift in a closed bucket and in the open one, plus a closed bucket no ledger entry backs
+    await rollups.update_one({"_id": (await rollup("day", LAST_WEEK))["_id"]}, {"$set": {"xp": 999}})
+    await rollups.update_one({"_id": (await rollup("day", NOW))["_id"]}, {"$inc": {"xp": 100}})
+    await record_grants("u1", {LifePillar.CAREER: 3}, now=LAST_WEEK)
+    await db.xp_records.delete_many({"life_pillar": LifePillar.CAREER.value})
+    
+    assert await rebuild_rollups("u1", now=NOW) == 1
+    
+    assert (await rollup("day", LAST_WEEK))["xp"] == 15
+    assert (await rollup("day", LAST_WEEK))["grants"] == 2
+    assert (await rollup("week", LAST_WEEK))["xp"] == 15
+    assert await rollup("day", LAST_WEEK, LifePillar.CAREER) is None
+    assert await rollup("week", LAST_WEEK, LifePillar.CAREER) is None
+    # Still open, so left to the live increments
+    assert (await rollup("day", NOW))["xp"] == 107
+    assert (await rollup("week", NOW))["xp"] == 7
+
+
+async def test_rebuild_counts_grants_made_after_the_cutoff_once(db):
+    await record_grants("u1", {LifePillar.HEALTH: 10}, now=LAST_WEEK)
+    await XPRollup.get_motor_collection().delete_many({})
+    
+    assert await rebuild_rollups(now=NOW) == 1
+    await record_grants("u1", {LifePillar.HEALTH: 4}, now=NOW)
+    assert await rebuild_rollups(now=NOW) == 1
+    
+    assert (await rollup("day", LAST_WEEK))["xp"] == 10
+    assert (await rollup("week", LAST_WEEK))["xp"] == 10
+    assert (await rollup("day", NOW))["xp"] == 4
+
+
+async def test_rebuild_without_ledger_drops_closed_rollups(db):
+    await record_grants("u1", {LifePillar.HEALTH: 10}, now=LAST_WEEK)
+    await db.xp_records.delete_many({})
+    
+    assert await rebuild_rollups("u1", now=NOW) == 1
+    assert await XPRollup.get_motor_collection().count_documents({"user_id": "u1"}) == 0